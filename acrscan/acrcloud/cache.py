@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class SqliteLRUStore:
+    '''
+    A persistent key -> bytes store in a sqlite file.
+    When the total size of the values goes over max_bytes, the least recently used entries are evicted.
+    It can be shared by threads and processes.
+    '''
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS store ('
+                               'key TEXT PRIMARY KEY, value BLOB, size INTEGER, created REAL, accessed REAL)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS store_accessed ON store (accessed)')
+            self._total_bytes = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM store').fetchone()[0]
+
+    def get(self, key):
+        '''
+        return (value, created timestamp), or None
+        '''
+        with self._lock, self._conn:
+            row = self._conn.execute('SELECT value, created FROM store WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute('UPDATE store SET accessed = ? WHERE key = ?', (time.time(), key))
+        return row[0], row[1]
+
+    def _size(self, key):
+        row = self._conn.execute('SELECT size FROM store WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else 0
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock, self._conn:
+            # a replaced value is not counted anymore
+            replaced_size = self._size(key)
+            self._conn.execute('INSERT OR REPLACE INTO store (key, value, size, created, accessed) '
+                               'VALUES (?, ?, ?, ?, ?)', (key, value, len(value), now, now))
+            self._total_bytes += len(value) - replaced_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._total_bytes -= self._size(key)
+            self._conn.execute('DELETE FROM store WHERE key = ?', (key,))
+
+    def _evict(self):
+        # other processes may write to the same file, so count again before evicting
+        self._total_bytes = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM store').fetchone()[0]
+        # evict down to 90% of max_bytes, so that the next puts do not evict again
+        excess = self._total_bytes - int(self.max_bytes * 0.9)
+        if excess <= 0:
+            return
+        evicted = 0
+        keys = []
+        for key, size in self._conn.execute('SELECT key, size FROM store ORDER BY accessed'):
+            if evicted >= excess:
+                break
+            keys.append((key,))
+            evicted += size
+        self._conn.executemany('DELETE FROM store WHERE key = ?', keys)
+        self._total_bytes -= evicted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FingerprintCache:
+    '''
+    Fingerprints extracted from files, keyed by the file content and the extraction parameters.
+    '''
+    # a file is hashed by one thread at a time, the files share FILE_LOCK_STRIPES locks
+    FILE_LOCK_STRIPES = 64
+
+    def __init__(self, path, max_bytes):
+        self.store = SqliteLRUStore(path, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._file_digests = {}
+        self._file_locks = [threading.Lock() for _ in range(self.FILE_LOCK_STRIPES)]
+
+    def file_digest(self, file_path):
+        '''
+        the sha1 of the file content, computed once per file (and again if the file changes)
+        '''
+        stat = os.stat(file_path)
+        file_key = (file_path, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._file_digests.get(file_key)
+            if digest:
+                return digest
+        file_lock = self._file_locks[hash(file_path) % self.FILE_LOCK_STRIPES]
+
+        with file_lock:
+            with self._lock:
+                digest = self._file_digests.get(file_key)
+            if digest:
+                return digest
+            sha1 = hashlib.sha1()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha1.update(chunk)
+            digest = sha1.hexdigest()
+            with self._lock:
+                self._file_digests[file_key] = digest
+        return digest
+
+    def key(self, file_path, kind, *params):
+        return '%s:%s:%s' % (self.file_digest(file_path), kind, ':'.join(str(p) for p in params))
+
+    def get(self, key):
+        entry = self.store.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[0]
+
+    def put(self, key, fingerprint):
+        self.store.put(key, fingerprint)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0}
+
+
+class ResponseCache:
+    '''
+    Recognition responses keyed by the digest of the fingerprints, the host and the data type.
+    An in-memory LRU of max_size entries, backed by an optional SqliteLRUStore.
+    Entries older than ttl seconds (None: never) are ignored.
+    '''
+
+    def __init__(self, max_size=10000, ttl=None, path=None, max_bytes=1024 * 1024 * 1024):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.store = SqliteLRUStore(path, max_bytes) if path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(host, data_type, query_data):
+        sha1 = hashlib.sha1()
+        sha1.update(('%s\n%s' % (host, data_type)).encode('utf8'))
+        for kind in ('sample', 'sample_hum'):
+            if query_data.get(kind):
+                sha1.update(('\n%s:%d\n' % (kind, len(query_data[kind]))).encode('ascii'))
+                sha1.update(query_data[kind])
+        return sha1.hexdigest()
+
+    def _is_expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[1]):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+        if self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                response, created = entry[0].decode('utf8'), entry[1]
+                if not self._is_expired(created):
+                    with self._lock:
+                        self.disk_hits += 1
+                        self._put_memory(key, response, created)
+                    return response
+                self.store.delete(key)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put_memory(self, key, response, created):
+        if self.max_size <= 0:
+            return
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def put(self, key, response):
+        with self._lock:
+            self._put_memory(key, response, time.time())
+        if self.store is not None:
+            self.store.put(key, response.encode('utf8'))
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': hits / total if total else 0}
@@ -7,18 +7,21 @@
     @create 2015.10.01
 '''
 
-import os
 import sys
 import hmac
 import time
 import json
 import base64
+import asyncio
 import hashlib
-import urllib.request
+import threading
+import http.client
 import urllib.parse
 import datetime
 import acrcloud_extr_tool
 
+from .cache import FingerprintCache, ResponseCache
+
 '''
 Copyright 2015 ACRCloud Recognizer v1.0.0
 
@@ -56,8 +59,137 @@ class ACRCloudRecognizeType:
     ACR_OPT_REC_BOTH = 2  # audio and humming fingerprint
 
 
+class ACRCloudHTTPError(Exception):
+    def __init__(self, status, reason):
+        super().__init__('HTTP Error %s: %s' % (status, reason))
+        self.status = status
+        self.reason = reason
+
+
+class ACRCloudRetryBudget:
+    '''
+    The retries allowed for a whole scan, shared by all the requests of a recognizer.
+    budget=None means unlimited.
+    '''
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.used = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.budget is not None and self.used >= self.budget:
+                self.denied += 1
+                return False
+            self.used += 1
+            return True
+
+
+class ACRCloudConnectionPool:
+    '''
+    Keep-alive HTTP/1.1 connections, at most `maxsize` idle connections per host.
+    A request sent on a reused connection that the server has already closed
+    is sent again once on a new connection.
+    '''
+
+    STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError,
+                    ConnectionAbortedError, BrokenPipeError)
+
+    def __init__(self, maxsize=10):
+        self.maxsize = maxsize
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connects = 0
+        self.reuses = 0
+        self.resets = 0
+
+    def _new_connection(self, scheme, netloc, timeout):
+        with self._lock:
+            self.connects += 1
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=timeout)
+        return http.client.HTTPConnection(netloc, timeout=timeout)
+
+    def _get_connection(self, scheme, netloc, timeout):
+        with self._lock:
+            self.requests += 1
+            idle = self._idle.get((scheme, netloc))
+            conn = idle.pop() if idle else None
+            if conn:
+                self.reuses += 1
+        if conn:
+            if conn.sock:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        return self._new_connection(scheme, netloc, timeout), False
+
+    def _put_connection(self, scheme, netloc, conn):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def post(self, url, body, headers, timeout):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        conn, reused = self._get_connection(parts.scheme, parts.netloc, timeout)
+        try:
+            try:
+                conn.request('POST', path, body, headers)
+                resp = conn.getresponse()
+            except self.STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                with self._lock:
+                    self.resets += 1
+                    self.reuses -= 1
+                conn = self._new_connection(parts.scheme, parts.netloc, timeout)
+                conn.request('POST', path, body, headers)
+                resp = conn.getresponse()
+            data = resp.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._put_connection(parts.scheme, parts.netloc, conn)
+
+        if resp.status >= 400:
+            raise ACRCloudHTTPError(resp.status, resp.reason)
+        return data
+
+    def stats(self):
+        return {'requests': self.requests,
+                'connects': self.connects,
+                'reuses': self.reuses,
+                'resets': self.resets,
+                'reuse_ratio': self.reuses / self.requests if self.requests else 0}
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
 class ACRCloudRecognizer:
-    def __init__(self, config):
+    HTTP_URL_FILE = "/v1/identify"
+
+    def __init__(self, config, caches=None):
+        '''
+        caches: a recognizer whose fingerprint and response caches are shared, instead of opening them again
+        '''
         self.config = config
         self.host = config.get('host', 'ap-southeast-1.api.acrcloud.com')
         self.query_type = config.get('query_type', 'fingerprint')
@@ -75,6 +207,25 @@ class ACRCloudRecognizer:
         self.filter_energy_min = config.get('filter_energy_min', 0)
         self.silence_energy_threshold = config.get('silence_energy_threshold', 100)
         self.silence_rate_threshold = config.get('silence_rate_threshold', 0.8)
+        self.connection_pool = ACRCloudConnectionPool(config.get('connection_pool_size', 10))
+        self.retry_max_attempts = config.get('retry_max_attempts', 5)
+        self.retry_budget = ACRCloudRetryBudget(config.get('retry_budget'))
+
+        if caches is not None:
+            self.fingerprint_cache = caches.fingerprint_cache
+            self.response_cache = caches.response_cache
+        else:
+            self.fingerprint_cache = None
+            if config.get('fingerprint_cache_path'):
+                self.fingerprint_cache = FingerprintCache(config['fingerprint_cache_path'],
+                                                          config.get('fingerprint_cache_max_mb', 1024) * 1024 * 1024)
+
+            self.response_cache = None
+            if config.get('response_cache_size') or config.get('response_cache_path'):
+                self.response_cache = ResponseCache(config.get('response_cache_size', 10000),
+                                                    config.get('response_cache_ttl'),
+                                                    config.get('response_cache_path'),
+                                                    config.get('response_cache_max_mb', 1024) * 1024 * 1024)
 
         # if self.debug:
         #     acrcloud_extr_tool.set_debug()
@@ -86,15 +237,31 @@ class ACRCloudRecognizer:
             return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE,
                                                        'encode_multipart_formdata error')
 
-        try:
-            req = urllib.request.Request(url, data=body)
-            req.add_header('Content-Type', content_type)
-            req.add_header('Referer', url)
-            resp = urllib.request.urlopen(req, timeout=timeout)
-            ares = resp.read().decode('utf8')
-            return ares
-        except Exception as e:
-            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e))
+        # only the send is retried, the body (and the fingerprint in it) is built once
+        headers = {'Content-Type': content_type, 'Referer': url}
+        attempt = 1
+        while True:
+            try:
+                ares = self.connection_pool.post(url, body, headers, timeout).decode('utf8')
+                return ares
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE, str(e))
+            time.sleep(self.retry_wait_seconds(attempt))
+            attempt += 1
+
+    def should_retry(self, error, attempt):
+        if attempt >= self.retry_max_attempts:
+            return False
+        # client errors will not go away
+        if isinstance(error, ACRCloudHTTPError) and error.status < 500 and error.status != 429:
+            return False
+        return self.retry_budget.acquire()
+
+    @staticmethod
+    def retry_wait_seconds(attempt):
+        # exponential backoff: 1s, 2s, 2s ...
+        return min(2 ** (attempt - 1), 2)
 
     def encode_multipart_formdata(self, fields, files):
         try:
@@ -124,9 +291,12 @@ class ACRCloudRecognizer:
             print('encode_multipart_formdata error' + str(e))
         return None, None
 
-    def do_recogize(self, host, query_data, query_type, access_key, access_secret, timeout=5):
+    def build_query_fields(self, query_data, query_type, access_key, access_secret):
+        '''
+        sign the query, return (fields, None), or (None, error result) if the query_data can not be sent
+        '''
         http_method = "POST"
-        http_url_file = "/v1/identify"
+        http_url_file = self.HTTP_URL_FILE
         data_type = query_type
         signature_version = "1"
         timestamp = int(time.mktime(datetime.datetime.utcfromtimestamp(time.time()).timetuple()))
@@ -149,49 +319,99 @@ class ACRCloudRecognizer:
         sample_hum_bytes = 0
         if 'sample' in query_data:
             if query_data['sample'] == None:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
+                return None, ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
             sample_bytes = len(query_data['sample'])
             if sample_bytes == 0:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.MUTE_ERROR_CODE)
+                return None, ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.MUTE_ERROR_CODE)
             fields['sample_bytes'] = str(sample_bytes)
 
         if 'sample_hum' in query_data:
             if query_data['sample_hum'] == None:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
+                return None, ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.DECODE_ERROR_CODE)
             sample_hum_bytes = len(query_data['sample_hum'])
             if sample_bytes == 0 and sample_hum_bytes == 0:
-                return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.NOT_HUMMING_ERROR_CODE)
+                return None, ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.NOT_HUMMING_ERROR_CODE)
             fields['sample_hum_bytes'] = str(sample_hum_bytes)
 
-        server_url = 'http://' + host + http_url_file
-        res = self.post_multipart(server_url, fields, query_data, timeout)
-        return res
+        return fields, None
 
-    def recognize(self, wav_audio_buffer):
-        res = ''
-        try:
-            query_data = {}
-            if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
-                audio_fingerprint_opt = {
-                    'filter_energy_min': self.filter_energy_min,
-                    'silence_energy_threshold': self.silence_energy_threshold,
-                    'silence_rate_threshold': self.silence_rate_threshold
-                }
-                query_data['sample'] = acrcloud_extr_tool.create_fingerprint(wav_audio_buffer, False,
-                                                                             audio_fingerprint_opt)
+    def do_recogize(self, host, query_data, query_type, access_key, access_secret, timeout=5, parse=False):
+        '''
+        parse: return the parsed response (dict) instead of the json string
+        '''
+        fields, error = self.build_query_fields(query_data, query_type, access_key, access_secret)
+        if error:
+            return self.parse_json(error) if parse else error
 
-            if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
-                query_data['sample_hum'] = acrcloud_extr_tool.create_humming_fingerprint(wav_audio_buffer)
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self.response_cache.key(host, query_type, query_data)
+            res = self.response_cache.get(cache_key)
+            if res is not None:
+                return self.parse_json(res) if parse else res
 
-            res = self.do_recogize(self.host, query_data, self.query_type, self.access_key, self.access_secret,
-                                   self.timeout)
-            try:
-                json.loads(res)
-            except Exception as e:
-                res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.JSON_ERROR_CODE, str(res))
+        server_url = 'http://' + host + self.HTTP_URL_FILE
+        res = self.post_multipart(server_url, fields, query_data, timeout)
+        return self.handle_response(cache_key, res, parse)
+
+    def handle_response(self, cache_key, res, parse):
+        '''
+        cache the response, the response is parsed (once) if it is cached or parse
+        '''
+        if cache_key is None and not parse:
+            return res
+        result = self.parse_json(res)
+        self.cache_response(cache_key, res, result)
+        return result if parse else res
+
+    def cache_response(self, cache_key, res, result=None):
+        '''
+        only the results of a successful recognition (a result or no result) are cached
+        result: the parsed response, if already parsed
+        '''
+        if cache_key is None:
+            return
+        try:
+            code = (result if result is not None else json.loads(res))['status']['code']
         except Exception as e:
-            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
-        return res
+            return
+        if code in (ACRCloudStatusCode.ACR_ERR_CODE_OK, ACRCloudStatusCode.NO_RESULT_CODE):
+            self.response_cache.put(cache_key, res)
+
+    def create_query_data(self, wav_audio_buffer):
+        query_data = {}
+        if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
+            audio_fingerprint_opt = {
+                'filter_energy_min': self.filter_energy_min,
+                'silence_energy_threshold': self.silence_energy_threshold,
+                'silence_rate_threshold': self.silence_rate_threshold
+            }
+            query_data['sample'] = acrcloud_extr_tool.create_fingerprint(wav_audio_buffer, False,
+                                                                         audio_fingerprint_opt)
+
+        if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
+            query_data['sample_hum'] = acrcloud_extr_tool.create_humming_fingerprint(wav_audio_buffer)
+        return query_data
+
+    def recognize(self, wav_audio_buffer, parse=False):
+        '''
+        parse: return the parsed response (dict) instead of the json string
+        '''
+        try:
+            query_data = self.create_query_data(wav_audio_buffer)
+            return self.recognize_query_data(query_data, parse)
+        except Exception as e:
+            return self.unknown_error(e, parse)
+
+    def recognize_query_data(self, query_data, parse=False):
+        res = self.do_recogize(self.host, query_data, self.query_type, self.access_key, self.access_secret,
+                               self.timeout, parse)
+        return res if parse else self.check_json(res)
+
+    @staticmethod
+    def unknown_error(e, parse=False):
+        res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
+        return json.loads(res) if parse else res
 
     def recognize_audio(self, file_path, start_seconds=0, rec_length=10):
         res = ''
@@ -205,33 +425,47 @@ class ACRCloudRecognizer:
             res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
         return res
 
-    def recognize_by_file(self, file_path, start_seconds, rec_length=10):
-        res = ''
+    def create_query_data_by_file(self, file_path, start_seconds, rec_length=10):
+        query_data = {}
+        if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
+            audio_fingerprint_opt = {
+                'filter_energy_min': self.filter_energy_min,
+                'silence_energy_threshold': self.silence_energy_threshold,
+                'silence_rate_threshold': self.silence_rate_threshold
+            }
+            query_data['sample'] = self._cached_fingerprint_by_file('sample', file_path, start_seconds, rec_length,
+                                                                    acrcloud_extr_tool.create_fingerprint_by_file,
+                                                                    file_path, start_seconds, rec_length, False,
+                                                                    audio_fingerprint_opt)
+        if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
+            query_data['sample_hum'] = self._cached_fingerprint_by_file(
+                'sample_hum', file_path, start_seconds, rec_length,
+                acrcloud_extr_tool.create_humming_fingerprint_by_file, file_path, start_seconds, rec_length)
+        return query_data
+
+    def _cached_fingerprint_by_file(self, kind, file_path, start_seconds, rec_length, create_fingerprint, *args):
+        if self.fingerprint_cache is None:
+            return create_fingerprint(*args)
+
+        key = self.fingerprint_cache.key(file_path, kind, start_seconds, rec_length, self.recognize_type,
+                                         self.filter_energy_min, self.silence_energy_threshold,
+                                         self.silence_rate_threshold)
+        fingerprint = self.fingerprint_cache.get(key)
+        if fingerprint is None:
+            fingerprint = create_fingerprint(*args)
+            if fingerprint:
+                self.fingerprint_cache.put(key, fingerprint)
+        return fingerprint
+
+    def recognize_by_file(self, file_path, start_seconds, rec_length=10, parse=False):
+        '''
+        parse: return the parsed response (dict) instead of the json string
+        '''
         try:
-            query_data = {}
-            if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
-                audio_fingerprint_opt = {
-                    'filter_energy_min': self.filter_energy_min,
-                    'silence_energy_threshold': self.silence_energy_threshold,
-                    'silence_rate_threshold': self.silence_rate_threshold
-                }
-                query_data['sample'] = acrcloud_extr_tool.create_fingerprint_by_file(file_path, start_seconds,
-                                                                                     rec_length, False,
-                                                                                     audio_fingerprint_opt)
-            if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
-                query_data['sample_hum'] = acrcloud_extr_tool.create_humming_fingerprint_by_file(file_path,
-                                                                                                 start_seconds,
-                                                                                                 rec_length)
-
-            res = self.do_recogize(self.host, query_data, self.query_type, self.access_key, self.access_secret,
-                                   self.timeout)
-            try:
-                json.loads(res)
-            except Exception as e:
-                res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.JSON_ERROR_CODE, str(res))
+            query_data = self.create_query_data_by_file(file_path, start_seconds, rec_length)
+            return self.recognize_query_data(query_data, parse)
         except Exception as e:
-            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
-        return res
+            return self.unknown_error(e, parse)
 
     def recognize_by_filebuffer(self, file_buffer, start_seconds, rec_length=10):
         res = ''
@@ -261,26 +495,43 @@ class ACRCloudRecognizer:
             res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
         return res
 
-    def recognize_by_fpbuffer(self, fp_buffer, start_seconds=0, rec_length=10):
-        res = ''
+    def create_query_data_by_fpbuffer(self, fp_buffer, start_seconds=0, rec_length=10):
+        query_data = {}
+        if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
+            query_data['sample'] = acrcloud_extr_tool.create_fingerprint_by_fpbuffer(fp_buffer, start_seconds,
+                                                                                     rec_length)
+        # if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
+        #    query_data['sample_hum'] = acrcloud_extr_tool.create_humming_fingerprint_by_filebuffer(file_buffer, start_seconds, rec_length)
+        return query_data
+
+    def recognize_by_fpbuffer(self, fp_buffer, start_seconds=0, rec_length=10, parse=False):
+        '''
+        parse: return the parsed response (dict) instead of the json string
+        '''
         try:
-            query_data = {}
-            if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_AUDIO or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
-                query_data['sample'] = acrcloud_extr_tool.create_fingerprint_by_fpbuffer(fp_buffer, start_seconds,
-                                                                                         rec_length)
-            # if self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_HUMMING or self.recognize_type == ACRCloudRecognizeType.ACR_OPT_REC_BOTH:
-            #    query_data['sample_hum'] = acrcloud_extr_tool.create_humming_fingerprint_by_filebuffer(file_buffer, start_seconds, rec_length)
+            query_data = self.create_query_data_by_fpbuffer(fp_buffer, start_seconds, rec_length)
+            return self.recognize_query_data(query_data, parse)
+        except Exception as e:
+            return self.unknown_error(e, parse)
 
-            res = self.do_recogize(self.host, query_data, self.query_type, self.access_key, self.access_secret,
-                                   self.timeout)
-            try:
-                json.loads(res)
-            except Exception as e:
-                res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.JSON_ERROR_CODE, str(res))
+    @staticmethod
+    def check_json(res):
+        try:
+            json.loads(res)
         except Exception as e:
-            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.UNKNOW_ERROR_CODE, str(e))
+            res = ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.JSON_ERROR_CODE, str(res))
         return res
 
+    @staticmethod
+    def parse_json(res):
+        '''
+        the parsed response (dict), or the json error result if res is not json
+        '''
+        try:
+            return json.loads(res)
+        except Exception as e:
+            return json.loads(ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.JSON_ERROR_CODE, str(res)))
+
     @staticmethod
     def get_duration_ms_by_file(file_path):
         try:
@@ -298,6 +549,214 @@ class ACRCloudRecognizer:
             return 0
 
 
+class AsyncACRCloudConnectionPool(ACRCloudConnectionPool):
+    '''
+    asyncio version of ACRCloudConnectionPool, the connections are (reader, writer) stream pairs
+    '''
+
+    STALE_ERRORS = ACRCloudConnectionPool.STALE_ERRORS + (asyncio.IncompleteReadError,)
+
+    async def _new_connection(self, scheme, netloc, timeout):
+        with self._lock:
+            self.connects += 1
+        host, _, port = netloc.partition(':')
+        if scheme == 'https':
+            return await asyncio.wait_for(asyncio.open_connection(host, int(port or 443), ssl=True), timeout)
+        return await asyncio.wait_for(asyncio.open_connection(host, int(port or 80)), timeout)
+
+    async def _get_connection(self, scheme, netloc, timeout):
+        with self._lock:
+            self.requests += 1
+            idle = self._idle.get((scheme, netloc))
+            conn = idle.pop() if idle else None
+            if conn:
+                self.reuses += 1
+        if conn:
+            return conn, True
+        return await self._new_connection(scheme, netloc, timeout), False
+
+    @staticmethod
+    async def _exchange(conn, request):
+        reader, writer = conn
+        writer.write(request)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise http.client.RemoteDisconnected('Remote end closed connection without response')
+        try:
+            version, status, reason = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            status = int(status)
+        except ValueError:
+            raise http.client.BadStatusLine(str(status_line))
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        will_close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = b''
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip(), 16)
+                if not size:
+                    # skip the trailer
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            will_close = True
+        return status, reason, body, will_close
+
+    @staticmethod
+    def _close(conn):
+        conn[1].close()
+
+    async def post(self, url, body, headers, timeout):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        head = ['POST %s HTTP/1.1' % path, 'Host: %s' % parts.netloc, 'Content-Length: %d' % len(body)]
+        head += ['%s: %s' % (k, v) for k, v in headers.items()]
+        request = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+        conn, reused = await self._get_connection(parts.scheme, parts.netloc, timeout)
+        try:
+            try:
+                status, reason, data, will_close = await asyncio.wait_for(self._exchange(conn, request), timeout)
+            except self.STALE_ERRORS:
+                self._close(conn)
+                if not reused:
+                    raise
+                with self._lock:
+                    self.resets += 1
+                    self.reuses -= 1
+                conn = await self._new_connection(parts.scheme, parts.netloc, timeout)
+                status, reason, data, will_close = await asyncio.wait_for(self._exchange(conn, request), timeout)
+        except BaseException:
+            self._close(conn)
+            raise
+
+        if will_close:
+            self._close(conn)
+        else:
+            self._put_connection(parts.scheme, parts.netloc, conn)
+
+        if status >= 400:
+            raise ACRCloudHTTPError(status, reason)
+        return data
+
+    def _put_connection(self, scheme, netloc, conn):
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        self._close(conn)
+
+    async def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                self._close(conn)
+                await conn[1].wait_closed()
+
+
+class AsyncACRCloudRecognizer(ACRCloudRecognizer):
+    '''
+    ACRCloudRecognizer with coroutine do_recogize/recognize/recognize_by_file/recognize_by_fpbuffer.
+    The fingerprints are extracted in `executor` (the loop\'s default executor if None),
+    the requests are sent from the event loop.
+    '''
+
+    def __init__(self, config, executor=None, caches=None):
+        super().__init__(config, caches)
+        self.connection_pool = AsyncACRCloudConnectionPool(config.get('connection_pool_size', 10))
+        self.executor = executor
+
+    async def post_multipart(self, url, fields, files, timeout):
+        content_type, body = self.encode_multipart_formdata(fields, files)
+
+        if not content_type and not body:
+            return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE,
+                                                       'encode_multipart_formdata error')
+
+        headers = {'Content-Type': content_type, 'Referer': url}
+        attempt = 1
+        while True:
+            try:
+                ares = (await self.connection_pool.post(url, body, headers, timeout)).decode('utf8')
+                return ares
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    return ACRCloudStatusCode.get_result_error(ACRCloudStatusCode.HTTP_ERROR_CODE,
+                                                               str(e) or repr(e))
+            await asyncio.sleep(self.retry_wait_seconds(attempt))
+            attempt += 1
+
+    async def do_recogize(self, host, query_data, query_type, access_key, access_secret, timeout=5, parse=False):
+        fields, error = self.build_query_fields(query_data, query_type, access_key, access_secret)
+        if error:
+            return self.parse_json(error) if parse else error
+
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self.response_cache.key(host, query_type, query_data)
+            res = await self._run_cache_io(self.response_cache.get, cache_key)
+            if res is not None:
+                return self.parse_json(res) if parse else res
+
+        server_url = 'http://' + host + self.HTTP_URL_FILE
+        res = await self.post_multipart(server_url, fields, query_data, timeout)
+        if cache_key is None:
+            return self.handle_response(cache_key, res, parse)
+        return await self._run_cache_io(self.handle_response, cache_key, res, parse)
+
+    async def _run_cache_io(self, func, *args):
+        '''
+        call a response cache function, in `executor` if the cache has a disk tier (sqlite blocks the loop)
+        '''
+        if self.response_cache.store is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _recognize_query(self, parse, create_query_data, *args):
+        try:
+            loop = asyncio.get_running_loop()
+            query_data = await loop.run_in_executor(self.executor, create_query_data, *args)
+            res = await self.do_recogize(self.host, query_data, self.query_type, self.access_key,
+                                         self.access_secret, self.timeout, parse)
+            return res if parse else self.check_json(res)
+        except Exception as e:
+            return self.unknown_error(e, parse)
+
+    async def recognize(self, wav_audio_buffer, parse=False):
+        return await self._recognize_query(parse, self.create_query_data, wav_audio_buffer)
+
+    async def recognize_by_file(self, file_path, start_seconds, rec_length=10, parse=False):
+        return await self._recognize_query(parse, self.create_query_data_by_file, file_path, start_seconds,
+                                           rec_length)
+
+    async def recognize_by_fpbuffer(self, fp_buffer, start_seconds=0, rec_length=10, parse=False):
+        return await self._recognize_query(parse, self.create_query_data_by_fpbuffer, fp_buffer, start_seconds,
+                                           rec_length)
+
+    async def close(self):
+        await self.connection_pool.close()
+
+
 class ACRCloudStatusCode:
     HTTP_ERROR_CODE = 3000
     NO_RESULT_CODE = 1001
@@ -1,22 +1,105 @@
 #!/usr/bin/env python 
 # -*- coding: utf-8 -*-
 
-import csv
-import json
+import asyncio
+import copy
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain
+from multiprocessing.util import Finalize
 from typing import List
 
-from retrying import retry
-
 from .acrcloud.recognizer import ACRCloudRecognizer
+from .acrcloud.recognizer import AsyncACRCloudRecognizer
 from .acrcloud.recognizer import ACRCloudStatusCode
+from .catalog import TrackCatalog
+from .columnar import ColumnarResultsMerger, count_acrids, import_numpy, no_result_positions
+from .exporters import CsvResultWriter, SplitCsvResultWriter, JsonResultWriter
+from .exporters import MergingResultWriter, create_result_writer, import_pyarrow
+from .exporters import parse_similar_results, report_fields_error
+from .journal import ScanJournal
+from .merger import ResultsMerger
 from .models import *
 from .utils import *
 
 logger = logging.getLogger(__name__)
 
+# the fields of the primary result copied to the results (the metadata of the track is in TrackInfo)
+MUSIC_RESULT_FIELDS = tuple(k for k in MusicResult.fields if k in Music.fields and k not in TrackInfo.fields)
+CUSTOM_FILE_RESULT_FIELDS = tuple(k for k in CustomFileResult.fields if k in CustomFile.fields)
+
+# the scanner owned by a process pool worker, see ACRCloudScan.scan_target
+_worker_scanner = None
+
+
+def _init_scan_worker(acrcloud_config: dict, settings: dict) -> None:
+    """
+    create the worker's own ACRCloudScan (and ACRCloudRecognizer)
+    :param acrcloud_config: config
+    :param settings: the scan settings copied from the parent scanner
+    """
+    global _worker_scanner
+    _worker_scanner = ACRCloudScan(acrcloud_config)
+    for k, v in settings.items():
+        setattr(_worker_scanner, k, v)
+    if _worker_scanner.journal_path:
+        _worker_scanner.journal = ScanJournal(f'{_worker_scanner.journal_path}.w{os.getpid()}', load=False)
+        # the pool workers are not told when they are done, the journal is closed when the worker exits
+        Finalize(_worker_scanner.journal, _worker_scanner.journal.close, exitpriority=10)
+
+
+def _scan_in_worker(filename: str, journaled_segments: dict) -> (list, list, int, dict):
+    """
+    scan a file in a process pool worker
+    :return: the results, the worker's pid and its scan counters so far (see ACRCloudScan._scan_stats)
+    """
+    if _worker_scanner.journal:
+        _worker_scanner.journal.extend(filename, journaled_segments)
+    try:
+        music_results, custom_file_results = _worker_scanner._scan(filename)
+    finally:
+        if _worker_scanner.journal:
+            # the responses of the file are on disk before its results are handed to the parent
+            _worker_scanner.journal.sync()
+    return music_results, custom_file_results, os.getpid(), _worker_scanner._scan_stats()
+
+
+def _add_scan_stats(total: dict, stats: dict) -> None:
+    """
+    add the counters of a scan (see ACRCloudScan._scan_stats) to the total counters
+    :param total:
+    :param stats:
+    """
+    for name, counters in stats.items():
+        total_counters = total.setdefault(name, {})
+        for k, v in counters.items():
+            total_counters[k] = total_counters.get(k, 0) + v
+
+
+def _ratio(part: int, total: int) -> float:
+    return part / total if total else 0
+
+
+class AcridStats:
+    """
+    the appear times and the score sum of an acrid, see ACRCloudScan._filter_results
+    """
+    __slots__ = ('count', 'score_sum')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.score_sum = 0
+
 
 class ACRCloudScan:
+    # the errors that may not happen again, see _journal_segment
+    _transient_error_codes = (ACRCloudStatusCode.HTTP_ERROR_CODE, ACRCloudStatusCode.JSON_ERROR_CODE,
+                              ACRCloudStatusCode.UNKNOW_ERROR_CODE)
+    # attributes copied to the process pool workers
+    _worker_settings = ('_recognize_length_ms', 'interval_length_ms', 'scan_type', 'with_duration',
+                        'start_time_ms', 'end_time_ms', 'is_fingerprint', 'concurrency', 'decode_once',
+                        'journal_path', 'filter_results', 'report_fields')
 
     def __init__(self, acrcloud_config: dict) -> None:
         self.config = acrcloud_config  # config
@@ -26,6 +109,8 @@ class ACRCloudScan:
         self.filter_title_threshold = 75
         self.filter_time_threshold = self._recognize_length_ms
         self.results_counter = {}
+        self.title_similarity = TitleSimilarity(self.config.get('title_similarity_cache_size', 100000))
+        self.track_catalog = TrackCatalog()
         self.scan_type = ScanType.SCAN_TYPE_BOTH
         self.with_duration = False
         self.filter_results = False
@@ -34,6 +119,52 @@ class ACRCloudScan:
         self.end_time_ms = None
         self.is_fingerprint = False
         self.fp_buffer = None
+        self.concurrency = self.config.get('concurrency', 1)
+        self.workers = self.config.get('workers', 1)
+        self.use_async = self.config.get('use_async', False)
+        self.decode_once = self.config.get('decode_once', False)
+        self.journal_path = None
+        self.journal = None
+        self.stream_results = self.config.get('stream_results', False)
+        self.gzip_reports = self.config.get('gzip_reports', False)
+        self.results_backend = self.config.get('results_backend', ResultsBackend.OBJECT)
+        # the columns of the reports, all of them if None
+        self.report_fields = tuple(self.config['report_fields']) if self.config.get('report_fields') else None
+        self._result_writers = None
+        self._async_recognizer = None
+        # the scan counters of the process pool workers, see _scan_files
+        self._worker_stats = {}
+
+    @property
+    def scans_music(self) -> bool:
+        """
+        the music results are parsed, merged, filtered and exported (the music lane)
+        """
+        return self.scan_type in (ScanType.SCAN_TYPE_MUSIC, ScanType.SCAN_TYPE_BOTH)
+
+    @property
+    def scans_custom_files(self) -> bool:
+        """
+        the custom file results are parsed, merged, filtered and exported (the custom file lane)
+        """
+        return self.scan_type in (ScanType.SCAN_TYPE_CUSTOM, ScanType.SCAN_TYPE_BOTH)
+
+    @property
+    def uses_columnar_backend(self) -> bool:
+        """
+        the results are merged and filtered with the columnar backend (opt-in, it needs numpy)
+        """
+        return self.results_backend == ResultsBackend.COLUMNAR and import_numpy() is not None
+
+    @property
+    def parsed_track_fields(self):
+        """
+        the track fields (TrackInfo) parsed from the responses: the report fields, or all of them (None)
+        when the results are filtered (the filter compares the amount of metadata of the results)
+        """
+        if self.report_fields is None or (self.with_duration and self.filter_results):
+            return None
+        return self.report_fields
 
     def _get_file_duration_ms(self, filename: str) -> int:
         """
@@ -46,28 +177,142 @@ class ACRCloudScan:
         else:
             return self._recognizer.get_duration_ms_by_file(filename)
 
-    @retry(stop_max_attempt_number=5, wait_exponential_multiplier=1000, wait_exponential_max=2000)
-    def _recognize(self, filename: str, start_time_ms: int) -> dict:
+    def _recognize(self, filename: str, start_time_ms: int, pcm: bytes = None) -> dict:
         """
         do recognize and deserialization the json
         :param filename: file position
         :param start_time_ms: start time
+        :param pcm: the decoded audio of the segment (decode_once mode)
         :return: recognize result (dict)
         """
 
         recognize_length_s = int(self._recognize_length_ms / 1000)
 
         start_time_s = int(start_time_ms / 1000)
-        if self.is_fingerprint:
-            result = self._recognizer.recognize_by_fpbuffer(self.fp_buffer, start_time_s, recognize_length_s)
+        if pcm is not None:
+            result = self._recognizer.recognize(pcm, parse=True)
+        elif self.is_fingerprint:
+            result = self._recognizer.recognize_by_fpbuffer(self.fp_buffer, start_time_s, recognize_length_s,
+                                                            parse=True)
         else:
-            result = self._recognizer.recognize_by_file(filename, start_time_s, recognize_length_s)
-        logger.debug(str(result).strip())
-        result = json.loads(result)
-        if result.get('code') == 3000:
-            raise Exception('Http Error"')
+            result = self._recognizer.recognize_by_file(filename, start_time_s, recognize_length_s, parse=True)
+        logger.debug('%s', result)
+        return result
+
+    def _recognize_segment(self, filename: str, t_ms: int, pcm: bytes = None) -> dict:
+        """
+        replay a segment from the journal, or recognize it and journal the response
+        :param filename: file position
+        :param t_ms: start time
+        :param pcm: the decoded audio of the segment (decode_once mode)
+        :return: recognize result (dict)
+        """
+        if self.journal:
+            result = self.journal.pop(filename, t_ms)
+            if result is not None:
+                return result
+
+        result = self._recognize(filename, t_ms, pcm)
+        self._journal_segment(filename, t_ms, result)
         return result
 
+    def _journal_segment(self, filename: str, t_ms: int, result: dict) -> None:
+        """
+        journal the response of a segment, transient errors are not journaled so they are retried on resume
+        """
+        if self.journal and result.get('status', {}).get('code') not in self._transient_error_codes:
+            self.journal.append(filename, t_ms, result)
+
+    def _iter_segments(self, filename: str, time_points: range):
+        """
+        the segments to recognize, in decode_once mode the file is decoded once and every segment
+        carries its own audio, otherwise the recognizer extracts the fingerprint from the file.
+        :param filename: file position
+        :param time_points: the start time (ms) of every segment
+        :return: a generator of (start time, pcm or None)
+        """
+        if self.decode_once and not self.is_fingerprint:
+            yield from iter_pcm_windows(filename, time_points, self._recognize_length_ms,
+                                        self.config.get('ffmpeg_path', 'ffmpeg'))
+        else:
+            for t_ms in time_points:
+                yield t_ms, None
+
+    def _recognize_segments(self, filename: str, time_points):
+        """
+        recognize the segments of a file, keeping up to `concurrency` requests in flight
+        :param filename: file position
+        :param time_points: the start time (ms) of every segment
+        :return: a generator of (start time, recognize result), always in timestamp order
+        """
+        segments = self._iter_segments(filename, time_points)
+        if self.concurrency <= 1:
+            for t_ms, pcm in segments:
+                yield t_ms, self._recognize_segment(filename, t_ms, pcm)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = deque()
+            for t_ms, pcm in segments:
+                in_flight.append((t_ms, executor.submit(self._recognize_segment, filename, t_ms, pcm)))
+                # wait for the oldest segment once the window is full, so the results keep their order
+                if len(in_flight) >= self.concurrency:
+                    t, future = in_flight.popleft()
+                    yield t, future.result()
+            while in_flight:
+                t, future = in_flight.popleft()
+                yield t, future.result()
+
+    def _get_time_points(self, filename: str, duration_ms: int) -> range:
+        """
+        compute the start time of every segment to recognize
+        :param filename: filename
+        :param duration_ms: the duration of the file (or the end time of the scan)
+        :return: the start time (ms) of the segments, its stop is the scan duration
+        """
+        if not duration_ms:
+            duration_ms = 0
+
+        duration_left_ms = duration_ms % self.interval_length_ms
+
+        # ignore extra fragment (if this fragment smaller than 2 seconds)
+        if duration_left_ms < 2000:
+            scan_duration_ms = duration_ms - duration_left_ms
+        else:
+            scan_duration_ms = duration_ms
+
+        logger.info(
+            f'{filename} File total duration {duration_ms / 1000} seconds, Scan from 0 to {scan_duration_ms / 1000}')
+
+        return range(self.start_time_ms, scan_duration_ms, self.interval_length_ms)
+
+    def _handle_segment(self, filename: str, t_ms: int, rec_result: dict, scan_duration_ms: int) \
+            -> (MusicResult, CustomFileResult):
+        """
+        log and parse the recognize result of a segment
+        :param filename: filename
+        :param t_ms: the start time of the segment
+        :param rec_result: recognize result (dict)
+        :param scan_duration_ms: the scan duration of the file
+        :return: the results of the segment, None for the result kind that is not scanned
+        """
+        logger.info("progress: {}/{}".format(t_ms, scan_duration_ms))
+        response = Response.from_dict(rec_result)
+        response_code = response.status.code
+        if response_code != 1001 and response_code != 0 and response_code != 2006:
+            logger.error(f'Code:{response_code} Message: {response.status.msg}')
+            # sys.exit()
+        if response_code == ACRCloudStatusCode.DECODE_ERROR_CODE:
+            logger.error(f'Code:{response_code} Message: {response.status.msg}, skip file {filename}')
+
+        music_result, custom_file_result = self._parse_response_to_result(filename, t_ms, response)
+
+        logger.info(f'From {get_human_readable_time(int(t_ms / 1000))} '
+                    f'To {get_human_readable_time(int((t_ms + self._recognize_length_ms) / 1000))} '
+                    f'Result[title: {music_result.title if music_result else None} '
+                    f'Custom: {custom_file_result.title if custom_file_result else None}]')
+        return music_result, custom_file_result
+
     def _scan(self, filename: str) -> (list, list):
         """
         scan a whole file.
@@ -85,46 +330,155 @@ class ACRCloudScan:
         else:
             duration_ms = self._get_file_duration_ms(filename)
 
-        if not duration_ms:
-            duration_ms = 0
+        time_points = self._get_time_points(filename, duration_ms)
+        for t_ms, rec_result in self._recognize_segments(filename, time_points):
+            music_result, custom_file_result = self._handle_segment(filename, t_ms, rec_result, time_points.stop)
+            self._add_results(music_results, custom_file_results, (music_result,) if music_result else (),
+                              (custom_file_result,) if custom_file_result else ())
 
-        duration_left_ms = duration_ms % self.interval_length_ms
+        return music_results, custom_file_results
 
-        # ignore extra fragment (if this fragment smaller than 2 seconds)
-        if duration_left_ms < 2000:
-            scan_duration_ms = duration_ms - duration_left_ms
+    def _add_results(self, music_results: list, custom_file_results: list, new_music_results,
+                     new_custom_file_results) -> None:
+        """
+        add the new results to the results lists, in stream mode they are written to the reports at once instead
+        :param music_results:
+        :param custom_file_results:
+        :param new_music_results:
+        :param new_custom_file_results:
+        :return:
+        """
+        if self._result_writers is None:
+            music_results += new_music_results
+            custom_file_results += new_custom_file_results
+            return
+
+        music_writer, custom_file_writer = self._result_writers
+        if music_writer:
+            for r in new_music_results:
+                music_writer.write(r)
+        if custom_file_writer:
+            for r in new_custom_file_results:
+                custom_file_writer.write(r)
+
+    async def _recognize_async(self, recognizer: AsyncACRCloudRecognizer, filename: str, start_time_ms: int,
+                               fp_buffer: bytes = None, pcm: bytes = None) -> dict:
+        """
+        coroutine version of _recognize
+        :param recognizer: the async recognizer
+        :param filename: file position
+        :param start_time_ms: start time
+        :param fp_buffer: the fingerprint file content (when is_fingerprint)
+        :param pcm: the decoded audio of the segment (decode_once mode)
+        :return: recognize result (dict)
+        """
+        recognize_length_s = int(self._recognize_length_ms / 1000)
+
+        start_time_s = int(start_time_ms / 1000)
+        if pcm is not None:
+            result = await recognizer.recognize(pcm, parse=True)
+        elif fp_buffer is not None:
+            result = await recognizer.recognize_by_fpbuffer(fp_buffer, start_time_s, recognize_length_s, parse=True)
         else:
-            scan_duration_ms = duration_ms
+            result = await recognizer.recognize_by_file(filename, start_time_s, recognize_length_s, parse=True)
+        logger.debug('%s', result)
+        return result
 
-        logger.info(
-            f'{filename} File total duration {duration_ms / 1000} seconds, Scan from 0 to {scan_duration_ms / 1000}')
+    async def _recognize_segment_async(self, recognizer: AsyncACRCloudRecognizer, filename: str, t_ms: int,
+                                       fp_buffer: bytes = None, pcm: bytes = None) -> dict:
+        """
+        coroutine version of _recognize_segment
+        """
+        if self.journal:
+            result = self.journal.pop(filename, t_ms)
+            if result is not None:
+                return result
+
+        result = await self._recognize_async(recognizer, filename, t_ms, fp_buffer, pcm)
+        self._journal_segment(filename, t_ms, result)
+        return result
+
+    async def _scan_async(self, recognizer: AsyncACRCloudRecognizer, filename: str,
+                          request_semaphore: asyncio.Semaphore) -> (list, list):
+        """
+        coroutine version of _scan, the requests of all the files share request_semaphore
+        :param recognizer: the async recognizer
+        :param filename: filename
+        :param request_semaphore: limits the requests in flight
+        :return:
+        """
+        music_results = []
+        custom_file_results = []
+        loop = asyncio.get_running_loop()
 
-        for t_ms in range(self.start_time_ms, scan_duration_ms, self.interval_length_ms):
-            rec_result = self._recognize(filename, t_ms)
-            logger.info("progress: {}/{}".format(t_ms, scan_duration_ms))
-            response = Response.from_dict(rec_result)
-            response_code = response.status.code
-            if response_code != 1001 and response_code != 0 and response_code != 2006:
-                logger.error(f'Code:{response_code} Message: {response.status.msg}')
-                # sys.exit()
-            if response_code == ACRCloudStatusCode.DECODE_ERROR_CODE:
-                logger.error(f'Code:{response_code} Message: {response.status.msg}, skip file {filename}')
-
-            music_result, custom_file_result = self._parse_response_to_result(filename, t_ms, response)
-            music_results.append(music_result)
-            custom_file_results.append(custom_file_result)
-
-            logger.info(f'From {get_human_readable_time(int(t_ms / 1000))} '
-                        f'To {get_human_readable_time(int((t_ms + self._recognize_length_ms) / 1000))} '
-                        f'Result[title: {music_result.title} '
-                        f'Custom: {custom_file_result.title}]')
+        fp_buffer = None
+        if self.is_fingerprint:
+            with open(filename, 'rb') as f:
+                fp_buffer = f.read()
+
+        if self.end_time_ms:
+            duration_ms = self.end_time_ms
+        elif self.is_fingerprint:
+            duration_ms = await loop.run_in_executor(recognizer.executor,
+                                                     recognizer.get_duration_ms_by_fpbuffer, fp_buffer)
+        else:
+            duration_ms = await loop.run_in_executor(recognizer.executor,
+                                                     recognizer.get_duration_ms_by_file, filename)
+
+        time_points = self._get_time_points(filename, duration_ms)
+
+        def handle_segment(t, task):
+            music_result, custom_file_result = self._handle_segment(filename, t, task.result(),
+                                                                    time_points.stop)
+            if music_result:
+                music_results.append(music_result)
+            if custom_file_result:
+                custom_file_results.append(custom_file_result)
+
+        segments = self._iter_segments(filename, time_points)
+        decoding = self.decode_once and not self.is_fingerprint
+        in_flight = deque()
+        while True:
+            if decoding:
+                # the decoding blocks, so the next segment is pulled in the executor
+                segment = await loop.run_in_executor(recognizer.executor, next, segments, None)
+            else:
+                segment = next(segments, None)
+            if segment is None:
+                break
+            t_ms, pcm = segment
+            await request_semaphore.acquire()
+            task = asyncio.ensure_future(
+                self._recognize_segment_async(recognizer, filename, t_ms, fp_buffer, pcm))
+            task.add_done_callback(lambda _: request_semaphore.release())
+            in_flight.append((t_ms, task))
+            # handle the finished segments in timestamp order
+            while in_flight and in_flight[0][1].done():
+                handle_segment(*in_flight.popleft())
+        while in_flight:
+            t, task = in_flight.popleft()
+            await task
+            handle_segment(t, task)
 
         return music_results, custom_file_results
 
     def _parse_response_to_result(self, filename: str, start_time_ms: int, response: Response) \
             -> (MusicResult, CustomFileResult):
         """
-        parse the Response object to Result object
+        parse the Response object to Result object, only the result kinds of the scan type are parsed
+        :param filename: filename
+        :param start_time_ms: recognize start
+        :param response:
+        :return: the results, None for the result kind that is not scanned
+        """
+        music_result = self._parse_music_result(filename, start_time_ms, response) if self.scans_music else None
+        custom_file_result = self._parse_custom_file_result(filename, start_time_ms, response) \
+            if self.scans_custom_files else None
+        return music_result, custom_file_result
+
+    def _parse_music_result(self, filename: str, start_time_ms: int, response: Response) -> MusicResult:
+        """
+        parse the music of the Response object to a MusicResult
         :param filename: filename
         :param start_time_ms: recognize start
         :param response:
@@ -141,6 +495,49 @@ class ACRCloudScan:
             score=0,
         )
 
+        if response.status.code != ACRCloudStatusCode.ACR_ERR_CODE_OK:
+            return music_result
+
+        music_results = response.metadata.music
+
+        if music_results:
+            for m in music_results:
+                if m is not None:
+                    self.track_catalog.intern_music(m)
+            primary_music_result = music_results[0]
+
+            # the results only have the report fields, the metadata of the track is shared (TrackInfo)
+            for k in MUSIC_RESULT_FIELDS:
+                setattr(music_result, k, getattr(primary_music_result, k))
+
+            track_fields = self.parsed_track_fields
+            if track_fields is None or any(f in TrackInfo.fields for f in track_fields):
+                music_result.track = self.track_catalog.track_info(primary_music_result, track_fields)
+
+            similar_results = music_results[1:]
+            music_result.similar_results = similar_results
+            music_result.primary_result = primary_music_result
+
+            if self.with_duration:
+                if music_result.sample_begin_time_offset_ms is None:
+                    logger.error('Please contact us (support@acrcloud.com) to get the \'played duration\' feature '
+                                 'permission')
+                else:
+                    music_result.played_duration_ms = \
+                        music_result.sample_end_time_offset_ms - music_result.sample_begin_time_offset_ms
+                    music_result.db_begin_time_offset_ms = primary_music_result.db_begin_time_offset_ms
+                    music_result.db_end_time_offset_ms = primary_music_result.db_end_time_offset_ms
+
+        return music_result
+
+    def _parse_custom_file_result(self, filename: str, start_time_ms: int, response: Response) -> CustomFileResult:
+        """
+        parse the custom files of the Response object to a CustomFileResult
+        :param filename: filename
+        :param start_time_ms: recognize start
+        :param response:
+        :return:
+        """
         custom_file_result = CustomFileResult(
             filename=os.path.basename(filename),
             status_code=response.status.code,
@@ -150,165 +547,76 @@ class ACRCloudScan:
             score=0,
         )
 
-        if response.status.code == ACRCloudStatusCode.ACR_ERR_CODE_OK:
-
-            # music
-            music_results = response.metadata.music
-
-            if music_results:
-                primary_music_result = music_results[0]
-                keys = primary_music_result.to_dict()
-
-                for k in keys:
-                    music_result.__setattr__(k, primary_music_result.__getattribute__(k))
-
-                if primary_music_result.external_ids.isrc:
-                    music_result.isrc = primary_music_result.external_ids.isrc
-                if primary_music_result.external_ids.upc:
-                    music_result.upc = primary_music_result.external_ids.upc
-                if primary_music_result.external_metadata.spotify and \
-                        primary_music_result.external_metadata.spotify.track:
-                    music_result.spotify_id = primary_music_result.external_metadata.spotify.track.id
-                if primary_music_result.external_metadata.youtube:
-                    music_result.youtube_id = primary_music_result.external_metadata.youtube.vid
-                if primary_music_result.external_metadata.deezer and \
-                        primary_music_result.external_metadata.deezer.track:
-                    music_result.deezer_id = primary_music_result.external_metadata.deezer.track.id
-                if primary_music_result.release_date:
-                    music_result.release_date = primary_music_result.release_date
-                if primary_music_result.label:
-                    music_result.label = primary_music_result.label
-
-                if primary_music_result.language:
-                    music_result.language = primary_music_result.language
-
-                if primary_music_result.album.name:
-                    music_result.album_name = primary_music_result.album.name
-
-                if primary_music_result.contributors:
-                    if primary_music_result.contributors.composers:
-                        composers_names_list = []
-                        for c in primary_music_result.contributors.composers:
-                            composers_names_list.append(c)
-
-                        composers_names = "|##|".join(composers_names_list)
-                        music_result.composers = composers_names
-
-                    if primary_music_result.contributors.lyricists:
-                        lyricists_names_list = []
-                        for k in primary_music_result.contributors.lyricists:
-                            lyricists_names_list.append(k)
-                        lyricists_names = "|##|".join(lyricists_names_list)
-                        music_result.lyricists = lyricists_names
-
-                if primary_music_result.lyrics and primary_music_result.lyrics.copyrights:
-                    lyrics_copyrights_list = []
-                    for ly in primary_music_result.lyrics.copyrights:
-                        lyrics_copyrights_list.append(ly)
-                    lyrics_copyrights = "|##|".join(lyrics_copyrights_list)
-                    music_result.lyrics = lyrics_copyrights
-                else:
-                    music_result.lyrics = None
-
-                if primary_music_result.artists:
-                    artists_names_list = []
-                    for a in primary_music_result.artists:
-                        artists_names_list.append(a.name)
+        if response.status.code != ACRCloudStatusCode.ACR_ERR_CODE_OK:
+            return custom_file_result
 
-                    artists_names = "|##|".join(artists_names_list)
-                    music_result.artists_names = artists_names
+        custom_files_results = response.metadata.custom_files
 
-                similar_results = music_results[1:]
-                music_result.similar_results = similar_results
-                music_result.primary_result = primary_music_result
+        if custom_files_results:
 
-                if self.with_duration:
-                    if music_result.sample_begin_time_offset_ms is None:
-                        logger.error('Please contact us (support@acrcloud.com) to get the \'played duration\' feature '
-                                     'permission')
-                    else:
-                        music_result.played_duration_ms = \
-                            music_result.sample_end_time_offset_ms - music_result.sample_begin_time_offset_ms
-                        music_result.db_begin_time_offset_ms = primary_music_result.db_begin_time_offset_ms
-                        music_result.db_end_time_offset_ms = primary_music_result.db_end_time_offset_ms
+            primary_result = custom_files_results[0]
 
-            # custom file
+            for k in CUSTOM_FILE_RESULT_FIELDS:
+                setattr(custom_file_result, k, getattr(primary_result, k))
 
-            custom_files_results = response.metadata.custom_files
+            similar_results = custom_files_results[1:]
+            custom_file_result.similar_results = similar_results
+            custom_file_result.primary_result = primary_result
 
-            if custom_files_results:
-
-                primary_result = custom_files_results[0]
-
-                keys = primary_result.to_dict()
-
-                for k in keys:
-                    custom_file_result.__setattr__(k, primary_result.__getattribute__(k))
-
-                similar_results = custom_files_results[1:]
-                custom_file_result.similar_results = similar_results
-                custom_file_result.primary_result = primary_result
-
-                if self.with_duration:
-                    if custom_file_result.sample_begin_time_offset_ms is None:
-                        logger.error('Please contact us (support@acrcloud.com) to get the \'played duration\' feature '
-                                     'permission')
-                    else:
-                        custom_file_result.played_duration_ms = \
-                            custom_file_result.sample_end_time_offset_ms - \
-                            custom_file_result.sample_begin_time_offset_ms
+            if self.with_duration:
+                if custom_file_result.sample_begin_time_offset_ms is None:
+                    logger.error('Please contact us (support@acrcloud.com) to get the \'played duration\' feature '
+                                 'permission')
+                else:
+                    custom_file_result.played_duration_ms = \
+                        custom_file_result.sample_end_time_offset_ms - \
+                        custom_file_result.sample_begin_time_offset_ms
 
-        return music_result, custom_file_result
+        return custom_file_result
 
-    def _compare_two_results(self, results, results_a_index: int, results_b_index: int) -> bool:
+    def _compare_two_results(self, results_a, results_b) -> bool:
         """
         compare two results, determine which should be selected
-        :param results_a_index:
-        :param results_b_index:
+        :param results_a:
+        :param results_b:
         :return:
         """
+        results_a_stats = self.results_counter[results_a.acrid]
+        results_b_stats = self.results_counter[results_b.acrid]
+
         # first: compare the appear times
-        results_a = results[results_a_index]
-        results_b = results[results_b_index]
-        results_a_count = self.results_counter[results_a.acrid].get('count')
-        results_b_count = self.results_counter[results_b.acrid].get('count')
-        if abs(results_a_count - results_b_count) > 1:
-            if results_a_count > results_b_count:
+        if abs(results_a_stats.count - results_b_stats.count) > 1:
+            if results_a_stats.count > results_b_stats.count:
                 return True
             return False
 
         # second: compare the confidence score
-        results_a_score_sum = self.results_counter[results_a.acrid].get('score_sum')
-        results_b_score_sum = self.results_counter[results_b.acrid].get('score_sum')
-
-        if abs(results_a_score_sum - results_b_score_sum) > 5:
-            if results_a_score_sum > results_b_score_sum:
+        if abs(results_a_stats.score_sum - results_b_stats.score_sum) > 5:
+            if results_a_stats.score_sum > results_b_stats.score_sum:
                 return True
             return False
 
         # third:  compare the amount of the metadata.
-        keys = results_a.to_dict()
-        count_a_attr = len([i for i in keys if results_a.__getattribute__(i)])
-        count_b_attr = len([i for i in keys if results_b.__getattribute__(i)])
+        count_a_attr = results_a.populated_fields_count
+        if count_a_attr is None:
+            count_a_attr = results_a.count_populated_fields()
+        count_b_attr = results_b.populated_fields_count
+        if count_b_attr is None:
+            count_b_attr = results_b.count_populated_fields()
 
         if count_a_attr >= count_b_attr:
             return True
 
         return False
 
-    def _is_continuous(self, results, results_a_index: int, results_b_index: int) -> bool:
+    def _is_continuous(self, results_a, results_m, results_b) -> bool:
         """
         determine if two results are continuous
-        :param results_a_index:
-        :param results_b_index:
+        :param results_a:
+        :param results_m: the result between them
+        :param results_b:
         :return:
         """
-
-        results_a = results[results_a_index]
-        results_b = results[results_b_index]
-
-        results_m = results[results_a_index + 1]
-
         if results_a.db_end_time_offset_ms + results_m.played_duration_ms \
                 - results_b.db_begin_time_offset_ms < self.filter_time_threshold:
             return True
@@ -319,257 +627,186 @@ class ACRCloudScan:
         deep filter (only can run after 'merge_results'
         :return: filtered results List[MusicResult]
         """
-        # results = self.music_results
+        if self.uses_columnar_backend:
+            return self._filter_results_columnar(results)
+
         self.results_counter = {}
         # count every single result
         for result in results:
+            # the fields may have changed since they were counted (merge_results)
+            result.populated_fields_count = None
             if result.status_code == ACRCloudStatusCode.ACR_ERR_CODE_OK:
-                if not self.results_counter.get(result.acrid):
-                    self.results_counter[result.acrid] = {
-                        'count': 0,
-                        'raw_result': result.primary_result,
-                        'score_sum': 0
-                    }
+                acrid_stats = self.results_counter.get(result.acrid)
+                if acrid_stats is None:
+                    acrid_stats = self.results_counter[result.acrid] = AcridStats()
+
+                acrid_stats.count += 1
+                acrid_stats.score_sum += result.score
 
-                self.results_counter[result.acrid]['count'] += 1
-                self.results_counter[result.acrid]['score_sum'] += result.score
+        if not results:
+            return []
 
+        # the filtered results, the last one is the previous result of the current one
+        filtered_results = [results[0]]
+        results_count = len(results)
         index = 1
         # traverse the whole results list
-        while True:
-            if index >= len(results) - 1:
-                break
+        while index < results_count:
             current_result = results[index]
-            if current_result.status_code == ACRCloudStatusCode.NO_RESULT_CODE:
-                # if face a no result record. use fuzzywuzzy to determine the previous and next titles are similar
-                # because there are different versions of the same music in the database
-                # e.g. Hello, Hello (Remix), Hello (feat. acr)
-
-                if is_title_similar_or_equal(results[index - 1].title, results[index + 1].title,
-                                             self.filter_title_threshold):
-                    # if the title is the same, should consider the time should be increased
-                    # previous_db_end_time + current_played_duration < next_start_time
-                    # cause may have some error, so if the difference value < 10 seconds
-                    # it should be considered continuous
-                    if self._is_continuous(results, index - 1, index + 1):
-                        # Because different record may have different similar results, merge them.
-                        merged_results = self._merge_similar_results(results[index - 1].similar_results,
-                                                                     results[index + 1].similar_results)
-                        # 删除当前记录
-                        # delete current no result record
-                        results.pop(index)
-                        # 当前这个无结果的记录被删除 index 要 -1
-                        # 现在的 index 就是之前的 index+1
-                        if self._compare_two_results(results, index - 1, index):
-                            # choose previous record
-                            results[index - 1].similar_results = merged_results
-                            results[index - 1].end_time_ms = results[index].end_time_ms
-                            results[index - 1].db_end_time_offset_ms = results[index].db_end_time_offset_ms
-                            # re-calculate the played_duration
-                            results[index - 1].played_duration_ms = results[index - 1].end_time_ms - results[
-                                index - 1].start_time_ms
-
-                            results.pop(index)
-                            # delete record behind no-result record 删除后面这个记录, 不需要修改index
-                            # no need to change the index
-                        else:
-                            # choose next record
-                            results[index].similar_results = merged_results
-                            results[index].start_time_ms = results[index - 1].start_time_ms
-                            results[index].db_begin_time_offset_ms = results[index - 1].db_begin_time_offset_ms
-                            results[index].played_duration_ms = \
-                                results[index].end_time_ms - results[index].start_time_ms
-                            results.pop(index - 1)
-                            index -= 1
-                            # delete previous record the index need - 1 删除了之前的记录，需要把index -1
-
-                        # when the current index been deleted, all the follows index should minus 1
-                        index -= 1
+            if current_result.status_code == ACRCloudStatusCode.NO_RESULT_CODE and index < results_count - 1 \
+                    and filtered_results:
+                consumed = self._merge_around_no_result(filtered_results, current_result, results[index + 1])
+                if consumed:
+                    index += consumed
+                    continue
+
+            filtered_results.append(current_result)
             index += 1
+
+        return filtered_results
+
+    def _filter_results_columnar(self, results) -> List[MusicResult]:
         """
-        1. played duration
-        2. db_end_time
+        _filter_results with the columnar backend: the results are counted with NumPy,
+        and only the no result records are visited, the records between them are kept as they are
+        :return: filtered results List[MusicResult]
         """
+        self.results_counter = {}
+        if not results:
+            return []
+
+        acrids, counts, score_sums = count_acrids(results)
+        for acrid, count, score_sum in zip(acrids, counts.tolist(), score_sums.tolist()):
+            acrid_stats = self.results_counter[acrid] = AcridStats()
+            acrid_stats.count = count
+            acrid_stats.score_sum = score_sum
+
+        filtered_results = [results[0]]
+        index = 1
+        for position in no_result_positions(results).tolist():
+            if position < index:
+                # dropped with a merged result
+                continue
+            filtered_results += results[index:position]
+            index = position
+            if filtered_results:
+                current_result = results[position]
+                # the fields may have changed since they were counted (merge_results)
+                filtered_results[-1].populated_fields_count = None
+                results[position + 1].populated_fields_count = None
+                consumed = self._merge_around_no_result(filtered_results, current_result, results[position + 1])
+                if consumed:
+                    index += consumed
+                    continue
+            filtered_results.append(results[position])
+            index += 1
+        filtered_results += results[index:]
+
+        return filtered_results
 
-        return results
+    def _merge_around_no_result(self, filtered_results: list, current_result, next_result) -> int:
+        """
+        merge the results around a no result record if they are the same title and continuous
+        :param filtered_results: the filtered results, the last one is the previous result
+        :param current_result: the no result record
+        :param next_result: the next result
+        :return: the number of records consumed: 2 (the previous result is kept), 1 (the next result is kept and
+        becomes the current one) or 0 (not merged)
+        """
+        # if face a no result record. use fuzzywuzzy to determine the previous and next titles are similar
+        # because there are different versions of the same music in the database
+        # e.g. Hello, Hello (Remix), Hello (feat. acr)
+        previous_result = filtered_results[-1]
+
+        # if the title is the same, should consider the time should be increased
+        # previous_db_end_time + current_played_duration < next_start_time
+        # cause may have some error, so if the difference value < 10 seconds
+        # it should be considered continuous
+        if not (self.title_similarity.is_similar_or_equal(previous_result.title, next_result.title,
+                                                          self.filter_title_threshold)
+                and self._is_continuous(previous_result, current_result, next_result)):
+            return 0
+
+        # Because different record may have different similar results, merge them.
+        merged_results = self._merge_similar_results(previous_result.similar_results, next_result.similar_results)
+        # the current no result record is dropped
+        if self._compare_two_results(previous_result, next_result):
+            # choose previous record, drop the next record
+            previous_result.similar_results = merged_results
+            previous_result.end_time_ms = next_result.end_time_ms
+            previous_result.db_end_time_offset_ms = next_result.db_end_time_offset_ms
+            # re-calculate the played_duration
+            previous_result.played_duration_ms = previous_result.end_time_ms - previous_result.start_time_ms
+            previous_result.populated_fields_count = None
+            return 2
+
+        # choose next record, drop the previous record
+        next_result.similar_results = merged_results
+        next_result.start_time_ms = previous_result.start_time_ms
+        next_result.db_begin_time_offset_ms = previous_result.db_begin_time_offset_ms
+        next_result.played_duration_ms = next_result.end_time_ms - next_result.start_time_ms
+        next_result.populated_fields_count = None
+        filtered_results.pop()
+        # the next record becomes the current one
+        return 1
 
     def _swap_result(self):
         pass
 
     def _merge_results_with_simple_filter(self, results) -> list:
         """
-        Merge the results
+        Merge the results (see ResultsMerger)
         :return:
         """
-        merged_results = []
-
-        if results:
-
-            # init
-            if results[0].sample_begin_time_offset_ms:
-                # 如果第一个 result 有识别到结果，把开始时间改为 sample_begin_time_offset_ms
-                results[0].start_time_ms = results[0].sample_begin_time_offset_ms
-
-            # 先把第 0 个元素给 merged_results 初始化 merged_results
-            merged_results = [results[0], ]
-
-            results_count = len(results)
-            # 从第 1 个元素开始遍历
-            for i in range(1, results_count):
-
-                # 上一个结果
-                last_result = merged_results[-1]
+        if self.uses_columnar_backend:
+            return ColumnarResultsMerger(self.filter_title_threshold, self.title_similarity).merge(results)
 
-                # 不同文件,直接跳过后面的处理。
-                if results[i].filename != last_result.filename:
-                    merged_results.append(results[i])
-                    continue
-
-                # 判断 前一个 result 是否在当前的 similar result 里
-                # Determine whether the previous result is in the current similar result
-                # 在的话就把它换出来，然后把当前的 result 放进 similar 里
-                # If so, just swap it out and put the current result into the similar
-
-                if results[i].status_code == ACRCloudStatusCode.ACR_ERR_CODE_OK:
-                    if results[i].similar_results:
-                        for sr in results[i].similar_results:
-                            # compare
-                            if last_result.acrid == sr.acrid:
-                                results[i].title = sr.title
-                                results[i].acrid = sr.acrid
-                                if hasattr(results[i], 'audio_id'):
-                                    results[i].audio_id = sr.audio_id
-                                    results[i].bucket_id = sr.bucket_id
-                                results[i].score = 100
-                                results[i].sample_begin_time_offset_ms = sr.sample_begin_time_offset_ms
-                                results[i].sample_end_time_offset_ms = sr.sample_end_time_offset_ms
-
-                                results[i].played_duration_ms = \
-                                    sr.sample_end_time_offset_ms - sr.sample_begin_time_offset_ms
-
-                                # swap
-                                results[i].similar_results.append(results[i].primary_result)
-                                results[i].primary_result = sr
-                                results[i].similar_results.remove(sr)
-                                break
-
-                # 如果当前这条记录跟上一条记录 title 一样
-                # If the current record is the same as the previous title
-                if is_title_similar_or_equal(results[i].title, last_result.title,
-                                             self.filter_title_threshold):
-                    # if self.results[i].title.lower() == last_result.title.lower():
-                    # 这里要加个 db_offset
-                    # 如果有识别到结果的，就把结束时间 改为sample_end_time_offset_ms
-                    if results[i].sample_end_time_offset_ms:
-
-                        end_time_ms = results[i].start_time_ms + results[i].sample_end_time_offset_ms
-
-                        last_result.end_time_ms = end_time_ms
-
-                        last_result.played_duration_ms = last_result.end_time_ms - last_result.start_time_ms
-
-                        # 合并 similar results 并且 将 score 改为最高的
-
-                        for csr in results[i].similar_results:
-                            is_duplicate = False
-                            for lsr in last_result.similar_results:
-                                if csr.acrid == lsr.acrid:
-                                    is_duplicate = True
-                                    if csr.score > lsr.score:
-                                        lsr.score = csr.score
-                            if not is_duplicate:
-                                last_result.similar_results.append(csr)
-                    else:
-                        # no result
-                        last_result.played_duration_ms += results[i].played_duration_ms
-                        last_result.end_time_ms = results[i].end_time_ms
-
-                    # 两次以上加起来的播放时间如果大于 10 基本确定100%了
-                    # if the playerd duration > 10 it can be considered 100% confidence score
-                    if last_result.status_code == ACRCloudStatusCode.ACR_ERR_CODE_OK \
-                            and last_result.played_duration_ms > 10 * 1000:
-                        last_result.score = 100
-
-                else:
-                    # 当前这条记录跟上一条记录不一样
-                    # 如果有结果更改,开始时间为识别到结果的 sample offset
-                    if results[i].sample_begin_time_offset_ms:
-                        results[i].start_time_ms += results[i].sample_begin_time_offset_ms
-
-                        results[i].end_time_ms = results[i].start_time_ms + results[i].sample_end_time_offset_ms
-
-                    # 初始化当前的结果的开始时间为上一个结果的结束时间
-
-                    # 对 No Result 的处理
-                    if last_result.status_code == ACRCloudStatusCode.NO_RESULT_CODE:
-                        last_result.end_time_ms = results[i].start_time_ms
-                        last_result.played_duration_ms = last_result.end_time_ms - last_result.start_time_ms
-
-                    if results[i].status_code == ACRCloudStatusCode.NO_RESULT_CODE:
-                        last_result.end_time_ms = last_result.start_time_ms + last_result.played_duration_ms
-                        results[i].start_time_ms = last_result.end_time_ms
-                        results[i].played_duration_ms = results[i].end_time_ms - results[i].start_time_ms
-
-                    # 只有不一样的时候需要加入到结果中，因为一样的话只需要修改前一个结果
-                    merged_results.append(results[i])
-
-                # # handle millisecond to second error
-                # # Forced change the next result's start_time to last result's end time
-                if i < results_count - 1:
-                    r = results[i]
-                    r_next = results[i + 1]
-                    if r.filename == r_next.filename:
-                        r_current_end = int(r.end_time_ms / 1000)
-                        r_next_start = int(r_next.start_time_ms / 1000)
-                        if r_current_end - r_next_start > 0:
-                            r_next.start_time_ms = r.end_time_ms
-
-        return merged_results
+        return ResultsMerger(self.filter_title_threshold, self.title_similarity).merge(results)
 
     @staticmethod
     def _merge_similar_results(results_a: List[Music], results_b: List[Music]) -> List[Music]:
         """
-        Merge two List[Music] to a single List[Music] (Union Set) and change the score.
+        Merge two List[Music] to a single List[Music] (Union Set by acrid) and keep the highest score.
+        The results are shared, a result is only copied when its score changes.
+        Nothing is merged into an empty results_a (as the merge always did): the similar results
+        count in the metadata amount of _compare_two_results.
         :param results_a:
         :param results_b:
         :return: merged List[Music]
         """
-        import copy
-
-        merged_results = copy.deepcopy(results_a)
-
-        for a_result in results_a:
-            for b_result in results_b:
-                is_exists = False
+        if not results_a:
+            return []
 
-                if a_result.acrid == b_result.acrid:
-                    is_exists = True
-                    if a_result.score < b_result.score:
-                        a_result.score = b_result.score
-
-                if not is_exists:
-                    merged_results.append(b_result)
+        merged_results = []
+        merged_index = {}
+
+        for result in chain(results_a, results_b or []):
+            i = merged_index.get(result.acrid)
+            if i is None:
+                merged_index[result.acrid] = len(merged_results)
+                merged_results.append(result)
+            elif merged_results[i].score < result.score:
+                merged_result = copy.copy(merged_results[i])
+                merged_result.score = result.score
+                merged_results[i] = merged_result
 
         return merged_results
 
+    _parse_similar_results = staticmethod(parse_similar_results)
+
     @staticmethod
-    def _parse_similar_results(similar_results) -> list:
+    def _write_results(writer, results: list) -> None:
         """
-        Get similar results
-        :param similar_results:
+        write the results with a result writer (see exporters)
+        :param writer:
+        :param results:
         :return:
         """
-
-        similar_results_list = []
-
-        if similar_results:
-            try:
-                similar_results_list = [f'{sr.get("title")} [{sr.get("score")}|{sr.get("acrid")}]'
-                                        for sr in similar_results]
-            except Exception as e:
-                print(str(e))
-
-        return similar_results_list
+        try:
+            for r in results:
+                writer.write(r)
+        finally:
+            writer.close()
 
     def export_to_csv(self, results: list, report_filename: str) -> None:
         """
@@ -578,34 +815,7 @@ class ACRCloudScan:
         :param report_filename:
         :return:
         """
-        if not any(results):
-            return
-
-        suffix = '.csv'
-
-        keys = list(results[0].to_dict().keys())
-        # using utf-8-sig: Avoid using excel display wrong characters. F Microsoft.
-
-        keys.insert(3, 'start_time')
-        keys.insert(4, 'end_time')
-        # move start_time_ms and end_time_ms to the end
-        keys.remove('start_time_ms')
-        keys.remove('end_time_ms')
-        keys += ['start_time_ms', 'end_time_ms']
-
-        report_full_filename = f'{report_filename}{suffix}'
-
-        with open(report_full_filename, 'w', encoding="utf-8-sig") as f:
-            dict_writer = csv.DictWriter(f, keys)
-            dict_writer.writeheader()
-            for r in results:
-                res = r.to_dict()
-                res['similar_results'] = '|##|'.join(self._parse_similar_results(res['similar_results']))
-                res['start_time'] = get_human_readable_time(res['start_time_ms'] / 1000)
-                res['end_time'] = get_human_readable_time(res['end_time_ms'] / 1000)
-                dict_writer.writerow(res)
-
-        logger.info(f'The results are exported in {report_full_filename}')
+        self._write_results(CsvResultWriter(report_filename), results)
 
     def export_to_different_csv(self, results: list, report_filename: str) -> None:
         """
@@ -615,39 +825,7 @@ class ACRCloudScan:
         :param report_filename
         :return:
         """
-        suffix = '.csv'
-        keys = list(results[0].to_dict().keys())
-        keys.insert(3, 'start_time')
-        keys.insert(4, 'end_time')
-        # move start_time_ms and end_time_ms to the end
-        keys.remove('start_time_ms')
-        keys.remove('end_time_ms')
-        keys += ['start_time_ms', 'end_time_ms']
-
-        report_filenames = []
-        tmp = ''
-        for r in results:
-            if tmp != r.filename:
-                tmp = r.filename
-                report_full_filename = f'{report_filename}_{r.filename}{suffix}'
-                report_filenames.append(report_full_filename)
-                with open(report_full_filename, 'w', encoding="utf-8-sig") as f:
-                    dict_writer = csv.DictWriter(f, keys)
-                    dict_writer.writeheader()
-
-        for r in results:
-            report_full_filename = f'{report_filename}_{r.filename}{suffix}'
-
-            with open(report_full_filename, 'a', encoding="utf-8-sig") as f:
-                dict_writer = csv.DictWriter(f, keys)
-                res = r.to_dict()
-                res['similar_results'] = '|##|'.join(self._parse_similar_results(res['similar_results']))
-                res['start_time'] = get_human_readable_time(res['start_time_ms'] / 1000)
-                res['end_time'] = get_human_readable_time(res['end_time_ms'] / 1000)
-                dict_writer.writerow(res)
-
-        for i in report_filenames:
-            logger.info(f'The results are exported in {i}')
+        self._write_results(SplitCsvResultWriter(report_filename), results)
 
     @staticmethod
     def export_to_json(results: list, report_filename: str):
@@ -657,70 +835,230 @@ class ACRCloudScan:
         :param report_filename:
         :return:
         """
-        if not any(results):
-            return
-        suffix = '.json'
-        report_full_filename = f'{report_filename}{suffix}'
-        result_dict = []
-        for res in results:
-            result_dict.append(res.to_dict())
-
-        with open(report_full_filename, 'w', encoding="utf-8") as f:
-            f.write(json.dumps(result_dict))
-
-        logger.info(f'The results are exported in {report_full_filename}')
+        ACRCloudScan._write_results(JsonResultWriter(report_filename), results)
 
     def export(self, results: list, report_filename: str, output_format):
-        if output_format == 'json':
-            self.export_to_json(results, report_filename)
-        else:
-            if self.split_results:
-                self.export_to_different_csv(results, report_filename)
-            else:
-                self.export_to_csv(results, report_filename)
+        self._write_results(create_result_writer(report_filename, output_format, self.split_results,
+                                                 self.gzip_reports, flush_results=False, fields=self.report_fields),
+                            results)
 
-    def scan_target(self, target: str):
+    @staticmethod
+    def _get_file_list(target: str) -> list:
         """
-        scan a target (a file or a folder)
-        :param target: target path
-        :return:
+        list the files to scan
+        :param target: target path (a file or a folder)
+        :return: the files
         """
         if not os.path.exists(target):
             logger.warning(f'Not Exist {target}')
             sys.exit()
 
-        total_music_results = []
-        total_custom_file_results = []
-
+        file_list = []
         if os.path.isfile(target):
-            # scan a single file
-            music_results, custom_file_results = self._scan(target)
-            total_music_results = music_results
-            total_custom_file_results = custom_file_results
+            file_list.append(target)
         elif os.path.isdir(target):
-            # scan folder
-            file_list = []
             for root, dirnames, filenames in os.walk(target):
                 for filename in filenames:
                     full_filename = os.path.join(root, filename)
                     file_list.append(full_filename)
             logger.info(f'file list: {file_list}')
+        return file_list
+
+    def scan_target(self, target: str):
+        """
+        scan a target (a file or a folder)
+        :param target: target path
+        :return:
+        """
+        total_music_results = []
+        total_custom_file_results = []
+
+        for music_results, custom_file_results in self._scan_files(self._get_file_list(target)):
+            self._add_results(total_music_results, total_custom_file_results, music_results, custom_file_results)
+        return total_music_results, total_custom_file_results
+
+    async def scan_target_async(self, target: str):
+        """
+        coroutine version of scan_target, all the segment requests of all the files are sent
+        from one event loop, with up to `concurrency` requests in flight.
+        `concurrency` workers take the files from a bounded queue, the results are collected in file order.
+        :param target: target path
+        :return:
+        """
+        total_music_results = []
+        total_custom_file_results = []
+
+        file_list = self._get_file_list(target)
+        if self._async_recognizer is None:
+            # the fingerprint and response caches are shared with the sync recognizer
+            self._async_recognizer = AsyncACRCloudRecognizer(self.config, caches=self._recognizer)
+        slots = max(self.concurrency, 1)
+        request_semaphore = asyncio.Semaphore(slots)
+        queue = asyncio.Queue(slots)
+        loop = asyncio.get_running_loop()
+
+        async def scan_worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                file, future = item
+                try:
+                    future.set_result(await self._scan_async(self._async_recognizer, file, request_semaphore))
+                except Exception as e:
+                    future.set_exception(e)
+
+        def add_results(future):
+            music_results, custom_file_results = future.result()
+            self._add_results(total_music_results, total_custom_file_results, music_results, custom_file_results)
+
+        workers = [asyncio.ensure_future(scan_worker()) for _ in range(slots)]
+        # the files queued or scanned, in file order
+        pending = deque()
+        try:
             for file in file_list:
-                music_results, custom_file_results = self._scan(file)
-                total_music_results += music_results
-                total_custom_file_results += custom_file_results
+                # collect the files in order, so that the results of a file are released once added (or streamed),
+                # at most 2 * slots files are held back by a slow file
+                while pending and (pending[0].done() or len(pending) >= 2 * slots):
+                    future = pending.popleft()
+                    await future
+                    add_results(future)
+                future = loop.create_future()
+                pending.append(future)
+                await queue.put((file, future))
+            for _ in workers:
+                await queue.put(None)
+            while pending:
+                future = pending.popleft()
+                await future
+                add_results(future)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await self._async_recognizer.close()
+
         return total_music_results, total_custom_file_results
 
+    def _scan_files(self, file_list: list):
+        """
+        scan the files one by one, or spread them across `workers` processes
+        :param file_list: the files to scan
+        :return: a generator of the results of every file, in the order of file_list
+        """
+        if self.workers <= 1 or len(file_list) <= 1:
+            for file in file_list:
+                yield self._scan(file)
+            return
+
+        settings = {k: getattr(self, k) for k in self._worker_settings}
+        # pid -> the last counters of the worker, they only grow
+        pool_stats = {}
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_scan_worker,
+                                     initargs=(self.config, settings)) as executor:
+                journaled_segments = [self.journal.pop_file(file) if self.journal else {} for file in file_list]
+                for music_results, custom_file_results, pid, stats in executor.map(_scan_in_worker, file_list,
+                                                                                   journaled_segments):
+                    pool_stats[pid] = stats
+                    yield music_results, custom_file_results
+        finally:
+            for stats in pool_stats.values():
+                _add_scan_stats(self._worker_stats, stats)
+
     def scan_main(self, target: str, output: str, output_format: str) -> None:
         """
         scan a target (a file or a folder)
         :param target: target path
         :param output: output path (must be a folder name)
-        :param output_format: the format of the output report json or csv
+        :param output_format: the format of the output report json, ndjson, csv, parquet or arrow
         """
         logger.info(f'Scan type: {self.scan_type}')
-        total_music_results, total_custom_file_results = self.scan_target(target)
+        if self.report_fields is not None:
+            # main.py checks --fields and report_fields of config.yaml before the scan
+            error = report_fields_error(self.report_fields, self.scan_type)
+            assert error is None, error
+        if output_format in ('parquet', 'arrow'):
+            # before the scan, the reports may only be written at the end
+            import_pyarrow(output_format)
+        if self.results_backend == ResultsBackend.COLUMNAR and import_numpy() is None:
+            logger.warning('The columnar results backend needs numpy, the results are merged with the object backend')
+        if self.gzip_reports and output_format not in ('json', 'ndjson'):
+            logger.warning('Only the json and ndjson reports are compressed')
+        if self.use_async and self.workers > 1:
+            logger.warning('The async scan sends the requests of all the files from one process, '
+                           'the workers setting is ignored')
+        music_output_filename, custom_file_output_filename = self._get_report_filenames(target, output)
+
+        stream_results = self.stream_results and not (self.with_duration and self.filter_results)
+        if self.stream_results and not stream_results:
+            logger.warning('The filtered results can not be streamed, they are exported at the end of the scan')
+        if stream_results:
+            self._result_writers = (
+                self._create_stream_writer(music_output_filename, output_format) if self.scans_music else None,
+                self._create_stream_writer(custom_file_output_filename, output_format)
+                if self.scans_custom_files else None,
+            )
+
+        if self.journal_path:
+            self.journal = ScanJournal(self.journal_path)
+        try:
+            if self.use_async:
+                total_music_results, total_custom_file_results = asyncio.run(self.scan_target_async(target))
+            else:
+                total_music_results, total_custom_file_results = self.scan_target(target)
+        finally:
+            if self.journal:
+                self.journal.close()
+                self.journal = None
+            if self._result_writers:
+                for writer in self._result_writers:
+                    if writer:
+                        writer.close()
+                self._result_writers = None
+
+        # the lanes are finished one after the other, the results of a lane are released once exported
+        if self.scans_music:
+            self._finish_lane(total_music_results, music_output_filename, output_format)
+        del total_music_results
+        if self.scans_custom_files:
+            self._finish_lane(total_custom_file_results, custom_file_output_filename, output_format)
+        del total_custom_file_results
+
+        self._log_scan_stats()
+
+    def _finish_lane(self, results: list, report_filename: str, output_format: str) -> None:
+        """
+        merge, filter and export the results of a lane (the music or the custom file results)
+        :param results:
+        :param report_filename: the report filename without suffix
+        :param output_format: json, ndjson, csv, parquet or arrow
+        """
+        if self.with_duration:
+            results = self._merge_results_with_simple_filter(results)
+            if self.filter_results:
+                results = self._filter_results(results)
+        self.export(results, report_filename, output_format)
 
+    def _create_stream_writer(self, report_filename: str, output_format: str):
+        """
+        create the writer of a streamed report, the results with duration are merged on the fly
+        :param report_filename: the report filename without suffix
+        :param output_format: json, ndjson, csv, parquet or arrow
+        :return:
+        """
+        writer = create_result_writer(report_filename, output_format, self.split_results, self.gzip_reports,
+                                      fields=self.report_fields)
+        if self.with_duration:
+            writer = MergingResultWriter(writer, ResultsMerger(self.filter_title_threshold, self.title_similarity))
+        return writer
+
+    def _get_report_filenames(self, target: str, output: str) -> (str, str):
+        """
+        get the report filenames (without suffix)
+        :param target: target path
+        :param output: output path (a folder or a file)
+        :return: the music report filename and the custom file report filename
+        """
         output_music_filenames = {
             'music': f'{target}_music',
             'merged_music': f'{target}_with_duration_music',
@@ -738,16 +1076,10 @@ class ACRCloudScan:
         if self.with_duration:
             music_output_filename = output_music_filenames['merged_music']
             custom_file_output_filename = output_custom_filenames['merged_custom_file']
-
-            total_music_results = self._merge_results_with_simple_filter(total_music_results)
-            total_custom_file_results = self._merge_results_with_simple_filter(total_custom_file_results)
             if self.filter_results:
                 music_output_filename = output_music_filenames['filtered_music']
                 custom_file_output_filename = output_custom_filenames['filtered_custom_file']
 
-                total_music_results = self._filter_results(total_music_results)
-                total_custom_file_results = self._filter_results(total_custom_file_results)
-
         if is_file(output):
             dirname = os.path.dirname(output)
             create_folders(dirname)  # create
@@ -766,13 +1098,62 @@ class ACRCloudScan:
             music_output_filename = folder_path + target_music_basename
             custom_file_output_filename = folder_path + target_custom_basename
 
-        if self.scan_type == ScanType.SCAN_TYPE_MUSIC:
-            self.export(total_music_results, music_output_filename, output_format)
-            return
-        if self.scan_type == ScanType.SCAN_TYPE_CUSTOM:
-            self.export(total_custom_file_results, custom_file_output_filename, output_format)
-            return
-        if self.scan_type == ScanType.SCAN_TYPE_BOTH:
-            self.export(total_music_results, music_output_filename, output_format)
-            self.export(total_custom_file_results, custom_file_output_filename, output_format)
-            return
+        return music_output_filename, custom_file_output_filename
+
+    def _scan_stats(self) -> dict:
+        """
+        the counters of the recognitions of this process (without the ratios, the counters of processes are added)
+        :return: {name: {counter: value}}
+        """
+        recognizer = self._async_recognizer if self.use_async else self._recognizer
+        pool_stats = recognizer.connection_pool.stats()
+        catalog_stats = self.track_catalog.stats()
+        stats = {'pool': {k: pool_stats[k] for k in ('requests', 'connects', 'reuses', 'resets')},
+                 'retries': {'used': recognizer.retry_budget.used, 'denied': recognizer.retry_budget.denied},
+                 'catalog': {k: catalog_stats[k] for k in ('tracks', 'track_infos', 'hits', 'misses')}}
+        if recognizer.fingerprint_cache:
+            cache_stats = recognizer.fingerprint_cache.stats()
+            stats['fingerprint_cache'] = {k: cache_stats[k] for k in ('hits', 'misses')}
+        if recognizer.response_cache:
+            cache_stats = recognizer.response_cache.stats()
+            stats['response_cache'] = {k: cache_stats[k] for k in ('memory_hits', 'disk_hits', 'misses')}
+        return stats
+
+    def _log_scan_stats(self) -> None:
+        """
+        log the statistics collected during the scan, the ones of the process pool workers are added
+        (a track recognized by several workers is counted once per worker)
+        """
+        stats = {}
+        _add_scan_stats(stats, self._scan_stats())
+        _add_scan_stats(stats, self._worker_stats)
+        pool_stats = stats['pool']
+        logger.info(f'Connection pool: {pool_stats["requests"]} requests, {pool_stats["connects"]} connects, '
+                    f'{pool_stats["resets"]} resets, '
+                    f'reuse ratio {_ratio(pool_stats["reuses"], pool_stats["requests"]):.2%}')
+        budget = self._recognizer.retry_budget.budget
+        if budget is None:
+            budget = 'unlimited'
+        elif self._worker_stats:
+            budget = f'{budget} per worker'
+        logger.info(f'Retries: {stats["retries"]["used"]} used, {stats["retries"]["denied"]} denied by the retry '
+                    f'budget ({budget})')
+        if 'fingerprint_cache' in stats:
+            cache_stats = stats['fingerprint_cache']
+            logger.info(f'Fingerprint cache: {cache_stats["hits"]} hits, {cache_stats["misses"]} misses, '
+                        f'hit ratio {_ratio(cache_stats["hits"], cache_stats["hits"] + cache_stats["misses"]):.2%}')
+        if 'response_cache' in stats:
+            cache_stats = stats['response_cache']
+            hits = cache_stats['memory_hits'] + cache_stats['disk_hits']
+            logger.info(f'Response cache: {cache_stats["memory_hits"]} memory hits, {cache_stats["disk_hits"]} disk '
+                        f'hits, {cache_stats["misses"]} misses, '
+                        f'hit ratio {_ratio(hits, hits + cache_stats["misses"]):.2%}')
+        catalog_stats = stats['catalog']
+        if catalog_stats['tracks']:
+            logger.info(f'Track catalog: {catalog_stats["tracks"]} tracks, {catalog_stats["track_infos"]} metadata '
+                        f'versions, hit ratio '
+                        f'{_ratio(catalog_stats["hits"], catalog_stats["hits"] + catalog_stats["misses"]):.2%}')
+        similarity_stats = self.title_similarity.stats()
+        if similarity_stats['hits'] or similarity_stats['misses']:
+            logger.info(f'Title similarity: {similarity_stats["hits"]} hits, {similarity_stats["misses"]} misses, '
+                        f'hit ratio {similarity_stats["hit_ratio"]:.2%}')
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+
+from .models import Music, TrackInfo
+
+logger = logging.getLogger(__name__)
+
+
+def _album_name(music: Music):
+    return music.album.name or None
+
+
+def _artists_names(music: Music):
+    if music.artists:
+        return "|##|".join([a.name for a in music.artists])
+    return None
+
+
+def _isrc(music: Music):
+    return music.external_ids.isrc or None
+
+
+def _upc(music: Music):
+    return music.external_ids.upc or None
+
+
+def _spotify_id(music: Music):
+    if music.external_metadata.spotify and music.external_metadata.spotify.track:
+        return music.external_metadata.spotify.track.id
+    return None
+
+
+def _youtube_id(music: Music):
+    if music.external_metadata.youtube:
+        return music.external_metadata.youtube.vid
+    return None
+
+
+def _deezer_id(music: Music):
+    if music.external_metadata.deezer and music.external_metadata.deezer.track:
+        return music.external_metadata.deezer.track.id
+    return None
+
+
+def _release_date(music: Music):
+    return music.release_date
+
+
+def _label(music: Music):
+    return music.label
+
+
+def _composers(music: Music):
+    if music.contributors and music.contributors.composers:
+        return "|##|".join(music.contributors.composers)
+    return None
+
+
+def _lyricists(music: Music):
+    if music.contributors and music.contributors.lyricists:
+        return "|##|".join(music.contributors.lyricists)
+    return None
+
+
+def _lyrics(music: Music):
+    if music.lyrics and music.lyrics.copyrights:
+        return "|##|".join(music.lyrics.copyrights)
+    return None
+
+
+def _language(music: Music):
+    return music.language
+
+
+# the getters of the TrackInfo fields, in the order of TrackInfo.fields
+_track_field_getters = (_album_name, _artists_names, _isrc, _upc, _spotify_id, _youtube_id, _deezer_id, _release_date,
+                        _label, _composers, _lyricists, _lyrics, _language)
+
+
+class TrackCatalog:
+    """
+    One copy of the metadata of every track (acrid) of a scan.
+
+    The segments of a long recording recognize the same tracks again and again, every response carries the
+    whole metadata of the tracks. The catalog makes the results of a track share:
+     - the TrackInfo (the metadata fields of MusicResult, with the joined artists, composers, ...)
+     - the metadata objects of the Music objects (album, artists, external metadata, ...)
+    A track whose metadata changes from one response to another gets a copy per version.
+    """
+
+    # the Music fields that only depend on the track
+    music_fields = ('external_ids', 'label', 'release_date', 'genres', 'title', 'external_metadata', 'album',
+                    'artists', 'contributors', 'lyrics', 'language')
+
+    def __init__(self) -> None:
+        # (acrid, the TrackInfo fields) -> TrackInfo
+        self._tracks = {}
+        # acrid -> the first Music of the track
+        self._music = {}
+        self.hits = 0
+        self.misses = 0
+
+    def track_info(self, music: Music, fields=None) -> TrackInfo:
+        """
+        get the shared TrackInfo of the primary result of a segment
+        :param music: the primary result
+        :param fields: the TrackInfo fields to get (the others are None), all of them if None
+        :return:
+        """
+        key = (music.acrid,) + self._track_fields(music, fields)
+        track = self._tracks.get(key)
+        if track is None:
+            self.misses += 1
+            track = self._tracks[key] = TrackInfo(*key[1:], shared=True)
+        else:
+            self.hits += 1
+        return track
+
+    @staticmethod
+    def _track_fields(music: Music, fields=None) -> tuple:
+        """
+        the TrackInfo fields of a Music, in the order of TrackInfo.fields
+        :param fields: get these fields only (the others are None), all of them if None
+        """
+        if fields is None:
+            return tuple(get(music) for get in _track_field_getters)
+        return tuple(get(music) if name in fields else None
+                     for name, get in zip(TrackInfo.fields, _track_field_getters))
+
+    def intern_music(self, music: Music) -> Music:
+        """
+        make a Music object share the metadata objects of the first Music of its track
+        :param music: a Music decoded from a response (Music.from_dict)
+        :return: the music
+        """
+        canonical = self._music.get(music.acrid)
+        if canonical is None:
+            self._music[music.acrid] = music
+            return music
+
+        raw, canonical_raw = music.raw, canonical.raw
+        if raw is None or canonical_raw is None or raw is canonical_raw:
+            return music
+
+        shared = 0
+        for k in self.music_fields:
+            # the same response fields are decoded to the same objects
+            if raw.get(k) == canonical_raw.get(k):
+                setattr(music, k, getattr(canonical, k))
+                shared += 1
+        if shared == len(self.music_fields):
+            # nothing is left to decode, release the response
+            music.raw = canonical_raw
+        return music
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'tracks': len(self._music),
+                'track_infos': len(self._tracks),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0}
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+from operator import attrgetter
+
+from .acrcloud.recognizer import ACRCloudStatusCode
+from .merger import ResultsMerger
+
+logger = logging.getLogger(__name__)
+
+# numpy is imported with the first columnar merge or filter, see import_numpy
+np = None
+
+# lower than any played duration
+_LOWEST = -2 ** 63
+
+
+def import_numpy():
+    """
+    import numpy, the columnar backend needs it
+    :return: the numpy module, or None if numpy is not installed
+    """
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+
+def _column(results: list, name: str):
+    """
+    a column of a field of the results
+    :param results:
+    :param name: the field name
+    :return:
+    """
+    return np.fromiter(map(attrgetter(name), results), dtype=object, count=len(results))
+
+
+def _int_column(results: list, name: str):
+    """
+    an int64 column of a field of the results, None is 0 (the fields are only used when they are truthy)
+    :param results:
+    :param name: the field name
+    :return: the column, or None if a value is not an int
+    """
+    values = list(map(attrgetter(name), results))
+    column = np.array(values)
+    if column.dtype.kind == 'O':
+        column = np.array([v or 0 for v in values])
+    return column if column.dtype.kind == 'i' else None
+
+
+class ColumnarResultsMerger(ResultsMerger):
+    """
+    Merge a whole list of results at once with NumPy columns, the merged results are the ones of ResultsMerger.
+
+    The time fields, the status code, the filename and the title are columns.
+    A result that has the title of the previous result and no similar results always extends the merged result
+    of the previous one, a run of these results is merged in two steps: its first result is merged as ResultsMerger
+    does, the others (the tail of the run) only depend on the columns and are merged with vectorized operations
+    (the start time fix, the played duration sums and the 100% score) for all the tails at once.
+    The other results (a new title, a new file, similar results that may swap) go through the ResultsMerger steps.
+    """
+
+    def merge(self, results: list) -> list:
+        """
+        merge the results (in timestamp order, file by file)
+        :param results: MusicResult or CustomFileResult
+        :return: the merged results
+        """
+        if not results:
+            return []
+
+        columns = self._columns(results) if import_numpy() else None
+        if columns is None:
+            # not numbers only, merge them as ResultsMerger does
+            return super().merge(results)
+
+        start, end, played, sample_end, status, filenames, titles, has_title, has_similar_results = columns
+        n = len(results)
+        ok = ACRCloudStatusCode.ACR_ERR_CODE_OK
+        no_result = ACRCloudStatusCode.NO_RESULT_CODE
+        may_swap = (status == ok) & has_similar_results
+
+        # the previous result fixes the start time (ResultsMerger._previous_result),
+        # it is None for the first result and after a new file
+        has_previous = np.zeros(n, dtype=bool)
+        has_previous[2:] = (filenames[1:-1] == filenames[:-2]) & (filenames[2:] == filenames[1:-1])
+
+        # the results that extend the merged result of the previous result
+        simple = np.zeros(n, dtype=bool)
+        simple[1:] = (filenames[1:] == filenames[:-1]) & (titles[1:] == titles[:-1]) & has_title[1:] \
+            & ~has_similar_results[1:] & ~may_swap[:-1]
+        tail = np.zeros(n, dtype=bool)
+        tail[1:] = simple[1:] & simple[:-1]
+        tails = zip(*_merge_tails(start, end, played, sample_end, has_previous, tail))
+
+        boundaries = np.flatnonzero(~simple).tolist() + [n]
+        start, end, played, sample_end = start.tolist(), end.tolist(), played.tolist(), sample_end.tolist()
+        status, has_previous, may_swap = status.tolist(), has_previous.tolist(), may_swap.tolist()
+        high_scores = set()
+
+        def fix_start_time(i):
+            if has_previous[i] and end[i - 1] // 1000 - start[i] // 1000 > 0:
+                start[i] = end[i - 1]
+
+        def extend(h, i):
+            if sample_end[i]:
+                end[h] = start[i] + sample_end[i]
+                played[h] = end[h] - start[h]
+                self._extend_similar_results(results[h], results[i])
+            else:
+                played[h] += played[i]
+                end[h] = end[i]
+            if status[h] == ok and played[h] > 10 * 1000:
+                high_scores.add(h)
+
+        # init
+        if results[0].sample_begin_time_offset_ms:
+            start[0] = results[0].sample_begin_time_offset_ms
+        heads = [0]
+
+        for i, b in zip(boundaries, boundaries[1:]):
+            if i:
+                h = heads[-1]
+                fix_start_time(i)
+                result, last_result = results[i], results[h]
+                if result.filename != last_result.filename:
+                    # different file, no need to merge
+                    heads.append(i)
+                else:
+                    if may_swap[i]:
+                        for sr in result.similar_results:
+                            if last_result.acrid == sr.acrid:
+                                self._swap_primary_result(result, sr)
+                                sample_end[i] = result.sample_end_time_offset_ms or 0
+                                played[i] = result.played_duration_ms
+                                break
+
+                    if self.title_similarity.is_similar_or_equal(result.title, last_result.title,
+                                                                 self.title_threshold):
+                        extend(h, i)
+                    else:
+                        # the current record is different from the previous one
+                        if result.sample_begin_time_offset_ms:
+                            start[i] += result.sample_begin_time_offset_ms
+                            end[i] = start[i] + sample_end[i]
+                        if status[h] == no_result:
+                            end[h] = start[i]
+                            played[h] = end[h] - start[h]
+                        if status[i] == no_result:
+                            end[h] = start[h] + played[h]
+                            start[i] = end[h]
+                            played[i] = end[i] - start[i]
+                        heads.append(i)
+
+            # the run of results that extend the merged result
+            h = heads[-1]
+            if i + 1 < b:
+                fix_start_time(i + 1)
+                extend(h, i + 1)
+            if i + 2 < b:
+                max_played_before, max_played_after, is_after, final_played, final_end = next(tails)
+                if status[h] == ok and (max_played_before != _LOWEST and played[h] + max_played_before > 10 * 1000
+                                        or max_played_after != _LOWEST and max_played_after - start[h] > 10 * 1000):
+                    high_scores.add(h)
+                played[h] = final_played - start[h] if is_after else played[h] + final_played
+                end[h] = final_end
+
+        merged_results = []
+        for h in heads:
+            merged_result = results[h]
+            merged_result.start_time_ms = start[h]
+            merged_result.end_time_ms = end[h]
+            merged_result.played_duration_ms = played[h]
+            if h in high_scores:
+                merged_result.score = 100
+            merged_results.append(merged_result)
+        return merged_results
+
+    @staticmethod
+    def _columns(results: list):
+        """
+        the columns of the results
+        :param results:
+        :return: the columns, or None if a time field is not an int
+        """
+        int_columns = [_int_column(results, 'start_time_ms'),
+                       _int_column(results, 'end_time_ms'),
+                       _int_column(results, 'played_duration_ms'),
+                       _int_column(results, 'sample_end_time_offset_ms'),
+                       _int_column(results, 'status_code')]
+        if any(c is None for c in int_columns):
+            return None
+
+        titles = _column(results, 'title')
+        return int_columns + [_column(results, 'filename'),
+                              titles,
+                              titles.astype(bool),
+                              _column(results, 'similar_results').astype(bool)]
+
+
+def _merge_tails(start, end, played, sample_end, has_previous, tail):
+    """
+    merge the tails of the runs (the results of a run but the first one): the previous result of a tail result
+    is a result of the run, it is not changed by the merge
+    :param tail: the mask of the tail results
+    :return: for every tail: the highest played duration added to the merged result before a recognized result,
+             the highest played duration after a recognized result (the start time of the merged result is not
+             subtracted), whether the final played duration is after a recognized result, the final played duration
+             (added to the merged result if not after a recognized result) and the final end time
+    """
+    positions = np.flatnonzero(tail)
+    m = len(positions)
+    if not m:
+        return [], [], [], [], []
+
+    # fix_start_time
+    previous_end = end[positions - 1]
+    run_start = start[positions]
+    run_start = np.where(has_previous[positions] & (previous_end // 1000 - run_start // 1000 > 0),
+                         previous_end, run_start)
+
+    # extend: the played duration is reset by a recognized result and increased by the others
+    run_sample_end = sample_end[positions]
+    reset = run_sample_end != 0
+    increase = np.where(reset, 0, played[positions])
+    increased = np.cumsum(increase)
+    first = np.flatnonzero(np.diff(positions, prepend=-2) != 1)
+    last = np.append(first[1:], m) - 1
+    tail_first = np.repeat(first, last - first + 1)
+    last_reset = np.maximum.accumulate(np.where(reset, np.arange(m), -1))
+    is_after = last_reset >= tail_first
+    last_reset = np.maximum(last_reset, 0)
+    played_before = increased - increased[tail_first] + increase[tail_first]
+    played_after = run_start[last_reset] + run_sample_end[last_reset] + increased - increased[last_reset]
+
+    max_played_before = np.maximum.reduceat(np.where(is_after, _LOWEST, played_before), first)
+    max_played_after = np.maximum.reduceat(np.where(is_after, played_after, _LOWEST), first)
+    final_played = np.where(is_after[last], played_after[last], played_before[last])
+    final_end = np.where(reset[last], run_start[last] + run_sample_end[last], end[positions[last]])
+    return (max_played_before.tolist(), max_played_after.tolist(), is_after[last].tolist(), final_played.tolist(),
+            final_end.tolist())
+
+
+def count_acrids(results: list):
+    """
+    the appear times and the score sum of every acrid of the recognized results
+    :param results:
+    :return: (acrids, appear times, score sums)
+    """
+    ok = ACRCloudStatusCode.ACR_ERR_CODE_OK
+    recognized = [r for r in results if r.status_code == ok]
+    if not recognized:
+        return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    acrid_codes = {}
+    codes = np.array([acrid_codes.setdefault(r.acrid, len(acrid_codes)) for r in recognized], dtype=np.int64)
+    scores = np.array(list(map(attrgetter('score'), recognized)))
+    counts = np.bincount(codes, minlength=len(acrid_codes))
+    # the scores are added in order
+    score_sums = np.zeros(len(acrid_codes), dtype=scores.dtype)
+    np.add.at(score_sums, codes, scores)
+    return list(acrid_codes), counts, score_sums
+
+
+def no_result_positions(results: list):
+    """
+    the positions of the no result records that have a previous and a next record (see ACRCloudScan._filter_results)
+    :param results:
+    :return:
+    """
+    no_result = ACRCloudStatusCode.NO_RESULT_CODE
+    positions = np.flatnonzero(_column(results, 'status_code') == no_result)
+    return positions[(positions >= 1) & (positions < len(results) - 1)]
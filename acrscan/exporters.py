@@ -0,0 +1,537 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import csv
+import gzip
+import io
+import json
+import logging
+from collections import OrderedDict
+from operator import attrgetter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+from .models import CustomFileResult, MusicResult, ScanType, TrackInfo
+from .utils import get_human_readable_seconds
+
+logger = logging.getLogger(__name__)
+
+# the most split reports open at once
+MAX_OPEN_REPORTS = 256
+
+# pyarrow, imported with the first parquet or arrow report (see import_pyarrow)
+pa = None
+# the results of a row group (parquet) or a record batch (arrow)
+ARROW_BATCH_ROWS = 65536
+# the columns with few distinct values, dictionary encoded in the parquet and arrow reports
+DICTIONARY_COLUMNS = ('filename', 'title', 'acrid', 'label', 'artists_names')
+
+
+def parse_similar_results(similar_results) -> list:
+    """
+    Get similar results
+    :param similar_results:
+    :return:
+    """
+
+    similar_results_list = []
+
+    if similar_results:
+        try:
+            similar_results_list = [f'{sr.get("title")} [{sr.get("score")}|{sr.get("acrid")}]'
+                                    for sr in similar_results]
+        except Exception as e:
+            print(str(e))
+
+    return similar_results_list
+
+
+def json_record(result, fields: tuple = None) -> bytes:
+    """
+    a record of the json reports (utf-8), encoded with orjson if it is installed
+    :param result:
+    :param fields: the report fields, all of them (to_dict) if None
+    :return:
+    """
+    record = result.to_dict() if fields is None else row_serializer(type(result), fields).record(result)
+    if orjson is not None:
+        try:
+            return orjson.dumps(record)
+        except TypeError:
+            # e.g. an int over 64 bits
+            pass
+    return json.dumps(record).encode('utf-8')
+
+
+def csv_fieldnames(result) -> list:
+    """
+    the columns of the csv report
+    :param result: a result (MusicResult or CustomFileResult)
+    :return:
+    """
+    keys = list(result.to_dict().keys())
+
+    keys.insert(3, 'start_time')
+    keys.insert(4, 'end_time')
+    # move start_time_ms and end_time_ms to the end
+    keys.remove('start_time_ms')
+    keys.remove('end_time_ms')
+    keys += ['start_time_ms', 'end_time_ms']
+    return keys
+
+
+def report_fields_error(fields: tuple, scan_type: str = ScanType.SCAN_TYPE_BOTH):
+    """
+    the report fields must be columns of the reports (the music fields are not in the custom file reports and
+    the other way around), and every report of the scan type must have columns
+    :param fields: the report fields
+    :param scan_type: music, custom or both
+    :return: the error message, None if the report fields are valid
+    """
+    music_columns = csv_fieldnames(MusicResult())
+    custom_file_columns = csv_fieldnames(CustomFileResult())
+
+    unknown_fields = [f for f in fields if f not in music_columns and f not in custom_file_columns]
+    if unknown_fields:
+        return f'Unknown report fields: {", ".join(unknown_fields)}'
+    lanes = []
+    if scan_type in (ScanType.SCAN_TYPE_MUSIC, ScanType.SCAN_TYPE_BOTH):
+        lanes.append(('music', music_columns))
+    if scan_type in (ScanType.SCAN_TYPE_CUSTOM, ScanType.SCAN_TYPE_BOTH):
+        lanes.append(('custom file', custom_file_columns))
+    for lane, columns in lanes:
+        if not any(f in columns for f in fields):
+            return f'None of the report fields is a column of the {lane} report ({", ".join(columns)})'
+    return None
+
+
+def format_similar_results(similar_results) -> str:
+    """
+    the similar results column of the csv report (parse_similar_results of the objects, joined)
+    :param similar_results: Music or CustomFile
+    :return:
+    """
+    if not similar_results:
+        return ''
+    return '|##|'.join([f'{sr.title} [{sr.score}|{sr.acrid}]' for sr in similar_results])
+
+
+class RowSerializer:
+    """
+    The rows of the reports of a result class: the columns (csv_fieldnames, or the report fields in their order)
+    are computed once, the values are fetched from the attributes at once, without to_dict.
+    Only the columns of the report fields are fetched and formatted.
+    """
+
+    def __init__(self, result_class, fields: tuple = None) -> None:
+        columns = csv_fieldnames(result_class())
+        self.fieldnames = columns if fields is None else [name for name in fields if name in columns]
+        # the MusicResult track fields are fetched from the TrackInfo, without the properties
+        track_fields = TrackInfo.fields if 'track' in result_class.__slots__ else ()
+
+        def attribute(name):
+            # start_time and end_time are formatted from start_time_ms and end_time_ms
+            if name in ('start_time', 'end_time'):
+                return f'{name}_ms'
+            if name in track_fields:
+                return f'track.{name}'
+            return name
+
+        fetch = attrgetter(*map(attribute, self.fieldnames))
+        # a single attribute is not fetched in a tuple
+        self._fetch = fetch if len(self.fieldnames) > 1 else lambda result: (fetch(result),)
+
+        def index(name):
+            return self.fieldnames.index(name) if name in self.fieldnames else None
+
+        self._start_time = index('start_time')
+        self._end_time = index('end_time')
+        self._similar_results = index('similar_results')
+        # MusicResult.to_dict: the empty lyrics are None
+        self._lyrics = index('lyrics') if 'lyrics' in track_fields else None
+
+    def values(self, result) -> list:
+        """
+        the values of the columns, the times formatted and the similar results not formatted (a list of
+        Music or CustomFile): the rows of the parquet and arrow reports, and the csv rows and json records before
+        their similar results are formatted
+        :param result:
+        :return:
+        """
+        values = list(self._fetch(result))
+        if self._start_time is not None:
+            values[self._start_time] = get_human_readable_seconds(values[self._start_time] // 1000)
+        if self._end_time is not None:
+            values[self._end_time] = get_human_readable_seconds(values[self._end_time] // 1000)
+        if self._lyrics is not None and not values[self._lyrics]:
+            values[self._lyrics] = None
+        return values
+
+    def row(self, result) -> list:
+        """
+        a row of the csv report
+        :param result:
+        :return:
+        """
+        row = self.values(result)
+        if self._similar_results is not None:
+            row[self._similar_results] = format_similar_results(row[self._similar_results])
+        return row
+
+    def record(self, result) -> dict:
+        """
+        a record of the json reports (the fields of to_dict, and start_time and end_time if they are report fields)
+        :param result:
+        :return:
+        """
+        record = self.values(result)
+        if self._similar_results is not None:
+            similar_results = record[self._similar_results]
+            record[self._similar_results] = [sr.to_dict() for sr in similar_results] if similar_results else None
+        return dict(zip(self.fieldnames, record))
+
+
+# (result class, report fields) -> RowSerializer
+_row_serializers = {}
+
+
+def row_serializer(result_class, fields: tuple = None) -> RowSerializer:
+    """
+    the RowSerializer of a result class and report fields, created once
+    :param result_class: MusicResult or CustomFileResult
+    :param fields: the report fields, all of them if None
+    :return:
+    """
+    serializer = _row_serializers.get((result_class, fields))
+    if serializer is None:
+        serializer = _row_serializers[result_class, fields] = RowSerializer(result_class, fields)
+    return serializer
+
+
+class CsvResultWriter:
+    """
+    Write the results to {report_filename}.csv one by one.
+    The file is created with the first result (or appended to without a header), every row is flushed at once
+    unless flush_rows is False. The columns are the report fields (all of them if None).
+    """
+    suffix = '.csv'
+
+    def __init__(self, report_filename: str, append: bool = False, flush_rows: bool = True,
+                 fields: tuple = None) -> None:
+        self.report_full_filename = f'{report_filename}{self.suffix}'
+        self.append = append
+        self.flush_rows = flush_rows
+        self.fields = fields
+        self._file = None
+        self._csv_writer = None
+        self._serializer = None
+
+    def write(self, result) -> None:
+        if self._file is None:
+            # using utf-8-sig: Avoid using excel display wrong characters. F Microsoft.
+            self._file = open(self.report_full_filename, 'a' if self.append else 'w', encoding="utf-8-sig")
+            self._csv_writer = csv.writer(self._file)
+            self._serializer = row_serializer(type(result), self.fields)
+            if not self.append:
+                self._csv_writer.writerow(self._serializer.fieldnames)
+        self._csv_writer.writerow(self._serializer.row(result))
+        if self.flush_rows:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info(f'The results are exported in {self.report_full_filename}')
+
+
+def max_open_reports() -> int:
+    """
+    the most split reports open at once: MAX_OPEN_REPORTS, and at most a quarter of the file descriptors limit
+    (the scan also opens the audio files, the connections and the caches)
+    :return:
+    """
+    if resource is None:
+        return MAX_OPEN_REPORTS
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft_limit == resource.RLIM_INFINITY:
+        return MAX_OPEN_REPORTS
+    return max(1, min(MAX_OPEN_REPORTS, soft_limit // 4))
+
+
+class SplitCsvResultWriter:
+    """
+    Write the results to a report per audio/video file: {report_filename}_{result.filename}.csv
+    The reports stay open (buffered) while the results of their files come, the least recently written one is closed
+    when max_open reports are open. A closed report is appended to when the results of its file come back.
+    """
+
+    def __init__(self, report_filename: str, max_open: int = None, fields: tuple = None) -> None:
+        self.report_filename = report_filename
+        self.max_open = max_open or max_open_reports()
+        self.fields = fields
+        # filename -> CsvResultWriter, the least recently written first
+        self._writers = OrderedDict()
+        self._written_filenames = set()
+
+    def write(self, result) -> None:
+        writer = self._writers.get(result.filename)
+        if writer is None:
+            if len(self._writers) >= self.max_open:
+                _, least_recent_writer = self._writers.popitem(last=False)
+                least_recent_writer.close()
+            writer = self._writers[result.filename] = CsvResultWriter(
+                f'{self.report_filename}_{result.filename}', append=result.filename in self._written_filenames,
+                flush_rows=False, fields=self.fields)
+            self._written_filenames.add(result.filename)
+        else:
+            self._writers.move_to_end(result.filename)
+        writer.write(result)
+
+    def close(self) -> None:
+        while self._writers:
+            _, writer = self._writers.popitem(last=False)
+            writer.close()
+
+
+class JsonResultWriter:
+    """
+    Write the results to {report_filename}.json (a json array) one by one.
+    The file is created with the first result, every record is flushed at once unless flush_records is False.
+    A compressed report ({report_filename}.json.gz) is never flushed by record.
+    The records only have the report fields (all of them if None).
+    """
+    suffix = '.json'
+
+    def __init__(self, report_filename: str, compress: bool = False, flush_records: bool = True,
+                 fields: tuple = None) -> None:
+        self.report_full_filename = f'{report_filename}{self.suffix}{".gz" if compress else ""}'
+        self.compress = compress
+        self.fields = fields
+        # flushing a gzip file ends the compressed block
+        self.flush_records = flush_records and not compress
+        self._file = None
+
+    def _open(self) -> None:
+        if self.compress:
+            # the zlib default level (9 is much slower for a few percent), the small writes are gathered before
+            # they are compressed
+            self._file = io.BufferedWriter(gzip.open(self.report_full_filename, 'wb', compresslevel=6), 1 << 16)
+        else:
+            self._file = open(self.report_full_filename, 'wb')
+
+    def write(self, result) -> None:
+        if self._file is None:
+            self._open()
+            self._file.write(b'[')
+        else:
+            self._file.write(b', ')
+        self._file.write(json_record(result, self.fields))
+        if self.flush_records:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.write(b']')
+            self._file.close()
+            self._file = None
+            logger.info(f'The results are exported in {self.report_full_filename}')
+
+
+class NdjsonResultWriter(JsonResultWriter):
+    """
+    Write the results to {report_filename}.ndjson (a json record per line) one by one.
+    """
+    suffix = '.ndjson'
+
+    def write(self, result) -> None:
+        if self._file is None:
+            self._open()
+        self._file.write(json_record(result, self.fields))
+        self._file.write(b'\n')
+        if self.flush_records:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info(f'The results are exported in {self.report_full_filename}')
+
+
+def import_pyarrow(output_format: str = 'parquet'):
+    """
+    import pyarrow, only the parquet and arrow reports need it
+    :param output_format: parquet or arrow (the error message)
+    :return: the pyarrow module
+    """
+    global pa
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError(f'The {output_format} reports need pyarrow (pip install pyarrow)') from None
+        pa = pyarrow
+    return pa
+
+
+def arrow_schema(fieldnames: list):
+    """
+    the schema of the parquet and arrow reports: the times and the status code are ints, the score is a float,
+    the similar results are a list of (title, score, acrid) and the other columns are strings
+    :param fieldnames: the columns (see RowSerializer)
+    :return:
+    """
+    def column_type(name):
+        if name in DICTIONARY_COLUMNS:
+            return pa.dictionary(pa.int32(), pa.string())
+        if name == 'similar_results':
+            return pa.list_(pa.struct([('title', pa.string()), ('score', pa.float64()), ('acrid', pa.string())]))
+        if name == 'score':
+            return pa.float64()
+        if name == 'status_code' or name.endswith('_ms'):
+            return pa.int64()
+        return pa.string()
+
+    return pa.schema([(name, column_type(name)) for name in fieldnames])
+
+
+def _arrow_array(values: list, arrow_type):
+    """
+    an arrow array of the values of a column
+    :param values:
+    :param arrow_type:
+    :return:
+    """
+    try:
+        return pa.array(values, arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if arrow_type != pa.string():
+            raise
+        # e.g. the int ids (deezer_id, bucket_id) of some responses
+        return pa.array([v if v is None or isinstance(v, str) else str(v) for v in values], arrow_type)
+
+
+class ArrowResultWriter:
+    """
+    Write the results to {report_filename}.parquet, or {report_filename}.arrow (an Arrow IPC file), a row group
+    (record batch) at a time: the results are kept until batch_rows results are written.
+    The DICTIONARY_COLUMNS are dictionary encoded, the similar results are a list column (see arrow_schema).
+    The columns are the report fields (all of them if None).
+    """
+
+    def __init__(self, report_filename: str, output_format: str = 'parquet', batch_rows: int = ARROW_BATCH_ROWS,
+                 fields: tuple = None) -> None:
+        import_pyarrow(output_format)
+        self.report_full_filename = f'{report_filename}.{output_format}'
+        self.output_format = output_format
+        self.batch_rows = batch_rows
+        self.fields = fields
+        self._file_writer = None
+        self._serializer = None
+        self._schema = None
+        self._rows = []
+        # arrow: column -> {value: index}, the dictionaries only grow (an IPC file only has dictionary deltas)
+        self._dictionaries = {}
+
+    def write(self, result) -> None:
+        if self._serializer is None:
+            self._serializer = row_serializer(type(result), self.fields)
+            self._schema = arrow_schema(self._serializer.fieldnames)
+        self._rows.append(self._serializer.values(result))
+        if len(self._rows) >= self.batch_rows:
+            self._write_batch()
+
+    def _dictionary_array(self, name: str, values: list):
+        if self.output_format == 'parquet':
+            # every row group has its dictionary
+            return _arrow_array(values, pa.string()).dictionary_encode()
+        dictionary = self._dictionaries.setdefault(name, {})
+        indices = [None if v is None else dictionary.setdefault(v, len(dictionary)) for v in values]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()),
+                                              _arrow_array(list(dictionary), pa.string()))
+
+    def _write_batch(self) -> None:
+        arrays = []
+        for column, values in zip(self._schema, zip(*self._rows)):
+            if column.name in DICTIONARY_COLUMNS:
+                arrays.append(self._dictionary_array(column.name, values))
+            elif column.name == 'similar_results':
+                arrays.append(pa.array([[{'title': sr.title, 'score': sr.score, 'acrid': sr.acrid} for sr in v]
+                                        if v else None for v in values], column.type))
+            else:
+                arrays.append(_arrow_array(values, column.type))
+        self._rows = []
+        batch = pa.record_batch(arrays, schema=self._schema)
+
+        if self._file_writer is None:
+            if self.output_format == 'parquet':
+                self._file_writer = pa.parquet.ParquetWriter(self.report_full_filename, self._schema,
+                                                             compression='zstd')
+            else:
+                self._file_writer = pa.ipc.new_file(self.report_full_filename, self._schema,
+                                                    options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        self._file_writer.write_batch(batch)
+
+    def close(self) -> None:
+        if self._rows:
+            self._write_batch()
+        if self._file_writer is not None:
+            self._file_writer.close()
+            self._file_writer = None
+            logger.info(f'The results are exported in {self.report_full_filename}')
+
+
+class MergingResultWriter:
+    """
+    Merge the results (see merger.ResultsMerger) before writing them with another writer
+    """
+
+    def __init__(self, writer, merger) -> None:
+        self.writer = writer
+        self.merger = merger
+
+    def write(self, result) -> None:
+        for merged_result in self.merger.push(result):
+            self.writer.write(merged_result)
+
+    def close(self) -> None:
+        try:
+            for merged_result in self.merger.flush():
+                self.writer.write(merged_result)
+        finally:
+            self.writer.close()
+
+
+def create_result_writer(report_filename: str, output_format: str, split_results: bool = False,
+                         compress: bool = False, flush_results: bool = True, fields: tuple = None):
+    """
+    create the writer of a report
+    :param report_filename: the report filename without suffix
+    :param output_format: json, ndjson, csv, parquet or arrow
+    :param split_results: a csv report per audio/video file
+    :param compress: gzip the json and ndjson reports
+    :param flush_results: flush every result at once (the split csv reports are always buffered)
+    :param fields: the report fields, all of them if None
+    :return:
+    """
+    if output_format == 'json':
+        return JsonResultWriter(report_filename, compress, flush_results, fields)
+    if output_format == 'ndjson':
+        return NdjsonResultWriter(report_filename, compress, flush_results, fields)
+    if output_format in ('parquet', 'arrow'):
+        return ArrowResultWriter(report_filename, output_format, fields=fields)
+    if split_results:
+        return SplitCsvResultWriter(report_filename, fields=fields)
+    return CsvResultWriter(report_filename, flush_rows=flush_results, fields=fields)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ScanJournal:
+    """
+    Append-only journal of the raw segment responses of a scan, one json line per segment:
+    {"file": "/abs/path.mp4", "t_ms": 10000, "response": {...}}
+    Every line is flushed at once, the fsync is done in batches.
+
+    The process pool workers write to their own journal files (path.w<pid>),
+    loading a journal reads them all.
+    """
+
+    def __init__(self, path: str, load: bool = True, fsync_every: int = 100, fsync_interval_s: float = 5) -> None:
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval_s = fsync_interval_s
+        self._completed = {}
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.time()
+        self._lock = threading.Lock()
+        if load:
+            self._load()
+
+    @staticmethod
+    def _key(filename: str) -> str:
+        return os.path.abspath(filename)
+
+    def _load(self) -> None:
+        """
+        read the journal (and the journals of the workers)
+        """
+        count = 0
+        for path in [self.path] + sorted(glob.glob(glob.escape(self.path) + '.w*')):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line of an interrupted scan may be truncated
+                        continue
+                    self._completed.setdefault(record['file'], {})[record['t_ms']] = record['response']
+                    count += 1
+        if count:
+            logger.info(f'Journal {self.path}: {count} segments already scanned in {len(self._completed)} files')
+
+    def pop(self, filename: str, t_ms: int):
+        """
+        take the journaled response of a segment
+        :return: the response (dict) or None if the segment has not been scanned
+        """
+        with self._lock:
+            segments = self._completed.get(self._key(filename))
+            if not segments:
+                return None
+            return segments.pop(t_ms, None)
+
+    def pop_file(self, filename: str) -> dict:
+        """
+        take all the journaled responses of a file (to hand them to a worker)
+        :return: {t_ms: response}
+        """
+        with self._lock:
+            return self._completed.pop(self._key(filename), {})
+
+    def extend(self, filename: str, segments: dict) -> None:
+        """
+        add the journaled responses of a file, see pop_file
+        """
+        if segments:
+            with self._lock:
+                self._completed.setdefault(self._key(filename), {}).update(segments)
+
+    def _open(self) -> None:
+        self._file = open(self.path, 'a+', encoding='utf-8')
+        # do not append to a line truncated by an interrupted scan
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != '\n':
+                self._file.write('\n')
+
+    def append(self, filename: str, t_ms: int, response: dict) -> None:
+        """
+        journal the response of a segment
+        """
+        line = json.dumps({'file': self._key(filename), 't_ms': t_ms, 'response': response})
+        with self._lock:
+            if self._file is None:
+                self._open()
+            self._file.write(line + '\n')
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.time() - self._last_sync >= self.fsync_interval_s:
+                self._sync()
+
+    def sync(self) -> None:
+        """
+        fsync the responses not synced yet (at the end of a file)
+        """
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                self._sync()
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
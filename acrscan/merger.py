@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import logging
+from collections import deque
+
+from .acrcloud.recognizer import ACRCloudStatusCode
+from .utils import TitleSimilarity
+
+logger = logging.getLogger(__name__)
+
+
+class ResultsMerger:
+    """
+    Merge the segment results (in timestamp order, file by file) into results with played duration.
+    The results are pushed one by one, a merged result is returned as soon as it is final
+    (the next result has a different title or belongs to another file).
+
+    Only the last merged result and the previous segment result are kept.
+    """
+    # the next results compared at once with the title of the merged result, see merge
+    run_window = 8
+
+    def __init__(self, title_threshold: int, title_similarity: TitleSimilarity = None) -> None:
+        self.title_threshold = title_threshold
+        self.title_similarity = title_similarity or TitleSimilarity()
+        # the merged result still growing
+        self._last_result = None
+        # the previous segment result, it fixes the start time of the next one
+        self._previous_result = None
+
+    def push(self, result, similar: bool = None) -> list:
+        """
+        merge a segment result
+        :param result: MusicResult or CustomFileResult
+        :param similar: the verdict of the title of the result and the title of the merged result, if known
+        :return: the merged results that are final
+        """
+        last_result = self._last_result
+
+        # init
+        if last_result is None:
+            # the first result: change the start time to sample_begin_time_offset_ms if recognized
+            if result.sample_begin_time_offset_ms:
+                result.start_time_ms = result.sample_begin_time_offset_ms
+            self._last_result = result
+            return []
+
+        # handle millisecond to second error
+        # Forced change the start_time to the previous result's end time
+        previous_result = self._previous_result
+        if previous_result is not None and previous_result.filename == result.filename:
+            if int(previous_result.end_time_ms / 1000) - int(result.start_time_ms / 1000) > 0:
+                result.start_time_ms = previous_result.end_time_ms
+
+        # different file, no need to merge
+        if result.filename != last_result.filename:
+            self._last_result = result
+            self._previous_result = None
+            return [last_result]
+
+        self._previous_result = result
+
+        # Determine whether the previous result is in the current similar result
+        # If so, just swap it out and put the current result into the similar
+        sr = self._swapped_result(result, last_result)
+        if sr is not None:
+            self._swap_primary_result(result, sr)
+
+        # If the current record is the same as the previous title
+        if similar is None:
+            similar = self.title_similarity.is_similar_or_equal(result.title, last_result.title,
+                                                                self.title_threshold)
+        if similar:
+            self._extend(last_result, result)
+            return []
+
+        # the current record is different from the previous one
+        # if recognized, the start time is the sample offset
+        if result.sample_begin_time_offset_ms:
+            result.start_time_ms += result.sample_begin_time_offset_ms
+            result.end_time_ms = result.start_time_ms + result.sample_end_time_offset_ms
+
+        if last_result.status_code == ACRCloudStatusCode.NO_RESULT_CODE:
+            last_result.end_time_ms = result.start_time_ms
+            last_result.played_duration_ms = last_result.end_time_ms - last_result.start_time_ms
+
+        if result.status_code == ACRCloudStatusCode.NO_RESULT_CODE:
+            last_result.end_time_ms = last_result.start_time_ms + last_result.played_duration_ms
+            result.start_time_ms = last_result.end_time_ms
+            result.played_duration_ms = result.end_time_ms - result.start_time_ms
+
+        self._last_result = result
+        return [last_result]
+
+    def merge(self, results: list) -> list:
+        """
+        merge the segment results of a list, the same as pushing them one by one and flushing.
+        The title of the merged result is compared with the titles of the next results at once (score_many).
+        :param results: MusicResult or CustomFileResult
+        :return: the merged results
+        """
+        merged_results = []
+        # the verdicts of the next results
+        verdicts = deque()
+        for i, result in enumerate(results):
+            last_result = self._last_result
+            if last_result is not None and not verdicts:
+                titles = []
+                for next_result in results[i:i + self.run_window]:
+                    if next_result.filename != last_result.filename:
+                        break
+                    sr = self._swapped_result(next_result, last_result)
+                    titles.append(sr.title if sr is not None else next_result.title)
+                verdicts.extend(self.title_similarity.score_many(last_result.title, titles, self.title_threshold))
+
+            merged_results += self.push(result, verdicts.popleft() if verdicts else None)
+            if self._last_result is not last_result:
+                # the verdicts were for the previous merged result
+                verdicts.clear()
+        merged_results += self.flush()
+        return merged_results
+
+    def flush(self) -> list:
+        """
+        the end of the results
+        :return: the last merged result
+        """
+        last_result = self._last_result
+        self._last_result = None
+        self._previous_result = None
+        return [last_result] if last_result is not None else []
+
+    @staticmethod
+    def _swapped_result(result, last_result):
+        """
+        the similar result of a recognized result that is the merged result (the same acrid)
+        :return: the similar result, or None
+        """
+        if result.status_code == ACRCloudStatusCode.ACR_ERR_CODE_OK and result.similar_results:
+            for sr in result.similar_results:
+                if last_result.acrid == sr.acrid:
+                    return sr
+        return None
+
+    @staticmethod
+    def _swap_primary_result(result, sr) -> None:
+        """
+        make a similar result the primary result
+        """
+        result.title = sr.title
+        result.acrid = sr.acrid
+        if hasattr(result, 'audio_id'):
+            result.audio_id = sr.audio_id
+            result.bucket_id = sr.bucket_id
+        result.score = 100
+        result.sample_begin_time_offset_ms = sr.sample_begin_time_offset_ms
+        result.sample_end_time_offset_ms = sr.sample_end_time_offset_ms
+
+        result.played_duration_ms = sr.sample_end_time_offset_ms - sr.sample_begin_time_offset_ms
+
+        # swap
+        result.similar_results.append(result.primary_result)
+        result.primary_result = sr
+        result.similar_results.remove(sr)
+
+    @staticmethod
+    def _extend(last_result, result) -> None:
+        """
+        extend the merged result with a result of the same title
+        """
+        # if recognized, the end time is sample_end_time_offset_ms
+        if result.sample_end_time_offset_ms:
+            last_result.end_time_ms = result.start_time_ms + result.sample_end_time_offset_ms
+            last_result.played_duration_ms = last_result.end_time_ms - last_result.start_time_ms
+            ResultsMerger._extend_similar_results(last_result, result)
+        else:
+            # no result
+            last_result.played_duration_ms += result.played_duration_ms
+            last_result.end_time_ms = result.end_time_ms
+
+        # if the played duration > 10 it can be considered 100% confidence score
+        if last_result.status_code == ACRCloudStatusCode.ACR_ERR_CODE_OK \
+                and last_result.played_duration_ms > 10 * 1000:
+            last_result.score = 100
+
+    @staticmethod
+    def _extend_similar_results(last_result, result) -> None:
+        """
+        merge the similar results and keep the highest score
+        """
+        for csr in result.similar_results:
+            is_duplicate = False
+            for lsr in last_result.similar_results:
+                if csr.acrid == lsr.acrid:
+                    is_duplicate = True
+                    if csr.score > lsr.score:
+                        lsr.score = csr.score
+            if not is_duplicate:
+                last_result.similar_results.append(csr)
@@ -4,7 +4,53 @@
 # Do not change this file
 
 
+def _slot_items(obj):
+    """
+    the attributes of a model object (they are slots, the lazy fields are _{name} slots)
+    """
+    for klass in reversed(type(obj).__mro__):
+        for k in getattr(klass, '__slots__', ()):
+            if k == 'raw':
+                continue
+            k = k.lstrip('_')
+            yield k, getattr(obj, k)
+
+
+def _lazy_field(name, decode):
+    """
+    a field decoded from the response (obj.raw) on first access, the slot _{name} is unset until then
+    """
+    slot = '_' + name
+
+    def get_field(self):
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            value = decode(self.raw.get(name))
+            setattr(self, slot, value)
+            return value
+
+    def set_field(self, value):
+        setattr(self, slot, value)
+
+    return property(get_field, set_field)
+
+
+def _decode_items(obj):
+    return [Item.from_dict(i) for i in obj] if obj else None
+
+
+def _decode_custom_files(obj):
+    return [CustomFile.from_dict(c) for c in obj] if obj else None
+
+
+def _decode_music(obj):
+    return [Music.from_dict(m) for m in obj] if obj else None
+
+
 class Status:
+    __slots__ = ('msg', 'code', 'version')
+
     def __init__(self, msg, code, version):
         self.msg = msg
         self.code = code
@@ -14,7 +60,7 @@ class Status:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -32,6 +78,8 @@ class Status:
 
 
 class Response:
+    __slots__ = ('status', 'metadata', 'cost_time', 'result_type')
+
     def __init__(self, status=None, metadata=None, cost_time=None, result_type=None):
         self.status = status
         self.metadata = metadata
@@ -42,7 +90,7 @@ class Response:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -66,29 +114,32 @@ class Response:
 
 
 class Metadata:
+    __slots__ = ('raw', 'timestamp_utc', '_custom_files', '_music')
+
     def __init__(self, timestamp_utc=None, custom_files=None, music=None):
+        self.raw = None
         self.timestamp_utc = timestamp_utc
         self.custom_files = custom_files
         self.music = music
 
+    custom_files = _lazy_field('custom_files', _decode_custom_files)
+    music = _lazy_field('music', _decode_music)
+
     def __repr__(self):
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
     def from_dict(obj):
         if obj:
-            timestamp_utc = obj.get("timestamp_utc")
-            custom_files = obj.get("custom_files")
-            music = obj.get("music")
-
-            return Metadata(timestamp_utc,
-                            [CustomFile.from_dict(c) for c in custom_files] if custom_files else None,
-                            [Music.from_dict(m) for m in music] if music else None
-                            )
+            # the custom files and the music are decoded on first access
+            metadata = Metadata.__new__(Metadata)
+            metadata.raw = obj
+            metadata.timestamp_utc = obj.get("timestamp_utc")
+            return metadata
         else:
             return Metadata()
 
@@ -100,6 +151,8 @@ class Metadata:
 
 
 class ExternalIDS:
+    __slots__ = ('isrc', 'upc')
+
     def __init__(self, isrc=None, upc=None):
         self.isrc = isrc
         self.upc = upc
@@ -108,7 +161,7 @@ class ExternalIDS:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -127,6 +180,8 @@ class ExternalIDS:
 
 
 class Item:
+    __slots__ = ('id', 'name')
+
     def __init__(self, id=None, name=None, ):
         self.id = id
         self.name = name
@@ -135,7 +190,7 @@ class Item:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -156,11 +211,17 @@ class Item:
 
 
 class Deezer:
-    def __init__(self, genres=None, album=Item(), artists=None, track=Item()):
+    __slots__ = ('genres', 'album', 'artists', 'track')
+
+    def __init__(self, genres=None, album=None, artists=None, track=None):
         if genres is None:
             genres = [Item()]
+        if album is None:
+            album = Item()
         if artists is None:
             artists = [Item()]
+        if track is None:
+            track = Item()
         self.genres = genres
         self.album = album
         self.artists = artists
@@ -170,7 +231,7 @@ class Deezer:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -198,9 +259,15 @@ class Deezer:
 
 
 class Spotify:
-    def __init__(self, album=Item(), artists=None, track=Item()):
+    __slots__ = ('album', 'artists', 'track')
+
+    def __init__(self, album=None, artists=None, track=None):
+        if album is None:
+            album = Item()
         if artists is None:
             artists = [Item()]
+        if track is None:
+            track = Item()
         self.album = album
         self.artists = artists
         self.track = track
@@ -209,7 +276,7 @@ class Spotify:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -235,6 +302,8 @@ class Spotify:
 
 
 class Youtube:
+    __slots__ = ('vid',)
+
     def __init__(self, vid=None):
         self.vid = vid
 
@@ -242,7 +311,7 @@ class Youtube:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -259,6 +328,8 @@ class Youtube:
 
 
 class ExternalMetadata:
+    __slots__ = ('youtube', 'spotify', 'deezer')
+
     def __init__(self, youtube=None, spotify=None, deezer=None):
         self.youtube = youtube
         self.spotify = spotify
@@ -268,7 +339,7 @@ class ExternalMetadata:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -290,6 +361,8 @@ class ExternalMetadata:
 
 
 class Contributors:
+    __slots__ = ('composers', 'lyricists')
+
     def __init__(self, composers=None, lyricists=None):
         self.composers = composers
         self.lyricists = lyricists
@@ -298,7 +371,7 @@ class Contributors:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -319,6 +392,8 @@ class Contributors:
 
 
 class Lyrics:
+    __slots__ = ('copyrights',)
+
     def __init__(self, copyrights=None):
         self.copyrights = copyrights
 
@@ -326,7 +401,7 @@ class Lyrics:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -344,6 +419,15 @@ class Lyrics:
 
 
 class Music:
+    __slots__ = ('raw', '_external_ids', 'sample_begin_time_offset_ms', 'sample_end_time_offset_ms', 'label',
+                 'duration_ms', 'acrid', 'db_begin_time_offset_ms', 'play_offset_ms', 'release_date', '_genres',
+                 'score', 'title', '_external_metadata', '_album', 'db_end_time_offset_ms', 'result_from', '_artists',
+                 '_contributors', '_lyrics', 'language')
+    fields = ('external_ids', 'sample_begin_time_offset_ms', 'sample_end_time_offset_ms', 'label', 'duration_ms',
+              'acrid', 'db_begin_time_offset_ms', 'play_offset_ms', 'release_date', 'genres', 'score', 'title',
+              'external_metadata', 'album', 'db_end_time_offset_ms', 'result_from', 'artists', 'contributors',
+              'lyrics', 'language')
+
     def __init__(self,
                  external_ids=None,
                  sample_begin_time_offset_ms=None,
@@ -365,6 +449,7 @@ class Music:
                  contributors=None,
                  lyrics=None,
                  language=None):
+        self.raw = None
         self.external_ids = external_ids
         self.sample_begin_time_offset_ms = sample_begin_time_offset_ms
         self.sample_end_time_offset_ms = sample_end_time_offset_ms
@@ -386,41 +471,42 @@ class Music:
         self.lyrics = lyrics
         self.language = language
 
+    external_ids = _lazy_field('external_ids', ExternalIDS.from_dict)
+    genres = _lazy_field('genres', _decode_items)
+    external_metadata = _lazy_field('external_metadata', ExternalMetadata.from_dict)
+    album = _lazy_field('album', Item.from_dict)
+    artists = _lazy_field('artists', _decode_items)
+    contributors = _lazy_field('contributors', Contributors.from_dict)
+    lyrics = _lazy_field('lyrics', Lyrics.from_dict)
+
     def __repr__(self):
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
     def from_dict(obj):
         if obj:
-            external_ids = ExternalIDS.from_dict(obj.get("external_ids"))
-            sample_begin_time_offset_ms = obj.get("sample_begin_time_offset_ms")
-            sample_end_time_offset_ms = obj.get("sample_end_time_offset_ms")
-            label = obj.get("label")
-            duration_ms = obj.get("duration_ms")
-            acrid = obj.get("acrid")
-            db_begin_time_offset_ms = obj.get("db_begin_time_offset_ms")
-            play_offset_ms = obj.get("play_offset_ms")
-            release_date = obj.get("release_date")
-            genres = [Item.from_dict(g) for g in obj.get("genres")] if obj.get("genres") else None
-            score = obj.get("score")
-            title = obj.get("title")
-            external_metadata = ExternalMetadata.from_dict(obj.get("external_metadata"))
-            album = Item.from_dict(obj.get("album"))
-            db_end_time_offset_ms = obj.get("db_end_time_offset_ms")
-            result_from = obj.get("result_from")
-            artists = [Item.from_dict(a) for a in obj.get("artists")] if obj.get("artists") else None
-            contributors = Contributors.from_dict(obj.get("contributors"))
-            lyrics = Lyrics.from_dict(obj.get("lyrics"))
-            language = obj.get("language")
-
-            return Music(external_ids, sample_begin_time_offset_ms, sample_end_time_offset_ms, label, duration_ms,
-                         acrid,
-                         db_begin_time_offset_ms, play_offset_ms, release_date, genres, score, title, external_metadata,
-                         album, db_end_time_offset_ms, result_from, artists, contributors, lyrics, language)
+            # the external ids, genres, external metadata, album, artists, contributors and lyrics
+            # are decoded on first access
+            music = Music.__new__(Music)
+            music.raw = obj
+            music.sample_begin_time_offset_ms = obj.get("sample_begin_time_offset_ms")
+            music.sample_end_time_offset_ms = obj.get("sample_end_time_offset_ms")
+            music.label = obj.get("label")
+            music.duration_ms = obj.get("duration_ms")
+            music.acrid = obj.get("acrid")
+            music.db_begin_time_offset_ms = obj.get("db_begin_time_offset_ms")
+            music.play_offset_ms = obj.get("play_offset_ms")
+            music.release_date = obj.get("release_date")
+            music.score = obj.get("score")
+            music.title = obj.get("title")
+            music.db_end_time_offset_ms = obj.get("db_end_time_offset_ms")
+            music.result_from = obj.get("result_from")
+            music.language = obj.get("language")
+            return music
         else:
             return None
 
@@ -450,6 +536,10 @@ class Music:
 
 
 class CustomFile:
+    __slots__ = ('audio_id', 'bucket_id', 'duration_ms', 'sample_begin_time_offset_ms', 'sample_end_time_offset_ms',
+                 'title', 'db_end_time_offset_ms', 'db_begin_time_offset_ms', 'acrid', 'play_offset_ms', 'score')
+    fields = __slots__
+
     def __init__(self,
                  audio_id=None,
                  bucket_id=None,
@@ -479,7 +569,7 @@ class CustomFile:
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     @staticmethod
@@ -520,6 +610,12 @@ class CustomFile:
 
 
 class BaseResult:
+    __slots__ = ('filename', 'status_code', 'start_time_ms', 'end_time_ms', 'duration_ms', 'played_duration_ms',
+                 'title', 'score', 'acrid', 'sample_begin_time_offset_ms', 'sample_end_time_offset_ms',
+                 'db_begin_time_offset_ms', 'db_end_time_offset_ms', 'populated_fields_count')
+    # the fields of to_dict
+    fields = ()
+
     def __init__(self,
                  filename=None,
                  status_code=None,
@@ -547,16 +643,104 @@ class BaseResult:
         self.sample_end_time_offset_ms = sample_end_time_offset_ms
         self.db_begin_time_offset_ms = db_begin_time_offset_ms
         self.db_end_time_offset_ms = db_end_time_offset_ms
+        # the number of fields set, see count_populated_fields
+        self.populated_fields_count = None
 
     def __repr__(self):
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
+    def count_populated_fields(self) -> int:
+        """
+        count the fields (of to_dict) that are set, and keep it in populated_fields_count
+        set populated_fields_count to None when a field changes
+        """
+        self.populated_fields_count = len([k for k in self.fields if getattr(self, k)])
+        return self.populated_fields_count
+
+
+class TrackInfo:
+    """
+    The metadata of a track, shared by the MusicResult objects of the track (see catalog.TrackCatalog).
+    A shared TrackInfo is copied before it is changed.
+    """
+    __slots__ = ('album_name', 'artists_names', 'isrc', 'upc', 'spotify_id', 'youtube_id', 'deezer_id', 'release_date',
+                 'label', 'composers', 'lyricists', 'lyrics', 'language', 'shared')
+    fields = ('album_name', 'artists_names', 'isrc', 'upc', 'spotify_id', 'youtube_id', 'deezer_id', 'release_date',
+              'label', 'composers', 'lyricists', 'lyrics', 'language')
+
+    def __init__(self,
+                 album_name=None,
+                 artists_names=None,
+                 isrc=None,
+                 upc=None,
+                 spotify_id=None,
+                 youtube_id=None,
+                 deezer_id=None,
+                 release_date=None,
+                 label=None,
+                 composers=None,
+                 lyricists=None,
+                 lyrics=None,
+                 language=None,
+                 shared=False):
+        self.album_name = album_name
+        self.artists_names = artists_names
+        self.isrc = isrc
+        self.upc = upc
+        self.spotify_id = spotify_id
+        self.youtube_id = youtube_id
+        self.deezer_id = deezer_id
+        self.release_date = release_date
+        self.label = label
+        self.composers = composers
+        self.lyricists = lyricists
+        self.lyrics = lyrics
+        self.language = language
+        self.shared = shared
+
+    def __repr__(self):
+        return "<{klass} @{id:x} {attrs}>".format(
+            klass=self.__class__.__name__,
+            id=id(self) & 0xFFFFFF,
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
+        )
+
+
+# the TrackInfo of the MusicResult objects without metadata
+EMPTY_TRACK = TrackInfo(shared=True)
+
+
+def _track_field(name):
+    """
+    a MusicResult field stored in its TrackInfo
+    """
+
+    def get_field(self):
+        return getattr(self.track, name)
+
+    def set_field(self, value):
+        track = self.track
+        if getattr(track, name) == value:
+            return
+        if track.shared:
+            # copy on write
+            track = self.track = TrackInfo(*(getattr(track, k) for k in TrackInfo.fields))
+        setattr(track, name, value)
+
+    return property(get_field, set_field)
+
 
 class MusicResult(BaseResult):
+    __slots__ = ('track', 'primary_result', 'similar_results')
+    fields = ('filename', 'status_code', 'start_time_ms', 'end_time_ms', 'duration_ms', 'played_duration_ms',
+              'title', 'score', 'similar_results', 'album_name', 'artists_names', 'isrc', 'upc', 'spotify_id',
+              'youtube_id', 'deezer_id', 'release_date', 'label', 'acrid', 'composers', 'lyricists', 'lyrics',
+              'language', 'sample_begin_time_offset_ms', 'sample_end_time_offset_ms', 'db_begin_time_offset_ms',
+              'db_end_time_offset_ms')
 
     def __init__(self,
                  album_name=None,
@@ -590,27 +774,31 @@ class MusicResult(BaseResult):
         super().__init__(filename, status_code, start_time_ms, end_time_ms, duration_ms, played_duration_ms, title,
                          score, acrid, sample_begin_time_offset_ms, sample_end_time_offset_ms, db_begin_time_offset_ms,
                          db_end_time_offset_ms)
-        self.album_name = album_name
-        self.artists_names = artists_names
-        self.isrc = isrc
-        self.upc = upc
-        self.spotify_id = spotify_id
-        self.youtube_id = youtube_id
-        self.deezer_id = deezer_id
-        self.release_date = release_date
-        self.label = label
-        self.composers = composers
-        self.lyricists = lyricists
-        self.lyrics = lyrics
-        self.language = language
+        track_fields = (album_name, artists_names, isrc, upc, spotify_id, youtube_id, deezer_id, release_date, label,
+                        composers, lyricists, lyrics, language)
+        self.track = TrackInfo(*track_fields) if any(f is not None for f in track_fields) else EMPTY_TRACK
         self.primary_result = primary_result
         self.similar_results = similar_results
 
+    album_name = _track_field('album_name')
+    artists_names = _track_field('artists_names')
+    isrc = _track_field('isrc')
+    upc = _track_field('upc')
+    spotify_id = _track_field('spotify_id')
+    youtube_id = _track_field('youtube_id')
+    deezer_id = _track_field('deezer_id')
+    release_date = _track_field('release_date')
+    label = _track_field('label')
+    composers = _track_field('composers')
+    lyricists = _track_field('lyricists')
+    lyrics = _track_field('lyrics')
+    language = _track_field('language')
+
     def __repr__(self):
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     def to_dict(self):
@@ -646,6 +834,11 @@ class MusicResult(BaseResult):
 
 
 class CustomFileResult(BaseResult):
+    __slots__ = ('similar_results', 'audio_id', 'bucket_id', 'primary_result')
+    fields = ('filename', 'status_code', 'start_time_ms', 'end_time_ms', 'duration_ms', 'played_duration_ms',
+              'title', 'score', 'similar_results', 'audio_id', 'bucket_id', 'acrid', 'sample_begin_time_offset_ms',
+              'sample_end_time_offset_ms', 'db_begin_time_offset_ms', 'db_end_time_offset_ms')
+
     def __init__(self,
                  similar_results=None,
                  audio_id=None,
@@ -677,7 +870,7 @@ class CustomFileResult(BaseResult):
         return "<{klass} @{id:x} {attrs}>".format(
             klass=self.__class__.__name__,
             id=id(self) & 0xFFFFFF,
-            attrs=" ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items()),
+            attrs=" ".join("{}={!r}".format(k, v) for k, v in _slot_items(self)),
         )
 
     def to_dict(self):
@@ -7,3 +7,7 @@ class ScanType:
     SCAN_TYPE_CUSTOM = 'custom'
     SCAN_TYPE_BOTH = 'both'
 
+
+class ResultsBackend:
+    OBJECT = 'object'
+    COLUMNAR = 'columnar'
@@ -4,7 +4,10 @@
 import ffmpeg
 import os
 import logging
+from collections import OrderedDict
+from functools import lru_cache
 from fuzzywuzzy import fuzz
+from fuzzywuzzy import utils as fuzz_utils
 import time
 import re
 
@@ -41,6 +44,56 @@ def convert_media_file_to_wav(media_filename: str, ffmpeg_path='ffmpeg') -> str:
     return ''
 
 
+def iter_pcm_windows(media_filename: str, time_points: range, window_length_ms: int, ffmpeg_path='ffmpeg'):
+    """
+    Decode the media file once (as a stream) to 8 kHz mono 16 bit PCM, and yield the audio of every window.
+    Only the audio between the current window and the next one is kept in memory.
+    :param media_filename:
+    :param time_points: the start time (ms) of the windows
+    :param window_length_ms: the length of a window
+    :param ffmpeg_path: ffmpeg bin's path
+    :return: generator of (start time ms, pcm bytes), the last windows may be shorter (or empty)
+    """
+    bytes_per_ms = 16  # 8000 samples/s * 2 bytes
+    window_length = window_length_ms * bytes_per_ms
+
+    input_kwargs = {'ss': time_points.start / 1000} if time_points.start else {}
+    process = ffmpeg.input(media_filename, **input_kwargs) \
+        .output('pipe:', **{'loglevel': 'quiet', 'format': 's16le', 'acodec': 'pcm_s16le', 'ac': 1, 'ar': 8000}) \
+        .run_async(cmd=ffmpeg_path, pipe_stdout=True)
+
+    buffer = bytearray()
+    buffer_start_ms = time_points.start
+    try:
+        for t_ms in time_points:
+            # drop the audio before this window (and skip the gap if interval > window length)
+            skip = (t_ms - buffer_start_ms) * bytes_per_ms
+            buffer_start_ms = t_ms
+            if skip <= len(buffer):
+                del buffer[:skip]
+            else:
+                skip -= len(buffer)
+                buffer.clear()
+                while skip > 0:
+                    chunk = process.stdout.read(min(skip, window_length))
+                    if not chunk:
+                        break
+                    skip -= len(chunk)
+
+            while len(buffer) < window_length:
+                chunk = process.stdout.read(window_length - len(buffer))
+                if not chunk:
+                    break
+                buffer += chunk
+
+            yield t_ms, bytes(buffer[:window_length])
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
 def is_title_similar_or_equal(title_a: str, title_b: str, threshold: int) -> bool:
     """
     Determine if two strings are similar
@@ -61,6 +114,118 @@ def is_title_similar_or_equal(title_a: str, title_b: str, threshold: int) -> boo
     return False
 
 
+@lru_cache(maxsize=100000)
+def _title_tokens(title: str) -> frozenset:
+    """
+    normalize and tokenize a title the way fuzz.token_set_ratio does
+    :param title:
+    :return: the tokens of the title
+    """
+    return frozenset(fuzz_utils.full_process(title, force_ascii=True).split())
+
+
+def _token_set_ratio(tokens_a: frozenset, tokens_b: frozenset) -> int:
+    """
+    fuzz.token_set_ratio of two tokenized titles
+    :param tokens_a:
+    :param tokens_b:
+    :return:
+    """
+    if not tokens_a or not tokens_b:
+        return 0
+
+    sorted_sect = " ".join(sorted(tokens_a & tokens_b))
+    sorted_a_to_b = " ".join(sorted(tokens_a - tokens_b))
+    sorted_b_to_a = " ".join(sorted(tokens_b - tokens_a))
+
+    combined_a_to_b = (sorted_sect + " " + sorted_a_to_b).strip()
+    combined_b_to_a = (sorted_sect + " " + sorted_b_to_a).strip()
+
+    return max(fuzz.ratio(sorted_sect, combined_a_to_b),
+               fuzz.ratio(sorted_sect, combined_b_to_a),
+               fuzz.ratio(combined_a_to_b, combined_b_to_a))
+
+
+class TitleSimilarity:
+    """
+    is_title_similar_or_equal with memory: every distinct title is tokenized once,
+    and the verdicts are kept in a LRU keyed by the title pair and the threshold
+    (not by the acrids: the title of an acrid may change between the responses).
+    """
+
+    def __init__(self, max_size: int = 100000) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._verdicts = OrderedDict()
+
+    @staticmethod
+    def score(title_a: str, title_b: str) -> int:
+        """
+        the token set ratio of two titles
+        :param title_a:
+        :param title_b:
+        :return: 0 - 100
+        """
+        if not title_a or not title_b:
+            return 0
+        return _token_set_ratio(_title_tokens(title_a), _title_tokens(title_b))
+
+    def is_similar_or_equal(self, title_a: str, title_b: str, threshold: int) -> bool:
+        """
+        Determine if two titles are similar, see is_title_similar_or_equal
+        :param title_a:
+        :param title_b:
+        :param threshold:
+        :return:
+        """
+        return self.score_many(title_b, [title_a], threshold)[0]
+
+    def score_many(self, title: str, titles: list, threshold: int) -> list:
+        """
+        is_similar_or_equal(t, title, threshold) of every title t of a list, the title is tokenized once
+        (the token set ratio is not symmetric, title is the second title of every pair)
+        :param title:
+        :param titles:
+        :param threshold:
+        :return: the verdicts, in the order of titles
+        """
+        tokens = None
+        verdicts = []
+        for title_a in titles:
+            if not title_a or not title:
+                verdicts.append(False)
+                continue
+
+            if title_a == title:
+                verdicts.append(True)
+                continue
+
+            key = (title_a, title, threshold)
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self.hits += 1
+                self._verdicts.move_to_end(key)
+                verdicts.append(verdict)
+                continue
+
+            self.misses += 1
+            if tokens is None:
+                tokens = _title_tokens(title)
+            verdict = _token_set_ratio(_title_tokens(title_a), tokens) >= threshold
+            self._verdicts[key] = verdict
+            if len(self._verdicts) > self.max_size:
+                self._verdicts.popitem(last=False)
+            verdicts.append(verdict)
+        return verdicts
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0}
+
+
 def get_human_readable_time(seconds: int) -> str:
     """
     convert seconds to hh:mm:ss format
@@ -70,6 +235,16 @@ def get_human_readable_time(seconds: int) -> str:
     return time.strftime("%H:%M:%S", time.gmtime(seconds))
 
 
+@lru_cache(maxsize=4096)
+def get_human_readable_seconds(seconds: int) -> str:
+    """
+    get_human_readable_time of whole seconds, cached: the end time of a report row is often the start time of the next
+    :param seconds:
+    :return:
+    """
+    return time.strftime("%H:%M:%S", time.gmtime(seconds))
+
+
 def trim_invalid_file_path_chars(path: str) -> str:
     regex = re.compile(r'[\\/:*?"<>|]')
     return regex.sub(' ', path)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The implementations replaced by the optimizations, the benchmarks and the tests compare them with the new ones.
+"""
+
+from acrscan.exporters import parse_similar_results
+from acrscan.utils import get_human_readable_time
+
+
+def to_dict_csv_row(result) -> dict:
+    """
+    The csv row before the RowSerializer (written by a csv.DictWriter): to_dict,
+    the similar results parsed from their dicts and the times formatted
+    :param result:
+    :return:
+    """
+    res = result.to_dict()
+    res['similar_results'] = '|##|'.join(parse_similar_results(res['similar_results']))
+    res['start_time'] = get_human_readable_time(res['start_time_ms'] / 1000)
+    res['end_time'] = get_human_readable_time(res['end_time_ms'] / 1000)
+    return res
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The memory of the parsed results: the segments of a file are parsed to a MusicResult and a CustomFileResult
+(with their primary and similar results) and kept, as a scan does before the results are merged.
+The __slots__ models are compared with the same models without __slots__ (every object has a __dict__).
+
+    python -m benchmarks.models_memory [segments]
+"""
+
+import contextlib
+import gc
+import logging
+import sys
+import tracemalloc
+import types
+from unittest import mock
+
+import acrscan.acrscan
+import acrscan.catalog
+import acrscan.exporters
+from acrscan.acrscan import ACRCloudScan
+from acrscan.models import base_model
+
+from .synthetic import response
+
+
+def dict_models() -> dict:
+    """
+    the model classes of base_model without __slots__
+    :return: the classes by name
+    """
+    classes = {}
+    for name, klass in list(vars(base_model).items()):
+        if not isinstance(klass, type) or klass.__module__ != base_model.__name__:
+            continue
+        slots = klass.__dict__.get('__slots__', ())
+        namespace = {k: v for k, v in klass.__dict__.items()
+                     if k not in slots and k not in ('__slots__', '__dict__', '__weakref__')}
+        bases = tuple(classes.get(base.__name__, base) for base in klass.__bases__)
+        new_class = classes[name] = type(name, bases, namespace)
+        # the zero argument super() of a method refers to its class
+        for k, v in namespace.items():
+            if isinstance(v, types.FunctionType) and '__class__' in v.__code__.co_freevars:
+                closure = tuple(types.CellType(new_class) if free == '__class__' else cell
+                                for free, cell in zip(v.__code__.co_freevars, v.__closure__))
+                setattr(new_class, k, types.FunctionType(v.__code__, v.__globals__, v.__name__, v.__defaults__,
+                                                         closure))
+    return classes
+
+
+@contextlib.contextmanager
+def use_models(classes: dict):
+    """
+    replace the model classes in the modules that create the models
+    """
+    with contextlib.ExitStack() as stack:
+        for module in (base_model, acrscan.acrscan, acrscan.catalog, acrscan.exporters):
+            for name, klass in classes.items():
+                if name in vars(module):
+                    stack.enter_context(mock.patch.object(module, name, klass))
+        yield
+
+
+def bytes_per_segment(responses: list) -> float:
+    scanner = ACRCloudScan({'access_key': 'key', 'access_secret': 'secret'})
+    gc.collect()
+    tracemalloc.start()
+    results = [scanner._parse_response_to_result('/music/file.mp3', i * 10000, base_model.Response.from_dict(r))
+               for i, r in enumerate(responses)]
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(results)
+
+
+def main(segments: int = 20000) -> None:
+    responses = [response('/music/file.mp3', i * 10000) for i in range(segments)]
+    with use_models(dict_models()):
+        before = bytes_per_segment(responses)
+    after = bytes_per_segment(responses)
+    print('%d segments: __dict__ models %.0f bytes per segment, __slots__ models %.0f bytes per segment (%+.0f%%)'
+          % (segments, before, after, (after - before) / before * 100))
+
+
+if __name__ == '__main__':
+    logging.disable(logging.CRITICAL)
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The csv rows per second of the RowSerializer and of the to_dict rows it replaced (csv.DictWriter),
+for every result class: the rows of recognized results are written to a StringIO, best of 3, the GC off.
+
+    python -m benchmarks.row_serializer [rows]
+"""
+
+import csv
+import gc
+import io
+import random
+import sys
+import time
+
+from acrscan.exporters import csv_fieldnames, row_serializer
+from acrscan.models import CustomFile, CustomFileResult, Music, MusicResult
+
+from .baseline import to_dict_csv_row
+
+
+def recognized_results(result_class, n: int) -> list:
+    """
+    the results of a recognized run of segments, with 0 to 3 similar results
+    :param result_class: MusicResult or CustomFileResult
+    :param n: the number of results
+    :return:
+    """
+    rng = random.Random(5)
+    custom = result_class is CustomFileResult
+    results = []
+    for k in range(n):
+        similar_results = [CustomFile(acrid='a%d' % j, title='Title %d' % j, score=70, audio_id='x') if custom
+                           else Music(acrid='a%d' % j, title='Title %d' % j, score=70)
+                           for j in range(rng.choice([0, 0, 1, 3]))]
+        fields = dict(filename='2024-01-01.mp3', status_code=0, start_time_ms=k * 10000,
+                      end_time_ms=k * 10000 + 10000, played_duration_ms=10000, title='Some Song (Remix)',
+                      acrid='6049f11da7095e150a16ad1e5d86d6c1', score=88, similar_results=similar_results,
+                      duration_ms=215000, sample_begin_time_offset_ms=0, sample_end_time_offset_ms=9000,
+                      db_begin_time_offset_ms=30000, db_end_time_offset_ms=39000)
+        if custom:
+            fields.update(audio_id='ad-1234', bucket_id=1234)
+        else:
+            fields.update(album_name='Album', artists_names='Artist A, Artist B', isrc='USRC17607839', upc='0123',
+                          spotify_id='sp', youtube_id='yt', deezer_id='dz', release_date='2020-01-01',
+                          label='Label', composers='C', lyricists='L', language='en')
+        results.append(result_class(**fields))
+    return results
+
+
+def write_to_dict_rows(results: list) -> str:
+    f = io.StringIO()
+    writer = csv.DictWriter(f, csv_fieldnames(results[0]))
+    writer.writeheader()
+    for result in results:
+        writer.writerow(to_dict_csv_row(result))
+    return f.getvalue()
+
+
+def write_serialized_rows(results: list) -> str:
+    f = io.StringIO()
+    serializer = row_serializer(type(results[0]))
+    writer = csv.writer(f)
+    writer.writerow(serializer.fieldnames)
+    for result in results:
+        writer.writerow(serializer.row(result))
+    return f.getvalue()
+
+
+def best_time(write, results: list) -> (float, str):
+    best = None
+    for _ in range(3):
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        text = write(results)
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, text
+
+
+def main(rows: int = 100000) -> None:
+    for result_class in (MusicResult, CustomFileResult):
+        results = recognized_results(result_class, rows)
+        before, before_text = best_time(write_to_dict_rows, results)
+        after, after_text = best_time(write_serialized_rows, results)
+        print('%s: to_dict %.0f rows/s, RowSerializer %.0f rows/s (%.1fx), same csv: %s'
+              % (result_class.__name__, rows / before, rows / after, before / after, before_text == after_text))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
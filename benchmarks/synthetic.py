@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+
+TITLES = ['Hello', 'Hello (Remix)', 'Hello feat. ACR', 'Yesterday', 'Yesterday - Remastered', 'Jingle A',
+          'Station ID', 'Another Day', 'Another Day (Live)', 'Blue', 'Blue Monday', 'Ad Spot 7']
+
+
+def music(rng: random.Random, i: int) -> dict:
+    """
+    a music of the metadata of an ACRCloud response
+    :param rng:
+    :param i: the index of the title
+    :return:
+    """
+    title = TITLES[i]
+    begin = rng.randint(0, 3000)
+    return {'acrid': 'acr%d' % i, 'title': title, 'score': rng.randint(50, 100),
+            'label': rng.choice([None, 'Label X']), 'duration_ms': 200000, 'release_date': '2001-01-01',
+            'sample_begin_time_offset_ms': begin, 'sample_end_time_offset_ms': begin + rng.randint(3000, 7000),
+            'db_begin_time_offset_ms': rng.randint(0, 100000), 'db_end_time_offset_ms': rng.randint(100000, 200000),
+            'play_offset_ms': 1000, 'result_from': 1,
+            'external_ids': {'isrc': 'ISRC%d' % i, 'upc': None},
+            'external_metadata': {'spotify': {'track': {'id': 'sp%d' % i, 'name': title}, 'album': {'name': 'al'},
+                                              'artists': [{'name': 'ar'}]},
+                                  'deezer': {'track': {'id': 'dz%d' % i}, 'album': {'id': 3}},
+                                  'youtube': {'vid': 'yt%d' % i}},
+            'album': {'name': 'Album %d' % i}, 'artists': [{'name': 'Artist %d' % i}, {'name': 'B'}],
+            'genres': [{'name': 'Pop'}], 'contributors': {'composers': ['C1', 'C2'], 'lyricists': ['L1']},
+            'lyrics': {'copyrights': ['(c) X']}, 'language': 'en'}
+
+
+def custom_file(rng: random.Random, i: int) -> dict:
+    """
+    a custom file of the metadata of an ACRCloud response
+    :param rng:
+    :param i: the index of the title
+    :return:
+    """
+    begin = rng.randint(0, 3000)
+    return {'audio_id': 'a%d' % i, 'bucket_id': 7, 'acrid': 'c%d' % i, 'title': TITLES[i],
+            'score': rng.randint(50, 100), 'duration_ms': 30000, 'sample_begin_time_offset_ms': begin,
+            'sample_end_time_offset_ms': begin + rng.randint(3000, 7000),
+            'db_begin_time_offset_ms': rng.randint(0, 10000), 'db_end_time_offset_ms': rng.randint(10000, 30000),
+            'play_offset_ms': 500}
+
+
+def response(filename: str, start_time_ms: int, seed: int = 0) -> dict:
+    """
+    the ACRCloud response of a segment: no result, errors, or runs of the same title
+    with similar results (music and custom files)
+    :param filename:
+    :param start_time_ms: the start of the segment
+    :param seed:
+    :return: the response dict
+    """
+    rng = random.Random('%d-%s-%d' % (seed, filename, start_time_ms))
+    r = rng.random()
+    if r < 0.2:
+        return {'status': {'code': 1001, 'msg': 'No result', 'version': '1.0'}}
+    if r < 0.23:
+        return {'status': {'code': rng.choice([3000, 2006]), 'msg': 'err', 'version': '1.0'}}
+
+    # the same title for about 40 seconds
+    run_title = random.Random('%d-%s-%d' % (seed, filename, start_time_ms // 40000)).randrange(len(TITLES))
+    i = run_title if rng.random() < 0.75 else rng.randrange(len(TITLES))
+    metadata = {'timestamp_utc': '2020-01-01 00:00:00'}
+    if rng.random() < 0.9:
+        metadata['music'] = [music(rng, i)] + [music(rng, rng.randrange(len(TITLES)))
+                                               for _ in range(rng.randint(0, 3))]
+    if rng.random() < 0.8:
+        metadata['custom_files'] = [custom_file(rng, i)] + [custom_file(rng, rng.randrange(len(TITLES)))
+                                                            for _ in range(rng.randint(0, 2))]
+    return {'status': {'code': 0, 'msg': 'Success', 'version': '1.0'}, 'metadata': metadata, 'cost_time': 0.1,
+            'result_type': 0}
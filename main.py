@@ -8,6 +8,7 @@ try:
 except ImportError:
     download_lib()
     from acrscan.acrscan import ACRCloudScan
+from acrscan.exporters import report_fields_error
 import logging
 import yaml
 import click
@@ -37,21 +38,37 @@ class OptionRequiredIf(click.Option):
         return value
 
 
+def check_report_fields(ctx, param, value):
+    """
+    the report fields of --fields (or report_fields in config.yaml), they must be columns of the reports of --scan-type
+    """
+    if value:
+        fields = tuple(f.strip() for f in value.split(',') if f.strip())
+    else:
+        fields = tuple(acrcloud_config['report_fields']) if acrcloud_config.get('report_fields') else None
+    if fields:
+        error = report_fields_error(fields, ctx.params.get('scan_type', 'both'))
+        if error:
+            raise click.BadParameter(error, ctx=ctx, param=param)
+    return fields
+
+
 @click.command()
 @click.option('--target', '-t',
               help='The target need to scan (a folder or a file).', required=True)
 @click.option('--output', '-o', default='',
               help='Output result to this folder. (Must be a folder path)')
-@click.option('--format', 'output_format', type=click.Choice(['csv', 'json']),
-              help='output format.(csv or json)')
+@click.option('--format', 'output_format', type=click.Choice(['csv', 'json', 'ndjson', 'parquet', 'arrow']),
+              help='output format.(csv, json, ndjson, parquet or arrow)')
 @click.option('--with-duration/--no-duration', '-w', default=False,
               help='Add played duration to the result')
 @click.option('--filter-results/--no-filter', default=False,
               help='Enable filter.(It must be used when the with-duration option is on)', cls=OptionRequiredIf)
 @click.option('--split-results/--no-split', '-p', default=False,
               help='Each audio/video file generate a report')
+# eager: --scan-type is processed before --fields (see check_report_fields)
 @click.option('--scan-type', '-c', type=click.Choice(['music', 'custom', 'both']), default='both',
-              help='scan type')
+              help='scan type', is_eager=True)
 @click.option('--start-time-ms', '-s', default=0,
               help='scan start time')
 @click.option('--end-time-ms', '-e', default=0,
@@ -60,8 +77,26 @@ class OptionRequiredIf(click.Option):
               help='scan fingerprint')
 @click.option('--interval', '-i', default=10,
               help='interval')
+@click.option('--concurrency', type=int,
+              help='Max in-flight recognition requests per file (default: concurrency in config.yaml or 1)')
+@click.option('--workers', type=int,
+              help='Scan the files of a folder in this many processes (default: workers in config.yaml or 1)')
+@click.option('--async/--no-async', 'use_async', default=None,
+              help='Send the requests of all the files from one asyncio event loop (up to --concurrency in flight)')
+@click.option('--decode-once/--no-decode-once', default=None,
+              help='Decode each file once with ffmpeg and fingerprint the segments from the decoded audio')
+@click.option('--journal', 'journal_path', type=click.Path(dir_okay=False),
+              help='Journal every segment response to this file, an interrupted scan resumes from it')
+@click.option('--stream/--no-stream', 'stream_results', default=None,
+              help='Write every result to the report as soon as it is final (without --filter-results)')
+@click.option('--gzip/--no-gzip', 'gzip_reports', default=None,
+              help='Compress the json and ndjson reports with gzip')
+@click.option('--fields', 'report_fields', callback=check_report_fields,
+              help='The report fields, comma separated, e.g. title,artists_names,start_time,end_time '
+                   '(default: report_fields in config.yaml or all)')
 def main(target, output, output_format, with_duration, filter_results, split_results, scan_type, start_time_ms,
-         end_time_ms, is_fp, interval):
+         end_time_ms, is_fp, interval, concurrency, workers, use_async, decode_once, journal_path,
+         stream_results, gzip_reports, report_fields):
     ctx = click.get_current_context()
     if not any(v for v in ctx.params.values()):
         click.echo(ctx.get_help())
@@ -81,6 +116,21 @@ def main(target, output, output_format, with_duration, filter_results, split_res
     acr.end_time_ms = end_time_ms * 1000
     acr.is_fingerprint = is_fp
     acr.interval_length_ms = interval * 1000
+    if concurrency:
+        acr.concurrency = concurrency
+    if workers:
+        acr.workers = workers
+    if use_async is not None:
+        acr.use_async = use_async
+    if decode_once is not None:
+        acr.decode_once = decode_once
+    acr.journal_path = journal_path
+    if stream_results is not None:
+        acr.stream_results = stream_results
+    if gzip_reports is not None:
+        acr.gzip_reports = gzip_reports
+    if report_fields:
+        acr.report_fields = report_fields
     acr.scan_main(target, output, output_format)
 
 
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from acrscan.acrcloud.recognizer import AsyncACRCloudRecognizer
+
+from .test_connection_pool import IdentifyServerTestCase
+
+
+class TestAsyncResponseCache(IdentifyServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.recognizer = AsyncACRCloudRecognizer({'host': self.host, 'access_key': 'key', 'access_secret': 'secret',
+                                                   'response_cache_size': 10,
+                                                   'response_cache_path': os.path.join(self.tmpdir, 'r.sqlite')})
+        # the threads of the sqlite calls
+        self.store_threads = []
+        store = self.recognizer.response_cache.store
+        for name in ('get', 'put'):
+            setattr(store, name, self.record_thread(getattr(store, name)))
+
+    def tearDown(self):
+        self.recognizer.response_cache.store.close()
+        shutil.rmtree(self.tmpdir)
+        super().tearDown()
+
+    def record_thread(self, func):
+        def call(*args):
+            self.store_threads.append(threading.current_thread())
+            return func(*args)
+        return call
+
+    async def recognize(self, sample):
+        try:
+            return await self.recognizer.do_recogize(self.host, {'sample': sample}, 'fingerprint', 'key', 'secret',
+                                                     parse=True)
+        finally:
+            await self.recognizer.close()
+
+    def test_disk_tier_off_the_loop(self):
+        self.assertEqual(asyncio.run(self.recognize(b'fingerprint'))['status']['code'], 1001)
+        # a miss (get) and a store (put)
+        self.assertEqual(len(self.store_threads), 2)
+        self.assertNotIn(threading.current_thread(), self.store_threads)
+
+    def test_disk_hit(self):
+        asyncio.run(self.recognize(b'fingerprint'))
+        self.recognizer.response_cache._memory.clear()
+        self.assertEqual(asyncio.run(self.recognize(b'fingerprint'))['status']['code'], 1001)
+        self.assertEqual(len(self.server.paths), 1)
+        self.assertEqual(self.recognizer.response_cache.stats()['disk_hits'], 1)
+        self.assertNotIn(threading.current_thread(), self.store_threads)
+
+
+if __name__ == '__main__':
+    unittest.main()
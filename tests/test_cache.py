@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from acrscan.acrcloud.cache import FingerprintCache, SqliteLRUStore
+
+
+class TestSqliteLRUStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = SqliteLRUStore(os.path.join(self.tmpdir, 'store.sqlite'), max_bytes=1000)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def stored_bytes(self):
+        return self.store._conn.execute('SELECT COALESCE(SUM(size), 0) FROM store').fetchone()[0]
+
+    def test_replace(self):
+        for _ in range(20):
+            self.store.put('a', b'x' * 300)
+        self.store.put('b', b'x' * 500)
+        self.assertEqual(self.store._total_bytes, 800)
+        self.assertEqual(self.store._total_bytes, self.stored_bytes())
+        # nothing is evicted under max_bytes
+        self.assertIsNotNone(self.store.get('a'))
+        self.assertIsNotNone(self.store.get('b'))
+
+    def test_delete(self):
+        self.store.put('a', b'x' * 300)
+        self.store.put('b', b'x' * 500)
+        self.store.delete('a')
+        self.store.delete('missing')
+        self.assertEqual(self.store._total_bytes, 500)
+        self.assertEqual(self.store._total_bytes, self.stored_bytes())
+
+    def test_evict(self):
+        for key in 'abcd':
+            self.store.put(key, b'x' * 300)
+        # down to 90% of max_bytes, the least recently used first
+        self.assertEqual(self.store._total_bytes, 900)
+        self.assertEqual(self.store._total_bytes, self.stored_bytes())
+        self.assertIsNone(self.store.get('a'))
+        for key in 'bcd':
+            self.assertIsNotNone(self.store.get(key))
+
+    def test_reopen(self):
+        self.store.put('a', b'x' * 300)
+        self.store.close()
+        self.store = SqliteLRUStore(os.path.join(self.tmpdir, 'store.sqlite'), max_bytes=1000)
+        self.assertEqual(self.store._total_bytes, 300)
+
+
+class TestFingerprintCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = FingerprintCache(os.path.join(self.tmpdir, 'fingerprints.sqlite'), 1024 * 1024)
+
+    def tearDown(self):
+        self.cache.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_file_digest(self):
+        paths = []
+        for i in range(200):
+            path = os.path.join(self.tmpdir, '%d.mp3' % i)
+            with open(path, 'wb') as f:
+                f.write(b'audio %d' % (i % 10))
+            paths.append(path)
+        digests = [self.cache.file_digest(path) for path in paths]
+        self.assertEqual(digests[:10], digests[10:20])
+        self.assertEqual(len(set(digests)), 10)
+        # the locks do not grow with the files
+        self.assertEqual(len(self.cache._file_locks), FingerprintCache.FILE_LOCK_STRIPES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import random
+import unittest
+
+from acrscan.acrcloud.recognizer import ACRCloudStatusCode
+from acrscan.acrscan import ACRCloudScan
+from acrscan.columnar import ColumnarResultsMerger, import_numpy
+from acrscan.merger import ResultsMerger
+from acrscan.models import CustomFile, CustomFileResult, Music, MusicResult, ResultsBackend
+
+from .test_filter_results import TITLES, generate_results
+
+
+def generate_segments(seed: int, n: int, custom: bool = False) -> list:
+    """
+    segment results of several files: runs of the same title (or of no result records), the start times overlap,
+    some have sample offsets or a similar result
+    :param seed:
+    :param n: the number of results
+    :param custom: CustomFileResult instead of MusicResult
+    :return:
+    """
+    rng = random.Random(seed)
+    result_class, similar_class = (CustomFileResult, CustomFile) if custom else (MusicResult, Music)
+    results = []
+    time_ms = 0
+    while len(results) < n:
+        filename = 'file%d.mp3' % (len(results) * 3 // n)
+        title = rng.choice(TITLES + [None])
+        for _ in range(rng.choice([1, 2, 5, 9, 20, 50])):
+            played_duration_ms = rng.choice([3000, 8000, 10000, 15000])
+            start_time_ms = time_ms - rng.choice([0, 0, 1500, 2500])
+            time_ms += played_duration_ms
+            fields = dict(filename=filename, start_time_ms=start_time_ms,
+                          end_time_ms=start_time_ms + played_duration_ms, played_duration_ms=played_duration_ms,
+                          score=rng.randint(40, 90))
+            if not title or rng.random() < 0.3:
+                fields['status_code'] = rng.choice([ACRCloudStatusCode.NO_RESULT_CODE,
+                                                    ACRCloudStatusCode.HTTP_ERROR_CODE]) if title \
+                    else ACRCloudStatusCode.NO_RESULT_CODE
+                results.append(result_class(**fields))
+                continue
+
+            i = TITLES.index(title)
+            similar_results = []
+            if rng.random() < 0.15:
+                j = rng.randrange(len(TITLES))
+                similar_results.append(similar_class(acrid='a%d' % j, title=TITLES[j], score=60,
+                                                     sample_begin_time_offset_ms=500,
+                                                     sample_end_time_offset_ms=rng.randint(3000, 9000)))
+            fields.update(status_code=ACRCloudStatusCode.ACR_ERR_CODE_OK, title=title, acrid='a%d' % i,
+                          similar_results=similar_results, db_begin_time_offset_ms=rng.randint(0, 20000),
+                          db_end_time_offset_ms=rng.randint(0, 20000))
+            if rng.random() < 0.5:
+                fields.update(sample_begin_time_offset_ms=rng.randint(0, 3000),
+                              sample_end_time_offset_ms=rng.choice([0, rng.randint(3000, 10000)]))
+            result = result_class(**fields)
+            result.primary_result = similar_class(acrid=result.acrid, title=title, score=result.score)
+            results.append(result)
+    return results[:n]
+
+
+def report(results: list) -> list:
+    return [r.to_dict() for r in results]
+
+
+@unittest.skipUnless(import_numpy(), 'the columnar backend needs numpy')
+class TestColumnarParity(unittest.TestCase):
+    datasets = 12
+    sizes = (1, 2, 3, 17, 300, 2000)
+
+    def setUp(self):
+        self.scanner = ACRCloudScan({'access_key': 'key', 'access_secret': 'secret'})
+
+    def datasets_of(self, generate):
+        for custom in (False, True):
+            for seed in range(self.datasets):
+                for n in self.sizes:
+                    yield 'seed %d custom %s n %d' % (seed, custom, n), generate(seed, n, custom)
+
+    def test_merge(self):
+        for name, results in self.datasets_of(generate_segments):
+            merger = ResultsMerger(self.scanner.filter_title_threshold)
+            expected = []
+            for result in copy.deepcopy(results):
+                expected += merger.push(result)
+            expected += merger.flush()
+            merged = ColumnarResultsMerger(self.scanner.filter_title_threshold).merge(copy.deepcopy(results))
+            self.assertEqual(report(merged), report(expected), name)
+
+    def test_filter(self):
+        for generate in (generate_results, generate_segments):
+            for name, results in self.datasets_of(generate):
+                self.scanner.results_backend = ResultsBackend.OBJECT
+                expected = self.scanner._filter_results(copy.deepcopy(results))
+                filtered = self.scanner._filter_results_columnar(copy.deepcopy(results))
+                self.assertEqual(report(filtered), report(expected), name)
+                self.assertEqual(self.scanner.results_counter.keys(),
+                                 {r.acrid for r in results if r.status_code == ACRCloudStatusCode.ACR_ERR_CODE_OK})
+
+    def test_merge_and_filter(self):
+        for name, results in self.datasets_of(generate_segments):
+            reports = []
+            for backend in (ResultsBackend.OBJECT, ResultsBackend.COLUMNAR):
+                self.scanner.results_backend = backend
+                merged = self.scanner._merge_results_with_simple_filter(copy.deepcopy(results))
+                reports.append((report(merged), report(self.scanner._filter_results(merged))))
+            self.assertEqual(reports[1], reports[0], name)
+
+
+if __name__ == '__main__':
+    unittest.main()
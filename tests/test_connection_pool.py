@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import http.server
+import json
+import threading
+import unittest
+
+from acrscan.acrcloud.recognizer import ACRCloudConnectionPool, ACRCloudHTTPError, ACRCloudRecognizer
+
+NO_RESULT = json.dumps({'status': {'code': 1001, 'msg': 'No result', 'version': '1.0'}}).encode('utf8')
+
+
+class IdentifyHandler(http.server.BaseHTTPRequestHandler):
+    """
+    A stand-in /v1/identify: keep-alive HTTP/1.1 connections, the answers depend on server.mode
+    (ok, chunked, drop: close the connection after the response without telling the client,
+    error: a 503 for the next server.errors requests), the body is server.respond(request body) if set
+    """
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body are written apart, no delayed ACK wait between them
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        request_body = self.rfile.read(int(self.headers['Content-Length']))
+        server = self.server
+        with server.lock:
+            mode = server.mode
+            server.paths.append(self.path)
+            server.client_ports.add(self.client_address[1])
+            error = server.errors > 0
+            if error:
+                server.errors -= 1
+
+        if error:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = server.respond(request_body) if server.respond else NO_RESULT
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if mode == 'chunked':
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(body), 16):
+                chunk = body[i:i + 16]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        if mode == 'drop':
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class IdentifyServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), IdentifyHandler)
+        self.server.daemon_threads = True
+        self.server.block_on_close = False
+        self.server.lock = threading.Lock()
+        self.server.mode = 'ok'
+        self.server.errors = 0
+        self.server.respond = None
+        self.server.paths = []
+        self.server.client_ports = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.host = '127.0.0.1:%d' % self.server.server_address[1]
+        self.url = 'http://%s/v1/identify' % self.host
+        self.pool = ACRCloudConnectionPool(maxsize=2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self):
+        return self.pool.post(self.url, b'sample', {'Content-Type': 'application/octet-stream'}, 5)
+
+
+class TestACRCloudConnectionPool(IdentifyServerTestCase):
+
+    def test_reuse(self):
+        for _ in range(3):
+            self.assertEqual(self.post(), NO_RESULT)
+        self.assertEqual(len(self.server.client_ports), 1)
+        self.assertEqual(self.pool.stats(), {'requests': 3, 'connects': 1, 'reuses': 2, 'resets': 0,
+                                             'reuse_ratio': 2 / 3})
+
+    def test_stale_connection(self):
+        self.server.mode = 'drop'
+        self.assertEqual(self.post(), NO_RESULT)
+        # the idle connection is closed by the server, the request is sent again on a new connection
+        self.server.mode = 'ok'
+        self.assertEqual(self.post(), NO_RESULT)
+        self.assertEqual(self.post(), NO_RESULT)
+        self.assertEqual(len(self.server.client_ports), 2)
+        self.assertEqual(self.pool.stats(), {'requests': 3, 'connects': 2, 'reuses': 1, 'resets': 1,
+                                             'reuse_ratio': 1 / 3})
+
+    def test_chunked_response(self):
+        self.server.mode = 'chunked'
+        self.assertEqual(self.post(), NO_RESULT)
+        self.assertEqual(self.post(), NO_RESULT)
+        self.assertEqual(len(self.server.client_ports), 1)
+        self.assertEqual(self.pool.stats()['reuses'], 1)
+
+    def test_http_error(self):
+        self.server.errors = 1
+        with self.assertRaises(ACRCloudHTTPError) as cm:
+            self.post()
+        self.assertEqual(cm.exception.status, 503)
+        # the connection is still usable
+        self.assertEqual(self.post(), NO_RESULT)
+        self.assertEqual(self.pool.stats()['connects'], 1)
+
+
+class TestACRCloudRecognizerPool(IdentifyServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.recognizer = ACRCloudRecognizer({'host': self.host, 'access_key': 'key', 'access_secret': 'secret',
+                                              'retry_max_attempts': 3})
+        self.recognizer.retry_wait_seconds = lambda attempt: 0
+        self.pool = self.recognizer.connection_pool
+
+    def recognize(self):
+        return self.recognizer.do_recogize(self.host, {'sample': b'fingerprint'}, 'fingerprint', 'key', 'secret',
+                                           parse=True)
+
+    def test_identify(self):
+        for _ in range(3):
+            self.assertEqual(self.recognize()['status']['code'], 1001)
+        self.assertEqual(self.server.paths, ['/v1/identify'] * 3)
+        self.assertEqual(self.pool.stats()['connects'], 1)
+
+    def test_retry(self):
+        self.server.errors = 2
+        self.assertEqual(self.recognize()['status']['code'], 1001)
+        self.assertEqual(self.recognizer.retry_budget.used, 2)
+        self.assertEqual(self.pool.stats()['requests'], 3)
+        self.assertEqual(self.pool.stats()['connects'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
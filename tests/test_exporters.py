@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import csv
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from acrscan import exporters
+from acrscan.acrscan import ACRCloudScan
+from acrscan.models import Music, MusicResult, ScanType
+
+
+def music_results(filenames: list, rows: int) -> list:
+    """
+    the results of the files, a result of every file in turn
+    :param filenames:
+    :param rows: the results per file
+    :return:
+    """
+    return [MusicResult(filename=filename, status_code=0, start_time_ms=k * 10000, end_time_ms=k * 10000 + 10000,
+                        title='Title, "%d"' % k, acrid='a%d' % k, score=90,
+                        similar_results=[Music(acrid='b%d' % k, title='Title (Remix)', score=80)] if k % 2 else None)
+            for k in range(rows) for filename in filenames]
+
+
+class TestPyarrowImport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_not_imported_by_the_other_formats(self):
+        code = ('import sys\n'
+                'from acrscan import exporters\n'
+                'for output_format in ("json", "ndjson", "csv"):\n'
+                '    exporters.create_result_writer(sys.argv[1] + output_format, output_format).close()\n'
+                'assert "pyarrow" not in sys.modules\n')
+        subprocess.run([sys.executable, '-c', code, os.path.join(self.tmpdir, 'report')], check=True,
+                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def test_missing_pyarrow(self):
+        # None in sys.modules: the import raises ImportError
+        with mock.patch.object(exporters, 'pa', None), mock.patch.dict(sys.modules, {'pyarrow': None}):
+            for output_format in ('parquet', 'arrow'):
+                with self.assertRaisesRegex(ImportError, f'The {output_format} reports need pyarrow'):
+                    exporters.create_result_writer(os.path.join(self.tmpdir, 'report'), output_format)
+            exporters.create_result_writer(os.path.join(self.tmpdir, 'report'), 'csv').close()
+
+
+class TestSplitCsvResultWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read_csv(self, path: str) -> list:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            return list(csv.reader(f))
+
+    def test_reopened_reports(self):
+        filenames = ['file%d.mp3' % i for i in range(5)]
+        results = music_results(filenames, 4)
+        # 2 reports open out of 5: every report is closed and reopened (appended to) for every row after the first
+        writer = exporters.SplitCsvResultWriter(os.path.join(self.tmpdir, 'report'), max_open=2)
+        for result in results:
+            writer.write(result)
+        writer.close()
+        for filename in filenames:
+            expected_path = os.path.join(self.tmpdir, 'expected_' + filename)
+            expected = exporters.CsvResultWriter(expected_path)
+            for result in results:
+                if result.filename == filename:
+                    expected.write(result)
+            expected.close()
+            rows = self.read_csv(os.path.join(self.tmpdir, 'report_%s.csv' % filename))
+            # a single header
+            self.assertEqual(rows.count(rows[0]), 1, filename)
+            self.assertEqual(len(rows), 5, filename)
+            self.assertEqual(rows, self.read_csv(expected_path + '.csv'), filename)
+
+
+class TestJsonResultWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.results = music_results(['file0.mp3', 'file1.mp3'], 50)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, output_format: str, **kwargs) -> str:
+        writer = exporters.create_result_writer(os.path.join(self.tmpdir, 'report'), output_format, **kwargs)
+        for result in self.results:
+            writer.write(result)
+        writer.close()
+        return writer.report_full_filename
+
+    def test_json(self):
+        with open(self.write('json'), 'rb') as f:
+            self.assertEqual(json.load(f), [result.to_dict() for result in self.results])
+
+    def test_ndjson(self):
+        with open(self.write('ndjson'), 'rb') as f:
+            lines = f.read().split(b'\n')
+        # a record per line, the last line ends with a new line
+        self.assertEqual(lines[-1], b'')
+        self.assertEqual([json.loads(line) for line in lines[:-1]], [result.to_dict() for result in self.results])
+
+    def test_ndjson_report_fields(self):
+        fields = ('title', 'end_time', 'similar_results')
+        with open(self.write('ndjson', fields=fields), 'rb') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([list(record) for record in records], [list(fields)] * len(self.results))
+        self.assertEqual(records[1], {'title': 'Title, "0"', 'end_time': '00:00:10', 'similar_results': None})
+        self.assertEqual(records[3]['similar_results'], [sr.to_dict() for sr in self.results[3].similar_results])
+
+    def test_gzip_round_trip(self):
+        for output_format in ('json', 'ndjson'):
+            with open(self.write(output_format), 'rb') as f:
+                expected = f.read()
+            report_full_filename = self.write(output_format, compress=True)
+            self.assertTrue(report_full_filename.endswith(f'.{output_format}.gz'))
+            with gzip.open(report_full_filename, 'rb') as f:
+                self.assertEqual(f.read(), expected, output_format)
+
+
+class TestReportFields(unittest.TestCase):
+
+    def test_valid_fields(self):
+        for fields, scan_type in ((('title', 'start_time', 'end_time'), ScanType.SCAN_TYPE_BOTH),
+                                  (('title', 'artists_names'), ScanType.SCAN_TYPE_MUSIC),
+                                  (('title', 'audio_id', 'artists_names'), ScanType.SCAN_TYPE_BOTH),
+                                  (('audio_id', 'bucket_id'), ScanType.SCAN_TYPE_CUSTOM)):
+            self.assertIsNone(exporters.report_fields_error(fields, scan_type), (fields, scan_type))
+
+    def test_unknown_field(self):
+        self.assertEqual(exporters.report_fields_error(('title', 'artist', 'score', 'Title')),
+                         'Unknown report fields: artist, Title')
+
+    def test_no_column_in_a_lane(self):
+        # the custom file fields are not columns of the music report and the other way around
+        for fields, scan_type, lane in ((('audio_id',), ScanType.SCAN_TYPE_MUSIC, 'music'),
+                                        (('audio_id', 'bucket_id'), ScanType.SCAN_TYPE_BOTH, 'music'),
+                                        (('isrc', 'label'), ScanType.SCAN_TYPE_CUSTOM, 'custom file'),
+                                        (('isrc',), ScanType.SCAN_TYPE_BOTH, 'custom file')):
+            self.assertRegex(exporters.report_fields_error(fields, scan_type),
+                             f'^None of the report fields is a column of the {lane} report', (fields, scan_type))
+
+    def test_scan_main_assertion(self):
+        scanner = ACRCloudScan({'access_key': 'key', 'access_secret': 'secret', 'report_fields': ['audio_id']})
+        self.addCleanup(scanner._recognizer.connection_pool.close)
+        scanner.scan_type = ScanType.SCAN_TYPE_MUSIC
+        with self.assertRaisesRegex(AssertionError, 'None of the report fields is a column of the music report'):
+            scanner.scan_main('/nonexistent', '', 'csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import random
+import unittest
+
+from acrscan.acrcloud.recognizer import ACRCloudStatusCode
+from acrscan.acrscan import ACRCloudScan
+from acrscan.columnar import import_numpy
+from acrscan.models import CustomFile, CustomFileResult, Music, MusicResult, ResultsBackend
+from acrscan.utils import is_title_similar_or_equal
+
+TITLES = ['Hello', 'Hello (Remix)', 'Hello feat. ACR', 'Yesterday', 'Yesterday - Remastered', 'Blue', 'Blue Monday',
+          'Station ID', 'Another Day', 'Another Day (Live)']
+
+
+def generate_results(seed: int, n: int, custom: bool = False) -> list:
+    """
+    merged results of several files: recognized results (the same title often comes back after a no result
+    record), no result records and error records
+    :param seed:
+    :param n: the number of results
+    :param custom: CustomFileResult instead of MusicResult
+    :return:
+    """
+    rng = random.Random(seed)
+    result_class = CustomFileResult if custom else MusicResult
+    results = []
+    start_time_ms = 0
+    title_index = 0
+    for k in range(n):
+        filename = 'file%d.mp3' % (k * 5 // n)
+        played_duration_ms = rng.choice([3000, 8000, 10000, 15000])
+        times = dict(filename=filename, start_time_ms=start_time_ms, end_time_ms=start_time_ms + played_duration_ms,
+                     played_duration_ms=played_duration_ms)
+        start_time_ms += played_duration_ms
+        r = rng.random()
+        if r < 0.35:
+            results.append(result_class(status_code=ACRCloudStatusCode.NO_RESULT_CODE, score=0, **times))
+            continue
+        if r < 0.38:
+            results.append(result_class(status_code=ACRCloudStatusCode.HTTP_ERROR_CODE, score=0, **times))
+            continue
+
+        if rng.random() < 0.5:
+            title_index = rng.randrange(len(TITLES))
+        similar_results = []
+        for _ in range(rng.randint(0, 4)):
+            i = rng.randrange(len(TITLES))
+            if custom:
+                similar_results.append(CustomFile(acrid='a%d' % i, title=TITLES[i], score=rng.randint(40, 100),
+                                                  audio_id='x%d' % i))
+            else:
+                similar_results.append(Music(acrid='a%d' % i, title=TITLES[i], score=rng.randint(40, 100),
+                                             label=rng.choice([None, 'Label'])))
+        fields = dict(status_code=ACRCloudStatusCode.ACR_ERR_CODE_OK, title=TITLES[title_index],
+                      acrid='a%d' % title_index, score=rng.randint(40, 100), similar_results=similar_results,
+                      db_begin_time_offset_ms=rng.randint(0, 20000), db_end_time_offset_ms=rng.randint(0, 20000),
+                      **times)
+        if custom:
+            result = CustomFileResult(audio_id=rng.choice([None, 'x%d' % title_index]), **fields)
+        else:
+            result = MusicResult(label=rng.choice([None, 'Label']), isrc=rng.choice([None, 'ISRC']),
+                                 album_name=rng.choice([None, 'Album']), **fields)
+            result.primary_result = Music(acrid=result.acrid, title=result.title, score=result.score)
+        results.append(result)
+    return results
+
+
+def deepcopy_merge_similar_results(results_a: list, results_b: list) -> list:
+    """
+    The merge of the similar results before the merge by acrid
+    """
+    merged_results = copy.deepcopy(results_a)
+    for a_result in results_a:
+        for b_result in results_b:
+            if a_result.acrid == b_result.acrid:
+                if a_result.score < b_result.score:
+                    a_result.score = b_result.score
+            else:
+                merged_results.append(b_result)
+    return merged_results
+
+
+def multi_pass_filter(scanner: ACRCloudScan, results: list, merges: dict, merge_similar_results=None) -> list:
+    """
+    The filter before the single pass engine: the results list is walked with an index and every bridged
+    no result record is popped (with the dropped result), the metadata is counted again at every comparison.
+    :param scanner: the thresholds and _merge_similar_results
+    :param results: the merged results, changed
+    :param merges: the number of merges that keep the previous and the next result, updated
+    :param merge_similar_results: scanner._merge_similar_results by default
+    :return: the filtered results
+    """
+    merge_similar_results = merge_similar_results or scanner._merge_similar_results
+    counter = {}
+    for result in results:
+        if result.status_code == ACRCloudStatusCode.ACR_ERR_CODE_OK:
+            acrid_stats = counter.setdefault(result.acrid, {'count': 0, 'score_sum': 0})
+            acrid_stats['count'] += 1
+            acrid_stats['score_sum'] += result.score
+
+    def compare(result_a, result_b):
+        a_stats, b_stats = counter[result_a.acrid], counter[result_b.acrid]
+        if abs(a_stats['count'] - b_stats['count']) > 1:
+            return a_stats['count'] > b_stats['count']
+        if abs(a_stats['score_sum'] - b_stats['score_sum']) > 5:
+            return a_stats['score_sum'] > b_stats['score_sum']
+        keys = result_a.to_dict()
+        return len([k for k in keys if getattr(result_a, k)]) >= len([k for k in keys if getattr(result_b, k)])
+
+    index = 1
+    while index < len(results) - 1:
+        current_result = results[index]
+        previous_result, next_result = results[index - 1], results[index + 1]
+        if current_result.status_code == ACRCloudStatusCode.NO_RESULT_CODE \
+                and is_title_similar_or_equal(previous_result.title, next_result.title,
+                                              scanner.filter_title_threshold) \
+                and previous_result.db_end_time_offset_ms + current_result.played_duration_ms \
+                - next_result.db_begin_time_offset_ms < scanner.filter_time_threshold:
+            merged_results = merge_similar_results(previous_result.similar_results, next_result.similar_results)
+            results.pop(index)
+            if compare(previous_result, next_result):
+                previous_result.similar_results = merged_results
+                previous_result.end_time_ms = next_result.end_time_ms
+                previous_result.db_end_time_offset_ms = next_result.db_end_time_offset_ms
+                previous_result.played_duration_ms = previous_result.end_time_ms - previous_result.start_time_ms
+                results.pop(index)
+                merges['previous'] += 1
+            else:
+                next_result.similar_results = merged_results
+                next_result.start_time_ms = previous_result.start_time_ms
+                next_result.db_begin_time_offset_ms = previous_result.db_begin_time_offset_ms
+                next_result.played_duration_ms = next_result.end_time_ms - next_result.start_time_ms
+                results.pop(index - 1)
+                index -= 1
+                merges['next'] += 1
+            index -= 1
+        index += 1
+    return results
+
+
+class TestFilterResults(unittest.TestCase):
+    # 2 x 20 datasets of 1500 results
+    datasets = 20
+    results_per_dataset = 1500
+
+    def setUp(self):
+        self.scanner = ACRCloudScan({'access_key': 'key', 'access_secret': 'secret'})
+
+    def assert_same_as_multi_pass(self, backend: str):
+        self.scanner.results_backend = backend
+        merges = {'previous': 0, 'next': 0}
+        for custom in (False, True):
+            for seed in range(self.datasets):
+                results = generate_results(seed, self.results_per_dataset, custom)
+                expected = multi_pass_filter(self.scanner, copy.deepcopy(results), merges)
+                filtered = self.scanner._filter_results(copy.deepcopy(results))
+                self.assertEqual([r.to_dict() for r in filtered], [r.to_dict() for r in expected],
+                                 'seed %d custom %s' % (seed, custom))
+        # both decisions are covered
+        self.assertGreater(merges['previous'], 300)
+        self.assertGreater(merges['next'], 300)
+
+    def test_object_backend(self):
+        self.assert_same_as_multi_pass(ResultsBackend.OBJECT)
+
+    @unittest.skipUnless(import_numpy(), 'the columnar backend needs numpy')
+    def test_columnar_backend(self):
+        self.assert_same_as_multi_pass(ResultsBackend.COLUMNAR)
+
+    def test_edges(self):
+        for results in ([], generate_results(1, 1), generate_results(2, 2), generate_results(3, 3)):
+            expected = multi_pass_filter(self.scanner, copy.deepcopy(results), {'previous': 0, 'next': 0})
+            self.assertEqual([r.to_dict() for r in self.scanner._filter_results(copy.deepcopy(results))],
+                             [r.to_dict() for r in expected])
+
+    def test_same_selection_as_deepcopy_merge(self):
+        """
+        the merge by acrid only changes the similar results lists (no duplicates, the highest scores),
+        the filter keeps the same records
+        """
+        def report(results):
+            rows = []
+            for result in results:
+                row = result.to_dict()
+                row['similar_results'] = {r['acrid'] for r in row['similar_results'] or []}
+                rows.append(row)
+            return rows
+
+        for custom in (False, True):
+            for seed in range(self.datasets):
+                results = generate_results(seed, self.results_per_dataset, custom)
+                expected = multi_pass_filter(self.scanner, copy.deepcopy(results), {'previous': 0, 'next': 0},
+                                             deepcopy_merge_similar_results)
+                filtered = self.scanner._filter_results(copy.deepcopy(results))
+                self.assertEqual(report(filtered), report(expected), 'seed %d custom %s' % (seed, custom))
+
+
+class TestMergeSimilarResults(unittest.TestCase):
+
+    def test_union(self):
+        results_a = [Music(acrid='a1', title='Hello', score=70), Music(acrid='a2', title='Blue', score=90)]
+        results_b = [Music(acrid='a2', title='Blue', score=95), Music(acrid='a3', title='Yesterday', score=60),
+                     Music(acrid='a1', title='Hello', score=50)]
+        merged = ACRCloudScan._merge_similar_results(results_a, results_b)
+        self.assertEqual([(r.acrid, r.score) for r in merged], [('a1', 70), ('a2', 95), ('a3', 60)])
+        # the inputs are not changed, the results without a higher score are shared
+        self.assertEqual([r.score for r in results_a], [70, 90])
+        self.assertIs(merged[0], results_a[0])
+        self.assertIs(merged[2], results_b[1])
+
+    def test_empty(self):
+        results = [Music(acrid='a1', title='Hello', score=70)]
+        self.assertEqual(ACRCloudScan._merge_similar_results([], results), [])
+        self.assertEqual(ACRCloudScan._merge_similar_results(None, results), [])
+        self.assertEqual(ACRCloudScan._merge_similar_results(results, None), results)
+        self.assertEqual(ACRCloudScan._merge_similar_results(results, []), results)
+
+
+if __name__ == '__main__':
+    unittest.main()
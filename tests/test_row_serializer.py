@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import random
+import unittest
+
+from acrscan.exporters import csv_fieldnames, format_similar_results, row_serializer
+from acrscan.models import CustomFile, CustomFileResult, Music, MusicResult
+from benchmarks.baseline import to_dict_csv_row
+
+TEXTS = [None, '', 'Hello', 'Hello, "World"', 'first line\nsecond line', 'Café del Mar 東京', '0']
+NUMBERS = [None, 0, 1, 2006, 12345, -5]
+TIMES_MS = [0, 999, 1000, 3723000, 3723999, 2 * 86400000 + 5000]
+
+
+def generate_results(seed: int, n: int, result_class) -> list:
+    """
+    results with every field set to a random value, the edge values included (None, empty, falsy,
+    quotes, commas, new lines, unicode, times over 24 hours)
+    :param seed:
+    :param n: the number of results
+    :param result_class: MusicResult or CustomFileResult
+    :return:
+    """
+    rng = random.Random(seed)
+    similar_class = CustomFile if result_class is CustomFileResult else Music
+    results = []
+    for _ in range(n):
+        fields = {}
+        for name in csv_fieldnames(result_class()):
+            if name in ('start_time', 'end_time'):
+                continue
+            if name.endswith('_ms') or name in ('status_code', 'score', 'bucket_id'):
+                fields[name] = rng.choice(TIMES_MS if name in ('start_time_ms', 'end_time_ms') else NUMBERS)
+            elif name == 'similar_results':
+                fields[name] = rng.choice([None, [], [similar_class(acrid='a%d' % i, title=rng.choice(TEXTS),
+                                                                    score=rng.choice(NUMBERS))
+                                                      for i in range(rng.randint(1, 3))]])
+            else:
+                fields[name] = rng.choice(TEXTS)
+        results.append(result_class(**fields))
+    return results
+
+
+def to_dict_row(result, fieldnames: list) -> list:
+    """
+    the values of to_dict_csv_row in the order of the columns, as csv.DictWriter writes them
+    """
+    res = to_dict_csv_row(result)
+    return [res.get(key, '') for key in fieldnames]
+
+
+def csv_text(rows: list) -> str:
+    f = io.StringIO()
+    csv.writer(f).writerows(rows)
+    return f.getvalue()
+
+
+class TestRowSerializer(unittest.TestCase):
+
+    def test_same_as_to_dict_rows(self):
+        for result_class in (MusicResult, CustomFileResult):
+            fieldnames = csv_fieldnames(result_class())
+            serializer = row_serializer(result_class)
+            self.assertEqual(serializer.fieldnames, fieldnames)
+            for seed in range(5):
+                results = generate_results(seed, 2000, result_class)
+                rows = [serializer.row(result) for result in results]
+                expected = [to_dict_row(result, fieldnames) for result in results]
+                self.assertEqual(rows, expected, result_class.__name__)
+                self.assertEqual(csv_text(rows), csv_text(expected), result_class.__name__)
+
+    def test_report_fields(self):
+        for result_class in (MusicResult, CustomFileResult):
+            fieldnames = csv_fieldnames(result_class())
+            rng = random.Random(result_class.__name__)
+            results = generate_results(7, 500, result_class)
+            for _ in range(20):
+                fields = tuple(rng.sample(fieldnames, rng.randint(1, len(fieldnames))))
+                serializer = row_serializer(result_class, fields)
+                self.assertEqual(serializer.fieldnames, list(fields))
+                for result in results:
+                    expected = dict(zip(fieldnames, to_dict_row(result, fieldnames)))
+                    self.assertEqual(serializer.row(result), [expected[name] for name in fields])
+
+    def test_values(self):
+        # the values are the row, with the similar results not formatted
+        for result_class in (MusicResult, CustomFileResult):
+            serializer = row_serializer(result_class, ('title', 'similar_results', 'start_time'))
+            for result in generate_results(3, 200, result_class):
+                values = serializer.values(result)
+                self.assertIs(values[1], result.similar_results)
+                self.assertEqual(serializer.row(result), [values[0], format_similar_results(values[1]), values[2]])
+
+    def test_track_info(self):
+        # the track fields of a MusicResult are read from its TrackInfo
+        result = MusicResult(title='Hello', start_time_ms=0, end_time_ms=10000, label='Label', lyrics='',
+                             isrc='ISRC', similar_results=[Music(acrid='a1', title='Hello (Remix)', score=80)])
+        fieldnames = csv_fieldnames(result)
+        self.assertEqual(row_serializer(MusicResult).row(result), to_dict_row(result, fieldnames))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import glob
+import json
+import math
+import os
+import multiprocessing
+import re
+import shutil
+import signal
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import wave
+from unittest import mock
+
+import ffmpeg
+
+from acrscan.acrcloud import recognizer
+from acrscan.acrscan import ACRCloudScan
+from acrscan.utils import iter_pcm_windows
+from benchmarks.synthetic import response
+
+from .test_connection_pool import IdentifyServerTestCase
+
+# the fingerprint of a segment names the file and the start of the segment, the stand-in answers with its response
+FINGERPRINT = re.compile(rb'FP<([^|]*)\|(\d+)>')
+
+# a stand-in ffmpeg: decodes a 8 kHz mono 16 bit wav to s16le, with the -ss and -t input options
+FFMPEG_STAND_IN = '''
+import sys
+import wave
+
+args = sys.argv[1:]
+with wave.open(args[args.index('-i') + 1], 'rb') as f:
+    frames = f.readframes(f.getnframes())
+start = round(float(args[args.index('-ss') + 1]) * 8000) * 2 if '-ss' in args else 0
+stop = start + round(float(args[args.index('-t') + 1]) * 8000) * 2 if '-t' in args else len(frames)
+sys.stdout.buffer.write(frames[start:stop])
+'''
+
+
+class ScanTestCase(IdentifyServerTestCase):
+    """
+    Scan a folder of empty files against the stand-in /v1/identify: the fingerprints and the durations
+    of the files are made up, the responses are the synthetic responses of the segments
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.server.respond = self.respond
+        self.response_codes = []
+        self.tmpdir = tempfile.mkdtemp()
+        self.target = os.path.join(self.tmpdir, 'audio')
+        os.mkdir(self.target)
+        self.durations = {}
+        for i in range(6):
+            filename = 'file%d.mp3' % i
+            open(os.path.join(self.target, filename), 'wb').close()
+            self.durations[filename] = 35000 + 47000 * i
+        patcher = mock.patch.multiple(recognizer.acrcloud_extr_tool,
+                                      create_fingerprint_by_file=self.create_fingerprint_by_file,
+                                      get_duration_ms_by_file=self.get_duration_ms_by_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super().tearDown()
+
+    @staticmethod
+    def create_fingerprint_by_file(file_path, start_seconds, rec_length, is_db, opt):
+        return b'FP<%s|%d>' % (os.path.basename(file_path).encode('utf8'), start_seconds)
+
+    def get_duration_ms_by_file(self, file_path):
+        return self.durations[os.path.basename(file_path)]
+
+    def respond(self, request_body):
+        filename, start_seconds = FINGERPRINT.search(request_body).groups()
+        res = response(filename.decode('utf8'), int(start_seconds) * 1000)
+        self.response_codes.append(res['status']['code'])
+        return json.dumps(res).encode('utf8')
+
+    def create_scanner(self, **settings) -> ACRCloudScan:
+        scanner = ACRCloudScan({'host': self.host, 'access_key': 'key', 'access_secret': 'secret'})
+        for name, value in settings.items():
+            setattr(scanner, name, value)
+        self.addCleanup(scanner._recognizer.connection_pool.close)
+        return scanner
+
+    def scan(self, output_format='csv', scanner=None, **settings) -> dict:
+        """
+        scan the folder to a new reports folder
+        :param output_format:
+        :param scanner: the scanner, a new one with the settings if None
+        :param settings: the attributes of the scanner
+        :return: the content of every report, by report filename
+        """
+        output = os.path.join(self.tmpdir, 'reports%d' % len(os.listdir(self.tmpdir)))
+        (scanner or self.create_scanner(**settings)).scan_main(self.target, output, output_format)
+        reports = {}
+        for filename in sorted(os.listdir(output)):
+            with open(os.path.join(output, filename), 'rb') as f:
+                reports[filename] = f.read()
+        return reports
+
+
+class TestAsyncScan(ScanTestCase):
+
+    def test_same_report_as_threads(self):
+        for settings in ({}, {'with_duration': True}, {'with_duration': True, 'filter_results': True}):
+            expected = self.scan(concurrency=4, **settings)
+            self.assertEqual(len(expected), 2)
+            self.assertEqual(self.scan(concurrency=4, use_async=True, **settings), expected, settings)
+            self.assertEqual(self.scan(concurrency=1, use_async=True, **settings), expected, settings)
+
+    def test_files_in_flight(self):
+        scanner = self.create_scanner(concurrency=2, use_async=True)
+        scan_async = scanner._scan_async
+        scanning = []
+        most_scanning = []
+
+        async def count_scanning(*args):
+            scanning.append(args[1])
+            most_scanning.append(len(scanning))
+            try:
+                return await scan_async(*args)
+            finally:
+                scanning.remove(args[1])
+
+        scanner._scan_async = count_scanning
+        expected = self.scan(concurrency=2)
+        self.assertEqual(self.scan(scanner=scanner), expected)
+        self.assertEqual(len(most_scanning), len(self.durations))
+        self.assertEqual(max(most_scanning), 2)
+
+    def test_shared_caches(self):
+        scanner = self.create_scanner(concurrency=3, use_async=True)
+        scanner.config['response_cache_size'] = 1000
+        scanner._recognizer.connection_pool.close()
+        scanner._recognizer = recognizer.ACRCloudRecognizer(scanner.config)
+        expected = self.scan(scanner=scanner)
+        self.assertIs(scanner._async_recognizer.response_cache, scanner._recognizer.response_cache)
+        # only the errors are not cached, a new async recognizer reuses the responses of the first scan
+        errors = len([code for code in self.response_codes if code not in (0, 1001)])
+        del self.response_codes[:]
+        scanner._async_recognizer = None
+        self.assertEqual(self.scan(scanner=scanner), expected)
+        self.assertEqual(len(self.response_codes), errors)
+
+
+
+class TestStreamedReports(ScanTestCase):
+
+    def test_same_as_batch_reports(self):
+        for output_format in ('csv', 'json', 'ndjson'):
+            for settings in ({}, {'with_duration': True}, {'split_results': True}, {'scan_type': 'music'},
+                             {'concurrency': 3, 'use_async': True}):
+                expected = self.scan(output_format, **settings)
+                self.assertTrue(expected)
+                self.assertEqual(self.scan(output_format, stream_results=True, **settings), expected,
+                                 (output_format, settings))
+
+
+# a scan with 2 process pool workers and a journal, in its own process so that it can be killed
+JOURNALED_SCAN = '''
+import json
+import multiprocessing
+import sys
+
+from acrscan.acrcloud import recognizer
+from acrscan.acrscan import ACRCloudScan
+from tests.test_scan_modes import ScanTestCase
+
+host, target, output, journal_path, durations = json.loads(sys.argv[1])
+# the workers inherit the made up fingerprints
+multiprocessing.set_start_method('fork')
+recognizer.acrcloud_extr_tool.create_fingerprint_by_file = ScanTestCase.create_fingerprint_by_file
+recognizer.acrcloud_extr_tool.get_duration_ms_by_file = lambda file_path: durations[file_path.rsplit('/', 1)[-1]]
+scanner = ACRCloudScan({'host': host, 'access_key': 'key', 'access_secret': 'secret'})
+scanner.workers = 2
+scanner.journal_path = journal_path
+scanner.scan_main(target, output, 'csv')
+'''
+
+
+@unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'the workers are forked')
+class TestJournaledScan(ScanTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.killed = threading.Event()
+        self.respond_lock = threading.Lock()
+        self.kill_after = None
+        # the connections of the killed scan are reset
+        self.server.handle_error = lambda request, client_address: None
+
+    def respond(self, request_body):
+        with self.respond_lock:
+            if self.kill_after is None or len(self.response_codes) < self.kill_after:
+                return super().respond(request_body)
+        # the requests after kill_after responses are held until the scan is killed
+        self.killed.wait(10)
+        return b'{}'
+
+    def start_scan(self, output: str, journal_path: str) -> subprocess.Popen:
+        args = json.dumps([self.host, self.target, output, journal_path, self.durations])
+        return subprocess.Popen([sys.executable, '-c', JOURNALED_SCAN, args], start_new_session=True,
+                                stderr=subprocess.DEVNULL,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def test_resume_after_kill(self):
+        expected = self.scan()
+        requests = len(self.response_codes)
+        del self.response_codes[:]
+
+        journal_path = os.path.join(self.tmpdir, 'scan.journal')
+        output = os.path.join(self.tmpdir, 'killed')
+        self.kill_after = requests // 2
+        scan = self.start_scan(output, journal_path)
+        try:
+            while len(self.response_codes) < self.kill_after and scan.poll() is None:
+                self.killed.wait(0.05)
+            # the scan and its workers
+            os.killpg(scan.pid, signal.SIGKILL)
+        finally:
+            scan.wait()
+            self.killed.set()
+        self.assertEqual(len(self.response_codes), self.kill_after)
+        # killed before the end of the scan, no report
+        self.assertEqual(os.listdir(output), [])
+        journaled = 0
+        for path in glob.glob(journal_path + '.w*'):
+            with open(path) as f:
+                # the last line may be cut by the kill
+                journaled += len([line for line in f if line.endswith('}\n')])
+        self.assertGreater(journaled, 0)
+
+        output = os.path.join(self.tmpdir, 'resumed')
+        self.kill_after = None
+        del self.response_codes[:]
+        self.assertEqual(self.start_scan(output, journal_path).wait(), 0)
+        reports = {}
+        for filename in sorted(os.listdir(output)):
+            with open(os.path.join(output, filename), 'rb') as f:
+                reports[filename] = f.read()
+        self.assertEqual(reports, expected)
+        # the journaled segments are not recognized again
+        self.assertEqual(len(self.response_codes), requests - journaled)
+
+
+class TestPcmWindows(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.ffmpeg_paths = [os.path.join(self.tmpdir, 'ffmpeg')]
+        with open(self.ffmpeg_paths[0], 'w') as f:
+            f.write('#!%s\n%s' % (sys.executable, FFMPEG_STAND_IN))
+        os.chmod(self.ffmpeg_paths[0], stat.S_IRWXU)
+        if shutil.which('ffmpeg'):
+            self.ffmpeg_paths.append(shutil.which('ffmpeg'))
+        # 63.5 seconds of a sweep, every sample differs from its neighbours
+        self.media = os.path.join(self.tmpdir, 'audio.wav')
+        with wave.open(self.media, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(8000)
+            f.writeframes(b''.join(int(12000 * math.sin(i * i / 400000)).to_bytes(2, 'little', signed=True)
+                                   for i in range(63500 * 8)))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def decode_segment(self, ffmpeg_path: str, t_ms: int, length_ms: int) -> bytes:
+        """
+        decode a segment on its own, as the scan does without decode_once
+        """
+        out, _ = ffmpeg.input(self.media, ss=t_ms / 1000, t=length_ms / 1000) \
+            .output('pipe:', **{'loglevel': 'quiet', 'format': 's16le', 'acodec': 'pcm_s16le', 'ac': 1, 'ar': 8000}) \
+            .run(cmd=ffmpeg_path, capture_stdout=True)
+        return out
+
+    def test_same_as_decoding_every_segment(self):
+        # back to back, gaps between the windows, overlapping windows, a start time, the short last windows
+        for time_points, length_ms in ((range(0, 63500, 10000), 10000), (range(0, 63500, 15000), 10000),
+                                       (range(0, 63500, 4000), 10000), (range(12000, 63500, 10000), 10000),
+                                       (range(30000, 80000, 20000), 10000)):
+            for ffmpeg_path in self.ffmpeg_paths:
+                windows = list(iter_pcm_windows(self.media, time_points, length_ms, ffmpeg_path))
+                self.assertEqual([t_ms for t_ms, _ in windows], list(time_points))
+                for t_ms, pcm in windows:
+                    self.assertEqual(pcm, self.decode_segment(ffmpeg_path, t_ms, length_ms),
+                                     (ffmpeg_path, time_points, t_ms))
+
+
+if __name__ == '__main__':
+    unittest.main()
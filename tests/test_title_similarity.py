@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import copy
+import random
+import unittest
+
+from acrscan.acrcloud.recognizer import ACRCloudStatusCode
+from acrscan.acrscan import ACRCloudScan
+from acrscan.merger import ResultsMerger
+from acrscan.models import MusicResult
+from acrscan.utils import TitleSimilarity, is_title_similar_or_equal
+
+from benchmarks.synthetic import response
+
+TITLES = ['Hello', 'Hello (Remix)', 'Hello feat. ACR', 'Yesterday', 'Yesterday - Remastered', 'Blue', 'Blue Monday',
+          'Café del Mar', 'cafe del mar', '', None]
+
+
+class TestTitleSimilarity(unittest.TestCase):
+
+    def setUp(self):
+        self.similarity = TitleSimilarity()
+
+    def test_same_as_fuzz(self):
+        for title_a in TITLES:
+            for title_b in TITLES:
+                for threshold in (50, 75, 90):
+                    self.assertEqual(self.similarity.is_similar_or_equal(title_a, title_b, threshold),
+                                     is_title_similar_or_equal(title_a, title_b, threshold), (title_a, title_b))
+
+    def test_score_many(self):
+        # the token set ratio is not symmetric, the random titles have pairs that only agree in one order
+        rng = random.Random(3)
+        words = ['hello', 'remix', 'feat', 'love', 'you', 'the', 'day', 'night', 'live', 'blue', 'monday']
+        titles = TITLES + [' '.join(rng.choice(words) for _ in range(rng.randint(1, 5))) for _ in range(40)]
+        for title in titles:
+            for threshold in (50, 75, 90):
+                self.assertEqual(self.similarity.score_many(title, titles, threshold),
+                                 [is_title_similar_or_equal(t, title, threshold) for t in titles], title)
+        # the verdicts are shared with is_similar_or_equal
+        misses = self.similarity.misses
+        for title in titles:
+            for t in titles:
+                self.similarity.is_similar_or_equal(t, title, 75)
+        self.assertEqual(self.similarity.misses, misses)
+
+    def test_merge_same_as_push(self):
+        scanner = ACRCloudScan({'access_key': 'key', 'access_secret': 'secret'})
+        for seed in range(5):
+            # the segment results of the synthetic responses of 3 files
+            results = ([], [])
+            for filename in ('a.mp3', 'b.mp3', 'c.mp3'):
+                for t_ms in range(0, 1800000, 10000):
+                    for lane, result in zip(results, scanner._handle_segment(
+                            filename, t_ms, response(filename, t_ms, seed), 1800000)):
+                        lane.append(result)
+            for lane in results:
+                merger = ResultsMerger(75)
+                merged = []
+                for result in copy.deepcopy(lane):
+                    merged += merger.push(result)
+                merged += merger.flush()
+                self.assertEqual([r.to_dict() for r in ResultsMerger(75).merge(copy.deepcopy(lane))],
+                                 [r.to_dict() for r in merged], seed)
+
+    def test_changed_title(self):
+        # the title of an acrid may change between the responses, the verdicts follow the titles
+        merger = ResultsMerger(75, self.similarity)
+        merged = []
+        for i, (acrid, title) in enumerate([('a1', 'Hello'), ('a2', 'Hello (Remix)'), ('a1', 'Goodbye'),
+                                            ('a2', 'Hello (Remix)')]):
+            merged += merger.push(MusicResult(filename='f.mp3', status_code=ACRCloudStatusCode.ACR_ERR_CODE_OK,
+                                              acrid=acrid, title=title, score=100, start_time_ms=i * 10000,
+                                              end_time_ms=(i + 1) * 10000, played_duration_ms=10000))
+        merged += merger.flush()
+        self.assertEqual([r.title for r in merged], ['Hello', 'Goodbye', 'Hello (Remix)'])
+
+    def test_hits(self):
+        for _ in range(3):
+            self.similarity.is_similar_or_equal('Hello', 'Hello (Remix)', 75)
+        self.similarity.is_similar_or_equal('Hello', 'Hello (Remix)', 90)
+        self.assertEqual(self.similarity.stats(), {'hits': 2, 'misses': 2, 'hit_ratio': 0.5})
+
+
+if __name__ == '__main__':
+    unittest.main()